@@ -0,0 +1,525 @@
+"""
+REST API Module
+---------------
+Versioned JSON API for bills and households (/api/v1).
+
+Module: api.py
+Purpose: Machine-readable access for integrations (payment gateway, mobile app)
+Input: HTTP requests with JSON bodies and query parameters
+Output: JSON responses (gzip-compressed when the client accepts it)
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Endpoints:
+----------
+GET  /api/v1/bills                  List bills (newest first)
+GET  /api/v1/bills/<bill_id>        Fetch one bill
+POST /api/v1/bills                  Create a bill            (admin or API key)
+POST /api/v1/bills/<bill_id>/pay    Pay a bill (idempotent)
+GET  /api/v1/households             List households          (admin or API key)
+GET  /api/v1/households/<id>        Fetch one household      (admin or API key)
+POST /api/v1/households             Register a household     (admin or API key)
+GET  /api/v1/households/<id>/readings     Meter readings     (admin or API key)
+GET  /api/v1/households/<id>/consumption  Consumption per day/month (admin or API key)
+POST /api/v1/readings               Record meter readings in bulk (admin or API key)
+GET  /api/v1/charts/consumption     Monthly units, amount and bills from the rollups, per
+                                    connection type or for ?household_id= (admin or API key)
+GET  /api/v1/jobs                   Recent background jobs (admin or API key)
+POST /api/v1/jobs                   Start a job: {"kind": "generate_bills", "area": ...} or
+                                    {"kind": "import_households", "households": [...]}; 202 + job id
+GET  /api/v1/jobs/<job_id>          Job progress: processed/failed counts, rate, ETA, errors
+GET  /api/v1/metrics                This process's read coalescing, fragment cache, load
+                                    shedding, change listener and slow query log counters
+                                    (admin or API key)
+
+Query parameters for list endpoints:
+- limit:  page size (default 50, max 500)
+- after:  keyset cursor; pass the previous page's "next" value
+- fields: comma separated projection, e.g. fields=units,total_amount,status (bills may
+  also name household snapshot fields and rate_breakdown.slab_breakdown)
+- bills also accept status, house_number, service_number and household_id filters
+- readings/consumption accept from and to (ISO 8601); consumption also bucket=day|month
+- charts/consumption accepts from and to as YYYY-MM (default: the last 12 months) and
+  connection_type=Household,Commercial to limit the series
+
+POST /api/v1/bills takes units, or a cumulative meter reading (reading,
+optional read_at), or from_readings=true to bill up to the last stored reading.
+
+Authentication for protected endpoints: a logged-in admin session, or the
+X-API-Key header matching the API_KEY environment variable.
+"""
+
+import gzip
+import hmac
+import os
+import re
+from functools import wraps
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, Response, request
+from flask_login import current_user
+from modules.serialization import dumps
+from modules.fragment_cache import fragment_cache
+from modules.singleflight import read_coalescer
+from modules.load_shedding import load_shedder
+from modules.constants import HOUSEHOLD_SNAPSHOT_FIELDS
+from services.database import get_collection, get_service, get_slow_query_log, get_reporting_read_preference
+from services.bill_service import BillService, BillConflictError
+from services.household_service import HouseholdService
+from services.payment_service import PaymentService
+from services.meter_reading_service import MeterReadingService, parse_read_at
+from services.job_service import JobService
+from services.change_listener import change_listener
+from services.rollup_service import RollupService, parse_month
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+GZIP_MIN_BYTES = 1024
+FIELD_NAME_REGEX = re.compile(r'^[A-Za-z_][A-Za-z0-9_.]*$')
+# Bill fields compact storage leaves out (filled in by BillService.expand_bills),
+# and the fields expanding them needs
+EXPANDED_BILL_FIELDS = HOUSEHOLD_SNAPSHOT_FIELDS + ('rate_breakdown',)
+BILL_EXPANSION_FIELDS = HOUSEHOLD_SNAPSHOT_FIELDS + ('household_id', 'units', 'tariff_version', 'rate_breakdown')
+
+
+# ==================================================================================
+# HELPERS
+# ==================================================================================
+
+def json_response(data, status=200):
+    """
+    Build a JSON response, gzip-compressed when worthwhile and accepted.
+
+    Input:
+    - data: Serializable payload (may contain ObjectId/datetime)
+    - status (int): HTTP status code
+
+    Output:
+    - Response
+    """
+    body = dumps(data)
+    headers = {'Vary': 'Accept-Encoding'}
+    if len(body) >= GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        body = gzip.compress(body, compresslevel=5)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body, status=status, mimetype='application/json', headers=headers)
+
+
+def error_response(message, status, details=None):
+    payload = {'error': message}
+    if details:
+        payload['details'] = details
+    return json_response(payload, status)
+
+
+def api_auth_required(view):
+    """Allow a logged-in admin or a request carrying the configured API key."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_user.is_authenticated:
+            return view(*args, **kwargs)
+        api_key = os.environ.get('API_KEY')
+        supplied = request.headers.get('X-API-Key', '')
+        if api_key and hmac.compare_digest(supplied, api_key):
+            return view(*args, **kwargs)
+        return error_response('Authentication required.', 401)
+    return wrapper
+
+
+def parse_projection():
+    """Projection from ?fields=a,b,c (None means all fields)."""
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    invalid = [name for name in names if not FIELD_NAME_REGEX.match(name) or name.startswith('$')]
+    if invalid:
+        raise ValueError(f"Invalid field names: {', '.join(invalid)}")
+    return dict.fromkeys(names, 1)
+
+
+def bill_fetch_projection(projection):
+    """
+    Projection to read bills with so they can still be expanded.
+
+    When ?fields= names a field compact bills do not store (household
+    snapshot, slab breakdown), the fields expand_bills needs are read too;
+    trim_fields() drops them again after expansion.
+
+    Output:
+    - dict or None: projection unchanged when no expansion is needed
+    """
+    if projection is None or not any(name.split('.')[0] in EXPANDED_BILL_FIELDS for name in projection):
+        return projection
+    fields = dict(projection, **dict.fromkeys(BILL_EXPANSION_FIELDS, 1))
+    # A path and its parent may not both be projected
+    return {name: 1 for name in fields if not any(name.startswith(f"{other}.") for other in fields)}
+
+
+def trim_fields(document, projection):
+    """Keep only the projected (possibly dotted) fields and _id, as MongoDB would."""
+    trimmed = {'_id': document['_id']} if '_id' in document else {}
+    for name in projection:
+        source, target = document, trimmed
+        *parents, leaf = name.split('.')
+        for part in parents:
+            if not isinstance(source.get(part), dict):
+                break
+            source, target = source[part], target.setdefault(part, {})
+        else:
+            if leaf in source:
+                target[leaf] = source[leaf]
+    return trimmed
+
+
+def parse_page_size():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def parse_object_id(value, name='id'):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f"Invalid {name}")
+
+
+def keyset_page(collection, query, direction, projection=None):
+    """
+    Fetch one page with keyset pagination on _id.
+
+    The projection defaults to ?fields= (see parse_projection).
+
+    Logic:
+    1. Apply ?after=<last _id of previous page> as an _id range condition
+    2. Sort on _id in the given direction (uses the default _id index)
+    3. Fetch limit + 1 documents to know whether another page exists
+
+    Output:
+    - dict: {'data': [...], 'next': cursor or None}
+    """
+    limit = parse_page_size()
+    projection = projection or parse_projection()
+
+    after = request.args.get('after')
+    if after:
+        operator = '$lt' if direction < 0 else '$gt'
+        query = dict(query, _id={operator: parse_object_id(after, 'cursor')})
+
+    documents = list(collection.find(query, projection).sort('_id', direction).limit(limit + 1))
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+
+    return {
+        'data': documents,
+        'next': str(documents[-1]['_id']) if has_more else None
+    }
+
+
+def parse_date_range():
+    """(start, end) from ?from=...&to=... (ISO 8601, either may be missing)."""
+    start, end = request.args.get('from'), request.args.get('to')
+    try:
+        return (parse_read_at(start) if start else None), (parse_read_at(end) if end else None)
+    except ValueError:
+        raise ValueError("from and to must be ISO 8601 dates")
+
+
+@api.errorhandler(ValueError)
+def handle_value_error(error):
+    return error_response(str(error), 400)
+
+
+# ==================================================================================
+# BILLS
+# ==================================================================================
+
+@api.route('/bills', methods=['GET'])
+def list_bills():
+    bill_service = get_service(BillService)
+    if bill_service is None:
+        return error_response('Database connection error.', 503)
+
+    query = {}
+    for field in ('status', 'house_number', 'service_number'):
+        if request.args.get(field):
+            query[field] = request.args[field]
+    if request.args.get('household_id'):
+        query['household_id'] = parse_object_id(request.args['household_id'], 'household_id')
+
+    projection = parse_projection()
+    fetch_projection = bill_fetch_projection(projection)
+    page = keyset_page(bill_service.bills_collection, query, -1, fetch_projection)
+    if projection is None or fetch_projection is not projection:
+        page['data'] = bill_service.expand_bills(page['data'], with_breakdown=True)
+    if fetch_projection is not projection:
+        page['data'] = [trim_fields(bill, projection) for bill in page['data']]
+    return json_response(page)
+
+
+@api.route('/bills/<bill_id>', methods=['GET'])
+def get_bill(bill_id):
+    bill_service = get_service(BillService)
+    if bill_service is None:
+        return error_response('Database connection error.', 503)
+
+    projection = parse_projection()
+    fetch_projection = bill_fetch_projection(projection)
+    bill = bill_service.find_bill(parse_object_id(bill_id, 'bill id'), fetch_projection)
+    if not bill:
+        return error_response('Bill not found.', 404)
+    if projection is None or fetch_projection is not projection:
+        bill = bill_service.expand_bill(bill)
+    if fetch_projection is not projection:
+        bill = trim_fields(bill, projection)
+    return json_response(bill)
+
+
+@api.route('/bills', methods=['POST'])
+@api_auth_required
+def create_bill():
+    bill_service = get_service(BillService)
+    if bill_service is None:
+        return error_response('Database connection error.', 503)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error_response('Expected a JSON object.', 400)
+
+    bill_data = {key: payload[key] for key in ('household_id', 'service_number', 'units', 'reading', 'read_at',
+                                               'from_readings', 'fine_amount', 'notes')
+                 if key in payload}
+    if not ({'units', 'reading'} & set(bill_data) or bill_data.get('from_readings')):
+        return error_response('units, reading or from_readings is required.', 400)
+    if 'household_id' in bill_data:
+        parse_object_id(bill_data['household_id'], 'household_id')
+
+    try:
+        bill = bill_service.create_bill(bill_data)
+    except BillConflictError as e:
+        return error_response(str(e), 409)
+    return json_response(bill, 201)
+
+
+@api.route('/bills/<bill_id>/pay', methods=['POST'])
+def pay_bill(bill_id):
+    payment_service = get_service(PaymentService)
+    if payment_service is None:
+        return error_response('Database connection error.', 503)
+
+    payload = request.get_json(silent=True) or {}
+    idempotency_key = request.headers.get('Idempotency-Key') or payload.get('idempotency_key')
+    if not idempotency_key:
+        return error_response('An Idempotency-Key header or idempotency_key field is required.', 400)
+
+    result = payment_service.pay_bill(
+        bill_id,
+        method=payload.get('method') or 'Online',
+        idempotency_key=idempotency_key,
+        amount=payload.get('amount')
+    )
+
+    status = {
+        'paid': 200,
+        # A retry gets the original outcome; 'duplicate' means the first attempt is still running
+        'duplicate': 409,
+        'already_paid': 409,
+        'underpaid': 422,
+        'not_found': 404,
+        'invalid': 400
+    }.get(result['outcome'], 200)
+    return json_response(result, status)
+
+
+# ==================================================================================
+# HOUSEHOLDS
+# ==================================================================================
+
+@api.route('/households', methods=['GET'])
+@api_auth_required
+def list_households():
+    households_collection = get_collection('households')
+    if households_collection is None:
+        return error_response('Database connection error.', 503)
+
+    query = {}
+    for field in ('house_number', 'service_number', 'connection_type'):
+        if request.args.get(field):
+            query[field] = request.args[field]
+
+    return json_response(keyset_page(households_collection, query, 1))
+
+
+@api.route('/households/<household_id>', methods=['GET'])
+@api_auth_required
+def get_household(household_id):
+    households_collection = get_collection('households')
+    if households_collection is None:
+        return error_response('Database connection error.', 503)
+
+    household = households_collection.find_one(
+        {'_id': parse_object_id(household_id, 'household id')}, parse_projection()
+    )
+    if not household:
+        return error_response('Household not found.', 404)
+    return json_response(household)
+
+
+@api.route('/households', methods=['POST'])
+@api_auth_required
+def create_household():
+    household_service = get_service(HouseholdService)
+    if household_service is None:
+        return error_response('Database connection error.', 503)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error_response('Expected a JSON object.', 400)
+
+    household, errors = household_service.create_household(payload)
+    if errors:
+        return error_response('Validation failed.', 422, errors)
+    return json_response(household, 201)
+
+
+# ==================================================================================
+# METER READINGS
+# ==================================================================================
+
+@api.route('/households/<household_id>/readings', methods=['GET'])
+@api_auth_required
+def list_readings(household_id):
+    meter_service = get_service(MeterReadingService)
+    if meter_service is None:
+        return error_response('Database connection error.', 503)
+
+    start, end = parse_date_range()
+    household_id = parse_object_id(household_id, 'household id')
+    return json_response({'data': meter_service.get_readings(household_id, start, end)})
+
+
+@api.route('/households/<household_id>/consumption', methods=['GET'])
+@api_auth_required
+def household_consumption(household_id):
+    meter_service = get_service(MeterReadingService)
+    if meter_service is None:
+        return error_response('Database connection error.', 503)
+
+    start, end = parse_date_range()
+    household_id = parse_object_id(household_id, 'household id')
+    bucket = request.args.get('bucket', 'day')
+    return json_response({'data': meter_service.consumption(household_id, start, end, bucket)})
+
+
+@api.route('/readings', methods=['POST'])
+@api_auth_required
+def create_readings():
+    meter_service = get_service(MeterReadingService)
+    if meter_service is None:
+        return error_response('Database connection error.', 503)
+
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get('readings')
+    if not isinstance(payload, list) or not payload:
+        return error_response('Expected a non-empty list of readings.', 400)
+
+    result = meter_service.add_readings(payload, source='api')
+    return json_response(result, 201 if result['inserted'] else 422)
+
+
+# ==================================================================================
+# CONSUMPTION CHARTS
+# ==================================================================================
+
+@api.route('/charts/consumption', methods=['GET'])
+@api_auth_required
+def consumption_chart():
+    """Monthly series from the rollups only: one household, or the load per connection type."""
+    rollup_service = get_service(RollupService)
+    if rollup_service is None:
+        return error_response('Database connection error.', 503)
+
+    start = parse_month(request.args['from']) if request.args.get('from') else None
+    end = parse_month(request.args['to']) if request.args.get('to') else None
+    if request.args.get('household_id'):
+        household_id = parse_object_id(request.args['household_id'], 'household id')
+        return json_response(rollup_service.household_trend(household_id, start, end))
+    connection_types = [value for value in request.args.get('connection_type', '').split(',') if value] or None
+    return json_response(rollup_service.connection_type_load(start, end, connection_types))
+
+
+# ==================================================================================
+# BACKGROUND JOBS
+# ==================================================================================
+
+@api.route('/jobs', methods=['GET'])
+@api_auth_required
+def list_jobs():
+    job_service = get_service(JobService)
+    if job_service is None:
+        return error_response('Database connection error.', 503)
+
+    return json_response({'data': job_service.list_jobs(parse_page_size())})
+
+
+@api.route('/jobs', methods=['POST'])
+@api_auth_required
+def create_job():
+    job_service = get_service(JobService)
+    if job_service is None:
+        return error_response('Database connection error.', 503)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return error_response('Expected a JSON object.', 400)
+
+    kind = payload.get('kind')
+    if kind == 'generate_bills':
+        job_id = job_service.enqueue(kind, {'area': str(payload.get('area') or '').strip()})
+    elif kind == 'import_households':
+        households = payload.get('households')
+        if not isinstance(households, list) or not households or not all(isinstance(h, dict) for h in households):
+            return error_response('Expected a non-empty list of household objects.', 400)
+        job_id = job_service.enqueue(kind, items=households)
+    else:
+        return error_response('kind must be generate_bills or import_households.', 400)
+    return json_response({'job_id': str(job_id), 'progress': f"/api/v1/jobs/{job_id}"}, 202)
+
+
+@api.route('/jobs/<job_id>', methods=['GET'])
+@api_auth_required
+def get_job(job_id):
+    job_service = get_service(JobService)
+    if job_service is None:
+        return error_response('Database connection error.', 503)
+
+    job = job_service.get_job(parse_object_id(job_id, 'job id'))
+    if not job:
+        return error_response('Job not found.', 404)
+    return json_response(job)
+
+
+# ==================================================================================
+# METRICS
+# ==================================================================================
+
+@api.route('/metrics', methods=['GET'])
+@api_auth_required
+def metrics():
+    """Counters of the worker process that served the request (one per worker)."""
+    slow_query_log = get_slow_query_log()
+    return json_response({
+        'pid': os.getpid(),
+        'read_coalescing': read_coalescer.stats(),
+        'fragment_cache': fragment_cache.stats(),
+        'load_shedding': load_shedder.stats(),
+        'change_listener': change_listener.stats(),
+        'reporting_read_preference': get_reporting_read_preference().document,
+        'slow_query_log': slow_query_log.stats() if slow_query_log else None
+    })
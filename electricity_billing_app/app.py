@@ -1,23 +1,51 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from pymongo import MongoClient
-from bson.objectid import ObjectId
+from flask import (Flask, Blueprint, render_template, stream_template, request, redirect, url_for, flash,
+                   get_flashed_messages, current_app, Response, jsonify, session)
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.middleware.proxy_fix import ProxyFix
+from markupsafe import Markup
 from datetime import datetime
+from bson.objectid import ObjectId
 import os
+import time
 from dotenv import load_dotenv
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from services.bill_service import BillService
-import re
+from services.database import get_collection, get_db, get_service, get_max_staleness_seconds, reporting_collection
+from services.query_monitor import top_slow_shapes, get_threshold_ms
+from api import api
+from services.bill_service import BillService, MIGRATION_BATCH_SIZE
+from services.household_service import HouseholdService
+from services.overdue_service import OverdueService, OVERDUE_BATCH_SIZE
+from services.aging_service import AgingReportService
+from services.archive_service import ArchiveService
+from services.kpi_service import KpiService
+from services.rollup_service import RollupService
+from services.payment_service import PaymentService, new_idempotency_key
+from services.meter_reading_service import MeterReadingService, READING_IMPORT_CHUNK_SIZE
+from services.tariff_registry import tariff_registry
+from services.job_service import JobService
+from services.batch_import_service import BatchImportService
+from services.change_listener import change_listener
+from modules.constants import (CONNECTION_TYPES, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE,
+                               BATCH_CHUNK_SIZE, BATCH_WORKERS, TRUSTED_PROXY_HOPS)
+from modules.fragment_cache import fragment_cache
+from modules.load_shedding import load_shedder, SAFE_METHODS
+from modules.input_handler import read_records, RECORD_FORMATS
+from modules.print_spool import write_print_spool
+import io
+import csv
+import json
+import itertools
+import click
 
 # Load environment variables if .env file exists
 load_dotenv()
 
-app = Flask(__name__)
-app.secret_key = 'your_secret_key_here'  # Change this to a random secret key for session security
-
 # Flask-Login Setup
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
+
+# All page routes live on this blueprint; create_app() registers it
+main = Blueprint('main', __name__)
 
 # Simple User Class for Admin
 class User(UserMixin):
@@ -30,54 +58,68 @@ def load_user(user_id):
         return User('admin')
     return None
 
-# ==================================================================================
-# DATABASE CONFIGURATION
-# ==================================================================================
-mongo_uri = os.environ.get("MONGO_URI")
-
-# Default to a local instance if no URI is provided
-if not mongo_uri:
-    print("WARNING: MONGO_URI not found. Using default local connection 'mongodb://localhost:27017/billing_db'")
-    mongo_uri = "mongodb://localhost:27017/billing_db"
+def render_fragment(template_name, **context):
+    """Render a partial template to Markup (for the fragment cache)."""
+    template = current_app.jinja_env.get_template(template_name)
+    return Markup(template.render(current_user=current_user, **context).strip())
 
-try:
-    client = MongoClient(mongo_uri)
-    db = client.get_default_database()
-    
-    # Initialize Collections
-    households_collection = db['households']
-    bills_collection = db['electricity_billing']
-    
-    # Initialize Services
-    bill_service = BillService(db)
+@main.app_template_global()
+def bill_fragment(kind, bill):
+    """
+    Rendered HTML for one bill ('bill_row' or 'recent_bill'), from the fragment cache.
     
-    print(f"Connected to MongoDB database: {db.name}")
-except Exception as e:
-    print(f"Error connecting to MongoDB: {e}")
-    bill_service = None
-    households_collection = None
-    bills_collection = None
+    Cached per bill id; re-rendered when the bill's version (bumped by
+    payments and fines) or the viewer's login state changes.
+    """
+    version = (bill.get('version', 0), current_user.is_authenticated)
+    return fragment_cache.get_or_render((kind, str(bill['_id'])), version,
+                                        lambda: render_fragment(f'_{kind}.html', bill=bill))
 
-# ==================================================================================
+@main.before_app_request
+def resume_background_jobs():
+    # Jobs abandoned by a restarted worker are picked up by the next signed-in request (once per
+    # lease period); public traffic, which load shedding may drop, never pays for the lookup.
+    # `flask run-jobs` finishes them when nobody is signed in
+    if request.endpoint != 'static' and current_user.is_authenticated:
+        job_service = get_service(JobService)
+        if job_service is not None:
+            job_service.maybe_resume_stale()
+
+@main.after_app_request
+def remember_writes(response):
+    # Read-your-writes: a session that just changed something reads from the primary
+    # until any secondary it could be routed to has caught up
+    if request.method not in SAFE_METHODS and response.status_code < 400 and request.endpoint != 'main.login':
+        session['primary_reads_until'] = time.time() + get_max_staleness_seconds()
+    return response
 
-@app.route('/')
+def reporting_reads():
+    """True when this request's heavy reads may go to a secondary (no recent write by this session)."""
+    return session.get('primary_reads_until', 0) <= time.time()
+
+@main.route('/')
 def index():
-    recent_bills = []
     if current_user.is_authenticated:
-        # Admin View: Show recent bills
-        if bills_collection is not None:
-            recent_bills = list(bills_collection.find().sort("date", -1).limit(5))
-        
-        households = []
-        if households_collection is not None:
-            households = list(households_collection.find().sort("household_name", 1))
+        # Admin View: KPIs, recent bills and the household list version come from one document
+        kpi_service = get_service(KpiService)
+        kpis = None
+        household_options = ''
+        if kpi_service is not None:
+            kpis = kpi_service.get()
+            # Households are only ever added, so count + newest _id identifies the list
+            version = (kpis['households'], kpis['newest_household_id'])
+            household_options = fragment_cache.get_or_render(('household_options',), version, lambda: render_fragment(
+                '_household_options.html',
+                households=kpi_service.households_collection.find().sort("household_name", 1)
+            ))
             
-        return render_template('index.html', recent_bills=recent_bills, households=households)
+        return render_template('index.html', kpis=kpis, recent_bills=kpis and kpis['recent_bills'],
+                               household_options=household_options)
     else:
         # Guest View: Show Search
         return render_template('index.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
@@ -90,126 +132,72 @@ def login():
             user = User('admin')
             login_user(user)
             flash('Logged in successfully.', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         else:
             flash('Invalid credentials.', 'error')
             
     return render_template('login.html')
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('Logged out successfully.', 'success')
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/add_household', methods=['POST'])
+@main.route('/add_household', methods=['POST'])
 @login_required
 def add_household():
-    if households_collection is None:
+    household_service = get_service(HouseholdService)
+    if household_service is None:
         flash("Database connection error.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     try:
-        # Import validation functions
-        from modules.validation import validate_consumer_name, validate_phone_number, validate_consumer_number
-        
-        household_name = request.form.get('household_name', '').strip()
-        # Sanitize name: remove numbers and convert to lowercase
-        household_name = re.sub(r'\d+', '', household_name).lower()
-        
-        house_number = request.form.get('house_number', '').strip()
-        phone = request.form.get('phone', '').strip()
-        address = request.form.get('address', '').strip()
-        connection_type = request.form.get('connection_type', 'Household')
-        
-        # Generate or get consumer number
-        consumer_number = request.form.get('service_number', '').strip()  # Form field name might still be service_number
-        if not consumer_number:
-            # Auto-generate consumer number
-            last_household = households_collection.find_one(sort=[("created_at", -1)])
-            if last_household and 'service_number' in last_household:
-                # Extract number from last consumer number
-                try:
-                    last_num = int(last_household['service_number'])
-                    new_num = last_num + 1
-                except ValueError:
-                    new_num = 1
-            else:
-                new_num = 1
-            consumer_number = f"{new_num:08d}"  # Format: 00000001
-        
-        # Validate all inputs
-        errors = []
-        
-        # Validate name
-        name_valid, name_error = validate_consumer_name(household_name)
-        if not name_valid:
-            errors.append(name_error)
-        
-        # Validate phone
-        phone_valid, phone_error = validate_phone_number(phone)
-        if not phone_valid:
-            errors.append(phone_error)
-        
-        # Validate consumer number (check uniqueness)
-        consumer_valid, consumer_error = validate_consumer_number(consumer_number, households_collection)
-        if not consumer_valid:
-            errors.append(consumer_error)
+        household, errors = household_service.create_household(request.form)
         
         # If any validation errors, display them and return
         if errors:
             for error in errors:
                 flash(error, "error")
-            return redirect(url_for('index'))
-        
-        # Check if house number already exists (case insensitive)
-        existing_household = households_collection.find_one({
-            "house_number": {"$regex": f"^{house_number}$", "$options": "i"}
-        })
-        
-        if existing_household:
-            flash(f"Household with house number {house_number} already exists.", "error")
         else:
-            # Insert new household with all fields
-            households_collection.insert_one({
-                "household_name": household_name,
-                "service_number": consumer_number,  # Keep field name as service_number in DB
-                "phone": phone,
-                "house_number": house_number,
-                "address": address,
-                "connection_type": connection_type,
-                "outstanding_balance": 0.0,
-                "created_at": datetime.now()
-            })
-            flash(f"Household added successfully! Consumer Number: {consumer_number}", "success")
+            flash(f"Household added successfully! Consumer Number: {household['service_number']}", "success")
     except Exception as e:
         flash(f"Error adding household: {e}", "error")
         
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/add', methods=['POST'])
+@main.route('/add', methods=['POST'])
 @login_required
 def add_bill():
+    bill_service = get_service(BillService)
     if bill_service is None:
         flash("Database connection error. Cannot add bill.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
     try:
         household_id = request.form.get('household_id')
-        units_consumed = float(request.form.get('units'))
+        meter_reading = request.form.get('meter_reading')
         fine_amount = float(request.form.get('fine_amount', 0))
         
-        if units_consumed < 0:
-            flash("Units must be a positive number.", "error")
-            return redirect(url_for('index'))
-        
         bill_data = {
             "household_id": household_id,
-            "units": units_consumed,
             "fine_amount": fine_amount
         }
         
+        if meter_reading:
+            # Units are the delta from the previous reading
+            bill_data["reading"] = float(meter_reading)
+        elif not request.form.get('units'):
+            flash("Enter the units consumed or a meter reading.", "error")
+            return redirect(url_for('main.index'))
+        else:
+            units_consumed = float(request.form.get('units'))
+            if units_consumed < 0:
+                flash("Units must be a positive number.", "error")
+                return redirect(url_for('main.index'))
+            bill_data["units"] = units_consumed
+        
         bill_service.create_bill(bill_data)
         flash(f"Bill generated successfully!", "success")
         
@@ -218,119 +206,623 @@ def add_bill():
     except Exception as e:
         flash(f"An error occurred: {e}", "error")
         
-    return redirect(url_for('index'))
+    return redirect(url_for('main.index'))
 
-@app.route('/delete_bill/<bill_id>', methods=['POST'])
+@main.route('/delete_bill/<bill_id>', methods=['POST'])
 @login_required
 def delete_bill(bill_id):
-    if bills_collection is None:
+    bill_service = get_service(BillService)
+    if bill_service is None:
         flash("Database connection error. Cannot delete bill.", "error")
-        return redirect(url_for('history'))
+        return redirect(url_for('main.history'))
         
     try:
-        result = bills_collection.delete_one({'_id': ObjectId(bill_id)})
-        if result.deleted_count > 0:
+        deleted = bill_service.delete_bill(bill_id)
+        fragment_cache.invalidate_bill(bill_id)
+        if deleted is not None:
             flash("Bill deleted successfully.", "success")
         else:
             flash("Bill not found.", "error")
     except Exception as e:
         flash(f"Error deleting bill: {e}", "error")
         
-    return redirect(url_for('history'))
+    return redirect(url_for('main.history'))
 
-@app.route('/search', methods=['GET', 'POST'])
+@main.route('/search', methods=['GET', 'POST'])
 def search():
+    bill_service = get_service(BillService)
     if request.method == 'POST':
         house_number = request.form.get('house_number')
-        return redirect(url_for('search', q=house_number))
+        return redirect(url_for('main.search', q=house_number))
         
     query = request.args.get('q')
     results = []
     
-    if query and bills_collection is not None:
-        results = list(bills_collection.find({"house_number": query}).sort("date", -1))
-        
-    grand_total = sum(bill.get('total_amount', 0) for bill in results)
+    if query and bill_service is not None:
+        results = bill_service.search_by_house_number(query, reporting=reporting_reads())
         
-    return render_template('history.html', bills=results, search_query=query, is_search=True, grand_total=grand_total)
+    return render_template('history.html', bills=results, search_query=query, is_search=True)
 
-@app.route('/history')
+@main.route('/history')
 def history():
+    bill_service = get_service(BillService)
     all_bills = []
-    if bills_collection is not None:
-        all_bills = list(bills_collection.find().sort("date", -1))
-        
-    grand_total = sum(bill.get('total_amount', 0) for bill in all_bills)
+    if bill_service is not None:
+        # Expanded chunk by chunk while the page streams
+        bills_collection = bill_service.reporting_bills_collection if reporting_reads() else bill_service.bills_collection
+        all_bills = bill_service.iter_expanded(bills_collection.find().sort("date", -1))
     
-    return render_template('history.html', bills=all_bills, is_search=False, grand_total=grand_total)
+    # Pop flashed messages now: the session is saved before the body streams
+    get_flashed_messages(with_categories=True)
+    return stream_template('history.html', bills=all_bills, is_search=False)
 
-@app.route('/bill/<bill_id>')
+@main.route('/bill/<bill_id>')
 def view_bill(bill_id):
-    if bills_collection is None:
+    bill_service = get_service(BillService)
+    if bill_service is None:
         flash("Database connection error.", "error")
-        return redirect(url_for('history'))
+        return redirect(url_for('main.history'))
         
     try:
-        bill = bills_collection.find_one({'_id': ObjectId(bill_id)})
+        bill = bill_service.get_invoice(bill_id)
         if not bill:
             flash("Bill not found.", "error")
-            return redirect(url_for('history'))
+            return redirect(url_for('main.history'))
             
         return render_template('invoice.html', bill=bill)
     except Exception as e:
         flash(f"Error retrieving bill: {e}", "error")
-        return redirect(url_for('history'))
+        return redirect(url_for('main.history'))
 
-@app.route('/pay/<bill_id>')
+@main.route('/pay/<bill_id>')
 def payment_page(bill_id):
-    if bills_collection is None:
+    bill_service = get_service(BillService)
+    if bill_service is None:
         flash("Database connection error.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     try:
-        bill = bills_collection.find_one({'_id': ObjectId(bill_id)})
+        bill = bill_service.get_invoice(bill_id)
         if not bill:
             flash("Invoice not found.", "error")
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
             
         if bill.get('status') == 'Paid':
             flash("This bill is already paid.", "info")
-            return redirect(url_for('view_bill', bill_id=bill_id))
+            return redirect(url_for('main.view_bill', bill_id=bill_id))
             
-        return render_template('payment.html', bill=bill)
+        return render_template('payment.html', bill=bill, idempotency_key=new_idempotency_key())
     except Exception as e:
         flash(f"Error loading payment page: {str(e)}", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
 
-@app.route('/process_payment/<bill_id>', methods=['POST'])
+@main.route('/process_payment/<bill_id>', methods=['POST'])
 def process_payment(bill_id):
-    if bills_collection is None:
+    payment_service = get_service(PaymentService)
+    if payment_service is None:
         flash("Database connection error.", "error")
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
         
     try:
-        # Simulate payment processing delay or validation if needed
-        # For now, just assume success
-        
-        result = bills_collection.update_one(
-            {'_id': ObjectId(bill_id)},
-            {'$set': {
-                'status': 'Paid',
-                'payment_date': datetime.now(),
-                'payment_method': 'Credit Card'
-            }}
+        # The form carries a one-time key, so a double submit is a no-op
+        result = payment_service.pay_bill(
+            bill_id,
+            method='Credit Card',
+            idempotency_key=request.form.get('idempotency_key')
         )
         
-        if result.modified_count > 0:
+        # A double submit replays the first submission's outcome
+        if result['outcome'] == 'paid':
             flash("Payment successful! Thank you.", "success")
+        elif result['outcome'] == 'already_paid':
+            flash("This bill is already paid.", "info")
+        elif result['outcome'] == 'duplicate':
+            flash("Your payment is still being processed.", "info")
         else:
             flash("Payment failed or bill already paid.", "error")
             
-        return redirect(url_for('view_bill', bill_id=bill_id))
+        return redirect(url_for('main.view_bill', bill_id=bill_id))
         
     except Exception as e:
         flash(f"Error processing payment: {str(e)}", "error")
-        return redirect(url_for('view_bill', bill_id=bill_id))
+        return redirect(url_for('main.view_bill', bill_id=bill_id))
+
+@main.route('/payments/batch', methods=['POST'])
+@login_required
+def batch_payments():
+    payment_service = get_service(PaymentService)
+    if payment_service is None:
+        return jsonify({"error": "Database connection error."}), 503
+        
+    payments = request.get_json(silent=True)
+    if isinstance(payments, dict):
+        payments = payments.get('payments')
+    if not isinstance(payments, list):
+        return jsonify({"error": "Expected a JSON list of payments."}), 400
+        
+    outcomes = payment_service.process_batch(payments)
+    counts = {}
+    for result in outcomes:
+        counts[result['outcome']] = counts.get(result['outcome'], 0) + 1
+        
+    return jsonify({"counts": counts, "outcomes": outcomes})
+
+@main.route('/payments/import', methods=['GET', 'POST'])
+@login_required
+def import_payments():
+    payment_service = get_service(PaymentService)
+    if request.method == 'GET':
+        return render_template('payments_import.html')
+        
+    if payment_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.import_payments'))
+        
+    upload = request.files.get('payments_file')
+    if upload is None or not upload.filename:
+        flash("Please choose a reconciliation file.", "error")
+        return redirect(url_for('main.import_payments'))
+        
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        summary = payment_service.import_file(stream)
+        
+        report = io.StringIO()
+        payment_service.write_outcome_report(summary['outcomes'], report)
+        filename = f"payment_outcomes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        
+        return Response(
+            report.getvalue(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+    except Exception as e:
+        flash(f"Error importing payments: {e}", "error")
+        return redirect(url_for('main.import_payments'))
+
+@main.route('/reports/aging')
+@login_required
+def aging_report():
+    aging_service = get_service(AgingReportService)
+    if aging_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.index'))
+        
+    try:
+        report = aging_service.get_aging_report(reporting=reporting_reads())
+        return render_template('aging_report.html', report=report)
+    except Exception as e:
+        flash(f"Error building aging report: {e}", "error")
+        return redirect(url_for('main.index'))
+
+@main.route('/reports/aging.csv')
+@login_required
+def aging_report_csv():
+    aging_service = get_service(AgingReportService)
+    if aging_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.index'))
+        
+    view = request.args.get('view', 'household')
+    report = aging_service.get_aging_report(reporting=reporting_reads())
+    filename = f"aging_{view}_{report['generated_at'].strftime('%Y%m%d')}.csv"
+    
+    return Response(
+        aging_service.export_csv(report, view=view),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@main.route('/admin/slow-queries')
+@login_required
+def slow_queries():
+    db = get_db()
+    if db is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.index'))
+
+    try:
+        shapes = top_slow_shapes(db, limit=request.args.get('limit', 50, type=int))
+        return render_template('slow_queries.html', shapes=shapes, threshold_ms=get_threshold_ms())
+    except Exception as e:
+        flash(f"Error loading slow queries: {e}", "error")
+        return redirect(url_for('main.index'))
+
+@main.route('/admin/jobs')
+@login_required
+def jobs():
+    job_service = get_service(JobService)
+    if job_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.index'))
+        
+    return render_template('jobs.html', jobs=job_service.list_jobs())
+
+@main.route('/admin/jobs/generate-bills', methods=['POST'])
+@login_required
+def generate_bills_job():
+    job_service = get_service(JobService)
+    if job_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.jobs'))
+        
+    job_id = job_service.enqueue('generate_bills', {'area': request.form.get('area', '').strip()},
+                                 created_by=current_user.id)
+    flash(f"Bill generation queued as job {job_id}.", "success")
+    return redirect(url_for('main.job_detail', job_id=str(job_id)))
+
+@main.route('/admin/jobs/import-households', methods=['POST'])
+@login_required
+def import_households_job():
+    job_service = get_service(JobService)
+    if job_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.jobs'))
+        
+    upload = request.files.get('households_file')
+    if upload is None or not upload.filename:
+        flash("Please choose a households file.", "error")
+        return redirect(url_for('main.jobs'))
+        
+    try:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        job_id = job_service.enqueue_household_import(stream, created_by=current_user.id)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('main.jobs'))
+    flash(f"Household import queued as job {job_id}.", "success")
+    return redirect(url_for('main.job_detail', job_id=str(job_id)))
+
+@main.route('/admin/jobs/<job_id>')
+@login_required
+def job_detail(job_id):
+    job_service = get_service(JobService)
+    if job_service is None:
+        flash("Database connection error.", "error")
+        return redirect(url_for('main.jobs'))
+        
+    job = job_service.get_job(ObjectId(job_id)) if ObjectId.is_valid(job_id) else None
+    if job is None:
+        flash("Job not found.", "error")
+        return redirect(url_for('main.jobs'))
+    return render_template('job_detail.html', job=job)
+
+# ==================================================================================
+# MAINTENANCE COMMANDS (`flask apply-fines` / `flask archive-bills` from cron,
+# `flask compact-bills` once, `flask tariffs` / `flask publish-tariff` /
+# `flask simulate-tariff` for tariff plans, `flask import-readings` per reading round,
+# `flask refresh-kpis` from cron, `flask backfill-rollups` once and after repairs,
+# `flask run-jobs` to finish abandoned background jobs,
+# `flask import-consumers` / `flask import-bills` for operator batches,
+# `flask print-invoices` per billing cycle)
+# ==================================================================================
+
+@click.command('apply-fines')
+@click.option('--interval', type=float, default=0,
+              help='Repeat every N seconds instead of running once.')
+@click.option('--batch-size', type=int, default=OVERDUE_BATCH_SIZE,
+              help='Bills updated per batch.')
+def apply_fines_command(interval, batch_size):
+    """Apply the late payment fine to overdue unpaid bills."""
+    overdue_service = get_service(OverdueService)
+    if overdue_service is None:
+        raise click.ClickException("Database connection error.")
+
+    def report(result):
+        click.echo(
+            f"Fined {result['processed']} overdue bills in {result['batches']} batches "
+            f"({result['seconds']:.2f}s, {result['bills_per_second']:.0f} bills/s)"
+        )
+
+    if interval > 0:
+        overdue_service.run_forever(interval, batch_size=batch_size, report=report)
+    else:
+        report(overdue_service.apply_overdue_fines(batch_size=batch_size))
+
+@click.command('refresh-kpis')
+def refresh_kpis_command():
+    """Recompute the dashboard KPI document from scratch."""
+    kpi_service = get_service(KpiService)
+    if kpi_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    kpis = kpi_service.refresh()
+    click.echo(
+        f"Outstanding ₹{kpis['outstanding_amount']:.2f} on {kpis['unpaid_bills']} bills, "
+        f"{kpis['cycle_bills']} bills in {kpis['cycle']}, "
+        f"₹{kpis['collected_today']:.2f} collected today"
+    )
+
+@click.command('backfill-rollups')
+def backfill_rollups_command():
+    """Rebuild the monthly consumption rollups from all bills (hot and archived)."""
+    rollup_service = get_service(RollupService)
+    if rollup_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    summary = rollup_service.backfill()
+    click.echo(
+        f"Rebuilt {summary['household']} household and {summary['connection_type']} connection type "
+        f"rollups, removed {summary['removed']} stale ones in {summary['seconds']:.1f}s"
+    )
+
+@click.command('run-jobs')
+def run_jobs_command():
+    """Run abandoned background jobs (queued or stale) to completion in the foreground."""
+    job_service = get_service(JobService)
+    if job_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    while True:
+        job = job_service.claim()
+        if job is None:
+            break
+        status = job_service.run(job=job)
+        job = job_service.get_job(job['_id'])
+        click.echo(f"Job {job['_id']} ({job['kind']}): {status}, {job['processed']} processed, "
+                   f"{job['failed']} failed")
+
+@click.command('archive-bills')
+@click.option('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS,
+              help='Archive paid bills older than this many days.')
+@click.option('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+              help='Bills moved per batch.')
+def archive_bills_command(older_than_days, batch_size):
+    """Move old paid bills to the archive collection (safe to re-run)."""
+    archive_service = get_service(ArchiveService)
+    if archive_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    result = archive_service.archive_paid_bills(older_than_days=older_than_days, batch_size=batch_size)
+    click.echo(
+        f"Archived {result['archived']} paid bills of {result['households']} households "
+        f"in {result['batches']} batches ({result['seconds']:.2f}s)"
+    )
+
+@click.command('compact-bills')
+@click.option('--batch-size', type=int, default=MIGRATION_BATCH_SIZE,
+              help='Bills rewritten per batch.')
+def compact_bills_command(batch_size):
+    """Migrate stored bills to the compact schema (safe to re-run)."""
+    bill_service = get_service(BillService)
+    if bill_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    result = bill_service.migrate_to_compact(batch_size=batch_size)
+    click.echo(
+        f"Compacted {result['migrated']} bills in {result['seconds']:.2f}s; "
+        f"{result['kept']} kept in full form (breakdown differs from the current tariff)"
+    )
+
+def parse_slabs(value):
+    """Parse '50:1.5,50:2.5,*:4.5' into [(50.0, 1.5), (50.0, 2.5), (None, 4.5)]."""
+    slabs = []
+    try:
+        for part in value.split(','):
+            limit, rate = part.split(':')
+            slabs.append((None if limit.strip() in ('*', 'inf') else float(limit), float(rate)))
+    except ValueError:
+        raise click.BadParameter("Use units:rate pairs, e.g. 50:1.5,50:2.5,*:4.5")
+    if slabs[-1][0] is not None:
+        raise click.BadParameter("The last slab must be open ended (*:rate), e.g. 50:1.5,50:2.5,*:4.5")
+    return slabs
+
+@click.command('tariffs')
+def list_tariffs_command():
+    """List tariff plans and the plan in force for each connection type."""
+    db = get_db()
+    if db is None:
+        raise click.ClickException("Database connection error.")
+    
+    tariff_registry.load(db)
+    for plan in tariff_registry.plans:
+        slabs = ", ".join(f"{'*' if limit == float('inf') else f'{limit:g}'}@{rate:g}" for limit, rate in plan.slabs)
+        until = f" to {plan.effective_to:%Y-%m-%d}" if plan.effective_to else ""
+        since = "always" if plan.effective_from == datetime.min else f"from {plan.effective_from:%Y-%m-%d}"
+        click.echo(f"v{plan.version:<4} {plan.connection_type:<11} {since}{until}  "
+                   f"min {plan.minimum_charge:g}  [{slabs}]")
+    for connection_type in CONNECTION_TYPES:
+        click.echo(f"In force for {connection_type}: v{tariff_registry.plan_for(connection_type).version}")
+
+@click.command('publish-tariff')
+@click.option('--connection-type', type=click.Choice(CONNECTION_TYPES), required=True)
+@click.option('--effective-from', type=click.DateTime(), required=True)
+@click.option('--effective-to', type=click.DateTime(), default=None)
+@click.option('--slabs', required=True, help="units:rate pairs, last one open ended, e.g. 50:1.5,50:2.5,*:4.5")
+@click.option('--minimum-charge', type=float, required=True)
+def publish_tariff_command(connection_type, effective_from, effective_to, slabs, minimum_charge):
+    """Publish a new tariff plan (running workers pick it up on their next check)."""
+    db = get_db()
+    if db is None:
+        raise click.ClickException("Database connection error.")
+    
+    try:
+        plan = tariff_registry.publish(db, connection_type, parse_slabs(slabs), minimum_charge,
+                                       effective_from, effective_to)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Published tariff v{plan.version} for {connection_type} from {effective_from:%Y-%m-%d}")
+
+@click.command('import-readings')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+def import_readings_command(csv_file):
+    """Record meter readings from a CSV with service_number, reading, read_at columns."""
+    meter_service = get_service(MeterReadingService)
+    if meter_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    rows = csv.DictReader(csv_file)
+    inserted = anomalies = offset = 0
+    while True:
+        chunk = list(itertools.islice(rows, READING_IMPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+        result = meter_service.add_readings(chunk, source='import')
+        inserted += result['inserted']
+        anomalies += result['anomalies']
+        for rejected in result['rejected']:
+            # +2: header line and 1-based line numbers
+            click.echo(f"line {offset + rejected['index'] + 2}: {rejected['error']}", err=True)
+        offset += len(chunk)
+    click.echo(f"Recorded {inserted} of {offset} readings ({anomalies} flagged as anomalies)")
+
+def batch_import_options(command):
+    """Options shared by the operator batch import commands."""
+    command = click.argument('records_file', type=click.File('r', encoding='utf-8-sig'), default='-')(command)
+    command = click.option('--format', 'record_format', type=click.Choice(RECORD_FORMATS), default='csv',
+                           help='csv (with header) or jsonl (one JSON object per line).')(command)
+    command = click.option('--workers', type=click.IntRange(1), default=BATCH_WORKERS,
+                           help='Chunks written in parallel.')(command)
+    command = click.option('--chunk-size', type=click.IntRange(1), default=BATCH_CHUNK_SIZE,
+                           help='Records validated and written per chunk.')(command)
+    command = click.option('--rejects', type=click.File('w'), default=None,
+                           help='Write every rejected record (line and errors) here as JSON lines.')(command)
+    return command
+
+def run_batch_import(kind, records_file, record_format, workers, chunk_size, rejects):
+    batch_service = get_service(BatchImportService)
+    if batch_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    on_reject = (lambda error: rejects.write(json.dumps(error) + "\n")) if rejects else None
+    run = batch_service.import_consumers if kind == 'consumers' else batch_service.import_bills
+    summary = run(read_records(records_file, record_format), workers=workers, chunk_size=chunk_size,
+                  on_reject=on_reject)
+    # One JSON document on stdout, for scripts
+    click.echo(json.dumps(summary))
+
+@click.command('import-consumers')
+@batch_import_options
+def import_consumers_command(records_file, record_format, workers, chunk_size, rejects):
+    """Register consumers from a CSV/JSON lines file (or stdin with '-'), without prompts."""
+    run_batch_import('consumers', records_file, record_format, workers, chunk_size, rejects)
+
+@click.command('import-bills')
+@batch_import_options
+def import_bills_command(records_file, record_format, workers, chunk_size, rejects):
+    """Generate bills from service_number + units (or reading) records, without prompts."""
+    run_batch_import('bills', records_file, record_format, workers, chunk_size, rejects)
+
+@click.command('print-invoices')
+@click.argument('path')
+@click.option('--status', default='Unpaid', show_default=True,
+              help="Bill status to print ('all' for every bill).")
+@click.option('--since', type=click.DateTime(), default=None, help='Only bills dated on or after this date.')
+@click.option('--paged/--no-paged', default=True, help='Put every invoice on its own page.')
+@click.option('--workers', type=int, default=None, help='Rendering processes (default: by cycle size).')
+def print_invoices_command(path, status, since, paged, workers):
+    """Render the invoices of a billing cycle into one print spool file."""
+    bill_service = get_service(BillService)
+    if bill_service is None:
+        raise click.ClickException("Database connection error.")
+    
+    query = {} if status == 'all' else {'status': status}
+    if since is not None:
+        query['date'] = {'$gte': since}
+    expected_count = bill_service.reporting_bills_collection.count_documents(query)
+    # Bills stream as compact records, so memory stays flat however large the cycle
+    result = write_print_spool(bill_service.iter_records(query), path, paged=paged, workers=workers,
+                               expected_count=expected_count)
+    click.echo(f"Printed {result['invoices']:,} invoices to {path} "
+               f"({result['seconds']:.1f}s, {result['invoices_per_second']:,.0f} invoices/s)")
+
+@click.command('export-consumption')
+@click.argument('path')
+def export_consumption_command(path):
+    """Write a columnar snapshot of all bills, archived ones included (for simulate-tariff --snapshot)."""
+    # numpy is only needed by the simulator; keep it out of web worker startup
+    from services.tariff_simulator import export_snapshot
+    
+    bills_collection = get_collection('electricity_billing')
+    if bills_collection is None:
+        raise click.ClickException("Database connection error.")
+    
+    meta = export_snapshot(reporting_collection(bills_collection), path)
+    click.echo(f"Exported {meta['bills']:,} bills to {path}")
+
+@click.command('simulate-tariff')
+@click.option('--candidates', 'candidates_path', required=True, type=click.Path(exists=True),
+              help='JSON file with candidate tariffs.')
+@click.option('--snapshot', type=click.Path(exists=True), default=None,
+              help='Columnar snapshot from export-consumption (default: stream from MongoDB).')
+@click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--json', 'json_path', type=click.Path(), default=None, help='Also write the report as JSON.')
+def simulate_tariff_command(candidates_path, snapshot, workers, json_path):
+    """Re-price all historical bills under candidate tariffs and report revenue deltas."""
+    from services.tariff_simulator import TariffSimulator
+    from modules.output_handler import format_simulation_report
+    
+    db = get_db()
+    if db is None:
+        raise click.ClickException("Database connection error.")
+    
+    try:
+        candidates = TariffSimulator.load_candidates(candidates_path)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    
+    report = TariffSimulator(db).simulate(candidates, snapshot_path=snapshot, workers=workers)
+    click.echo(format_simulation_report(report))
+    if json_path:
+        with open(json_path, 'w') as json_file:
+            json.dump(report, json_file, indent=2)
+
+# ==================================================================================
+# APPLICATION FACTORY
+# ==================================================================================
+
+def create_app():
+    """
+    Create and configure the Flask application.
+    
+    No database connection is made here: each process creates its own
+    MongoClient on first use (see services/database.py), so importing this
+    module and booting workers stay fast even when MongoDB is slow.
+    
+    Output:
+    - Flask: Configured application
+    
+    Examples:
+    >>> app = create_app()          # flask run / python app.py
+    $ gunicorn 'app:create_app()'   # production
+    """
+    app = Flask(__name__)
+    # Compiled templates survive restarts, so new workers skip Jinja compilation. Without
+    # JINJA_CACHE_DIR, Jinja keeps them in a per-user 0700 temp folder whose owner it checks,
+    # so another local user cannot plant compiled code
+    cache_dir = os.environ.get('JINJA_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+    app.secret_key = 'your_secret_key_here'  # Change this to a random secret key for session security
+    
+    # Behind a reverse proxy remote_addr is the proxy's; take the client address from the
+    # proxy's X-Forwarded-For entry so rate limits apply per client
+    proxy_hops = int(os.environ.get('TRUSTED_PROXY_HOPS') or TRUSTED_PROXY_HOPS)
+    if proxy_hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops)
+    
+    login_manager.init_app(app)
+    load_shedder.init_app(app)
+    change_listener.init_app(app)
+    app.register_blueprint(main)
+    app.register_blueprint(api)
+    app.cli.add_command(apply_fines_command)
+    app.cli.add_command(archive_bills_command)
+    app.cli.add_command(refresh_kpis_command)
+    app.cli.add_command(backfill_rollups_command)
+    app.cli.add_command(run_jobs_command)
+    app.cli.add_command(compact_bills_command)
+    app.cli.add_command(list_tariffs_command)
+    app.cli.add_command(publish_tariff_command)
+    app.cli.add_command(import_readings_command)
+    app.cli.add_command(import_consumers_command)
+    app.cli.add_command(import_bills_command)
+    app.cli.add_command(print_invoices_command)
+    app.cli.add_command(export_consumption_command)
+    app.cli.add_command(simulate_tariff_command)
+    
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
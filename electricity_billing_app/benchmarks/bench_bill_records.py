@@ -0,0 +1,91 @@
+"""
+Bill Records Benchmark
+----------------------
+Compares the memory held by bills as nested dictionaries and as Bill
+records (modules/records.py), and the cost of converting between them.
+
+Builds --bills synthetic bills (shaped like BillService.create_bill output)
+and reports, per representation:
+- memory held by the whole batch (tracemalloc, includes every string,
+  float and datetime the bills keep alive)
+- pickled size of one spool chunk (what a process pool sends per task)
+- conversion throughput: dict -> record, record -> dict, BSON -> record
+
+Usage:
+    python benchmarks/bench_bill_records.py [--bills 1000000]
+
+The default million bills need about 2.5 GB of memory while the
+dictionaries and records are both alive.
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import gc
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from benchmarks.bench_print_spool import make_bills
+from modules.print_spool import SPOOL_CHUNK_SIZE
+from modules.records import Bill
+
+
+def traced_memory():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def timed(label, func, count):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:8.2f}s  {count / elapsed:12,.0f} bills/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bills', type=int, default=1000000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.bills:,} synthetic bills...")
+    # One traced phase, so strings and datetimes the records keep from the
+    # dictionaries are counted on both sides
+    tracemalloc.start()
+    baseline = traced_memory()
+    bills = make_bills(args.bills)
+    dict_bytes = traced_memory() - baseline
+    records = [Bill.from_document(bill) for bill in bills]
+    del bills
+    record_bytes = traced_memory() - baseline
+    tracemalloc.stop()
+
+    print()
+    sample_size = min(len(records), 100000)
+    documents = timed("Bill.to_document -> dict", lambda: [record.to_document() for record in records[:sample_size]],
+                      sample_size)
+    timed("dict -> Bill.from_document", lambda: [Bill.from_document(bill) for bill in documents], sample_size)
+    encoded = [bson.encode(bill) for bill in documents]
+    timed("BSON -> bson.decode (dict)", lambda: [bson.decode(data) for data in encoded], sample_size)
+    timed("BSON -> Bill.from_bson", lambda: [Bill.from_bson(data) for data in encoded], sample_size)
+    assert all(Bill.from_document(bill).to_document() == bill for bill in documents)
+
+    dict_chunk = len(pickle.dumps(documents[:SPOOL_CHUNK_SIZE], pickle.HIGHEST_PROTOCOL))
+    record_chunk = len(pickle.dumps(records[:SPOOL_CHUNK_SIZE], pickle.HIGHEST_PROTOCOL))
+
+    print(f"\n{'representation':<16} {'memory':>10} {'per bill':>10} {'pickled chunk':>14}")
+    for label, size, chunk in (("dict", dict_bytes, dict_chunk), ("Bill record", record_bytes, record_chunk)):
+        print(f"{label:<16} {size / 1e6:8,.0f} MB {size / len(records):8,.0f} B {chunk / 1e3:11,.0f} kB")
+    print(f"\nRecords hold {record_bytes / dict_bytes:.0%} of the dictionary memory "
+          f"({(dict_bytes - record_bytes) / 1e6:,.0f} MB saved for {len(records):,} bills)")
+
+
+if __name__ == '__main__':
+    main()
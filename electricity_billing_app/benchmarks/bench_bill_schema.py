@@ -0,0 +1,102 @@
+"""
+Bill Schema Size Report
+-----------------------
+Compares the full and compact bill schemas: average BSON document size,
+total collection size, and the cost of a history() style scan.
+
+Without --mongo the scan is measured as BSON decoding of the encoded
+documents (the client-side part of every cursor batch). With --mongo the
+bills are seeded into a scratch database in full form, measured, migrated
+with BillService.migrate_to_compact(), and measured again.
+
+Usage:
+    python benchmarks/bench_bill_schema.py [--bills 100000]
+    MONGO_URI=mongodb://localhost:27017/billing_schema_bench \
+        python benchmarks/bench_bill_schema.py --mongo
+
+The --mongo run drops the database named in MONGO_URI.
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson
+from bson.objectid import ObjectId
+from benchmarks.bench_print_spool import make_bills
+from services.bill_service import BillService
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def report_row(label, count, size, scan_seconds):
+    print(f"{label:<10} {size / count:10.0f} {size / 1024 / 1024:12.1f} "
+          f"{scan_seconds * 1000:12.1f} {count / scan_seconds:14,.0f}")
+
+
+def local_report(bills):
+    count = len(bills)
+    for label, documents in (('full', bills), ('compact', [BillService.compact_bill(bill) for bill in bills])):
+        encoded = b"".join(bson.encode(document) for document in documents)
+        report_row(label, count, len(encoded), best_of(lambda: bson.decode_all(encoded)))
+
+
+def mongo_report(bills, mongo_uri):
+    from pymongo import MongoClient
+
+    client = MongoClient(mongo_uri)
+    db = client.get_default_database()
+    client.drop_database(db.name)
+    collection = db['electricity_billing']
+    for start in range(0, len(bills), 10000):
+        collection.insert_many(bills[start:start + 10000], ordered=False)
+
+    def measure(label):
+        stats = db.command('collStats', collection.name)
+        scan = best_of(lambda: list(collection.find().sort('date', -1)))
+        report_row(label, stats['count'], stats['size'], scan)
+        print(f"{'':<10} storageSize {stats['storageSize'] / 1024 / 1024:.1f} MB (on disk, compressed)")
+
+    measure('full')
+    result = BillService(db).migrate_to_compact()
+    print(f"migrated {result['migrated']:,} bills in {result['seconds']:.1f}s "
+          f"({result['migrated'] / result['seconds']:,.0f} bills/s)")
+    db.command('compact', collection.name)
+    measure('compact')
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bills', type=int, default=100000)
+    parser.add_argument('--mongo', action='store_true', help='Measure a real MongoDB collection')
+    args = parser.parse_args()
+
+    bills = make_bills(args.bills)
+    for bill in bills:
+        bill['household_id'] = ObjectId()
+        bill['notes'] = ''
+
+    print(f"{args.bills:,} bills")
+    print(f"{'schema':<10} {'avg bytes':>10} {'total MB':>12} {'scan ms':>12} {'bills/s':>14}")
+    if args.mongo:
+        mongo_report(bills, os.environ.get('MONGO_URI', 'mongodb://localhost:27017/billing_schema_bench'))
+    else:
+        local_report(bills)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+History Page Rendering Benchmark
+--------------------------------
+Measures rendering of the invoice history table for N bills with a cold and
+a warm fragment cache, and template loading in a fresh worker with and
+without the Jinja bytecode cache.
+
+No database is needed: bills are generated in memory.
+
+Usage:
+    python benchmarks/bench_history_render.py [--bills 20000]
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson.objectid import ObjectId
+from flask import stream_template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app import create_app
+from modules.fragment_cache import fragment_cache
+
+TEMPLATES = ('base.html', 'history.html', 'index.html', 'invoice.html', '_bill_row.html')
+
+
+def make_bills(count):
+    now = datetime.now()
+    return [{
+        '_id': ObjectId(),
+        'household_id': ObjectId(),
+        'household_name': f"consumer {i}",
+        'service_number': f"{i + 1:08d}",
+        'house_number': f"H{i}",
+        'address': f"{i} Main Street",
+        'phone': '9876543210',
+        'connection_type': 'Household',
+        'units': float(i % 400),
+        'rate_breakdown': {'base_amount': 120.0, 'fine_amount': 150.0 if i % 7 == 0 else 0.0,
+                           'previous_dues': 80.0 if i % 3 == 0 else 0.0},
+        'total_amount': 200.0,
+        'date': now - timedelta(days=i % 365),
+        'version': 0
+    } for i in range(count)]
+
+
+def render_history(app, bills):
+    with app.test_request_context('/history'):
+        started = time.perf_counter()
+        size = sum(len(part) for part in stream_template('history.html', bills=iter(bills), is_search=False))
+        return time.perf_counter() - started, size
+
+
+def load_templates(template_dir, bytecode_cache=None):
+    """Load every template in a fresh Environment, as a newly started worker would."""
+    environment = Environment(loader=FileSystemLoader(template_dir), bytecode_cache=bytecode_cache)
+    started = time.perf_counter()
+    for name in TEMPLATES:
+        environment.get_template(name)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bills', type=int, default=20000)
+    args = parser.parse_args()
+
+    app = create_app()
+    bills = make_bills(args.bills)
+    fragment_cache.max_entries = max(fragment_cache.max_entries, args.bills)
+
+    render_history(app, bills[:10])          # compile templates first
+    fragment_cache.clear()
+    cold, size = render_history(app, bills)
+    warm, _ = render_history(app, bills)
+    print(f"history, {args.bills:,} bills ({size / 1e6:.1f} MB HTML)")
+    print(f"  cold fragment cache   {cold * 1000:8.1f} ms")
+    print(f"  warm fragment cache   {warm * 1000:8.1f} ms   ({cold / warm:.1f}x)")
+
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        without_cache = min(load_templates(template_dir) for _ in range(5))
+        load_templates(template_dir, FileSystemBytecodeCache(cache_dir))   # populate
+        with_cache = min(load_templates(template_dir, FileSystemBytecodeCache(cache_dir)) for _ in range(5))
+    print(f"template load in a fresh worker ({len(TEMPLATES)} templates)")
+    print(f"  compile from source   {without_cache * 1000:8.1f} ms")
+    print(f"  bytecode cache        {with_cache * 1000:8.1f} ms   ({without_cache / with_cache:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Payment Import Benchmark
+------------------------
+Measures PaymentService throughput for a bank reconciliation file.
+
+Seeds a scratch database with unpaid bills, writes a reconciliation CSV,
+imports it, then imports the same file again to measure the idempotent
+(all replayed) path.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/bench_payments.py [--payments 100000]
+
+The scratch database (default: billing_bench) is dropped before each run.
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from services.payment_service import PaymentService
+
+
+def seed_bills(db, count):
+    bills = db['electricity_billing']
+    now = datetime.now()
+    batch = []
+    ids = []
+    for i in range(count):
+        batch.append({
+            'service_number': f"{i + 1:08d}",
+            'units': 100.0,
+            'total_amount': 200.0,
+            'date': now,
+            'due_date': now + timedelta(days=15),
+            'status': 'Unpaid'
+        })
+        if len(batch) == 10000:
+            ids.extend(bills.insert_many(batch).inserted_ids)
+            batch = []
+    if batch:
+        ids.extend(bills.insert_many(batch).inserted_ids)
+    return ids
+
+
+def write_reconciliation_file(path, bill_ids):
+    with open(path, 'w', newline='') as handle:
+        handle.write("bill_id,reference,amount,method\n")
+        for i, bill_id in enumerate(bill_ids):
+            # Every 20th payment is short, to exercise the underpaid path
+            amount = "150.00" if i % 20 == 0 else "200.00"
+            handle.write(f"{bill_id},BANK{i:09d},{amount},Bank Transfer\n")
+
+
+def run_import(service, path, chunk_size, label):
+    with open(path, newline='') as handle:
+        summary = service.import_file(handle, chunk_size=chunk_size)
+    print(f"{label:<28} {summary['seconds']:8.2f}s  "
+          f"{summary['payments_per_second']:10,.0f} payments/s  {summary['counts']} "
+          f"({summary['replayed']:,} replayed)")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--payments', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--database', default='billing_bench')
+    args = parser.parse_args()
+
+    client = MongoClient(os.environ.get('MONGO_URI', 'mongodb://localhost:27017'))
+    client.drop_database(args.database)
+    db = client[args.database]
+
+    started = time.perf_counter()
+    bill_ids = seed_bills(db, args.payments)
+    print(f"Seeded {len(bill_ids):,} unpaid bills in {time.perf_counter() - started:.2f}s")
+
+    service = PaymentService(db)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'reconciliation.csv')
+        write_reconciliation_file(path, bill_ids)
+        run_import(service, path, args.chunk_size, "first import")
+        run_import(service, path, args.chunk_size, "re-import (idempotent)")
+
+    client.drop_database(args.database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Print Spool Benchmark
+---------------------
+Compares per-bill formatting through output_handler with the precompiled
+print spool renderer, and measures full spool generation for a cycle.
+
+Usage:
+    python benchmarks/bench_print_spool.py [--bills 100000] [--workers N]
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.tariff_service import TariffService
+from modules.output_handler import format_bill_display, format_bill_breakdown
+from modules.print_spool import render_invoice, write_print_spool
+
+
+def make_bills(count, seed=42):
+    """Generate synthetic bill documents shaped like BillService.create_bill output."""
+    rng = random.Random(seed)
+    cycle_start = datetime(2026, 1, 1, 9, 0, 0)
+    bills = []
+    for i in range(count):
+        units = round(rng.uniform(0, 400), 2)
+        tariff = TariffService.calculate_bill(units)
+        previous_dues = rng.choice((0.0, 0.0, 0.0, round(rng.uniform(50, 800), 2)))
+        fine = rng.choice((0.0, 0.0, 0.0, 0.0, 150.0))
+        bill_date = cycle_start + timedelta(minutes=i % 20000)
+        bills.append({
+            'household_name': f"consumer {i}",
+            'service_number': f"{i + 1:08d}",
+            'house_number': f"MTR-{i + 1:06d}",
+            'address': f"{i % 500} Main Street",
+            'phone': "9876543210",
+            'connection_type': 'Household',
+            'units': units,
+            'rate_breakdown': {
+                'base_amount': tariff['base_amount'],
+                'fine_amount': fine,
+                'previous_dues': previous_dues,
+                'slab_breakdown': tariff['breakdown'],
+                'minimum_charge_applied': tariff['minimum_charge_applied'],
+            },
+            'total_amount': tariff['base_amount'] + fine + previous_dues,
+            'date': bill_date,
+            'due_date': bill_date + timedelta(days=15),
+            'status': 'Unpaid',
+        })
+    return bills
+
+
+def timed(label, func, count):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<40} {elapsed:8.2f}s  {count / elapsed:12,.0f} invoices/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bills', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"Generating {args.bills:,} synthetic bills...")
+    bills = make_bills(args.bills)
+
+    timed("output_handler (display + breakdown)",
+          lambda: [format_bill_display(b) + "\n" + format_bill_breakdown(
+              b['rate_breakdown']['slab_breakdown']) for b in bills], args.bills)
+    timed("print_spool.render_invoice",
+          lambda: [render_invoice(b) for b in bills], args.bills)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'spool.txt')
+        inline = timed("write_print_spool (inline)",
+                       lambda: write_print_spool(bills, path, paged=True, workers=1), args.bills)
+        timed(f"write_print_spool ({args.workers} processes)",
+              lambda: write_print_spool(bills, path, paged=True, workers=args.workers), args.bills)
+        print(f"Spool size: {os.path.getsize(path) / 1e6:,.1f} MB "
+              f"({inline['characters']:,} characters)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Read Routing Benchmark
+----------------------
+Measures how much read load routing moves off the primary of a replica set.
+
+Runs the same mixed workload twice, once with MONGO_READ_PREFERENCE=primary
+and once with secondaryPreferred: searches by house number, full history
+scans and aging reports (the routed paths), plus bill creation and invoice
+lookups (always on the primary). A command listener counts every read and
+write command per replica set member, so the report shows the primary's
+share of reads and the wall time of each run.
+
+Prerequisites - a local three-member replica set, e.g.:
+    for port in 27018 27019 27020; do
+        mkdir -p /tmp/rs$port
+        mongod --replSet rs0 --port $port --dbpath /tmp/rs$port --fork --logpath /tmp/rs$port/mongod.log
+    done
+    mongosh --port 27018 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27018"}, {_id: 1, host: "localhost:27019"},
+        {_id: 2, host: "localhost:27020"}]})'
+
+Usage:
+    MONGO_URI="mongodb://localhost:27018,localhost:27019,localhost:27020/billing_readrouting?replicaSet=rs0" \
+        python benchmarks/bench_read_routing.py [--households 2000] [--rounds 20] [--threads 8]
+
+The database named in MONGO_URI is dropped and re-seeded before the run.
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient, monitoring
+from load_test import seed
+from services.aging_service import AgingReportService
+from services.bill_service import BillService
+
+READ_COMMANDS = ('find', 'aggregate', 'getMore', 'count', 'distinct')
+WRITE_COMMANDS = ('insert', 'update', 'delete', 'findAndModify')
+MODES = ('primary', 'secondaryPreferred')
+
+
+class MemberCounter(monitoring.CommandListener):
+    """Read and write commands sent to each replica set member."""
+
+    def __init__(self):
+        self.counts = Counter()
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in READ_COMMANDS:
+            kind = 'reads'
+        elif event.command_name in WRITE_COMMANDS:
+            kind = 'writes'
+        else:
+            return
+        with self._lock:
+            self.counts[(event.connection_id, kind)] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def take(self):
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+
+def build_workload(rounds, household_ids, house_numbers):
+    """Per round: 40 searches, 2 history scans, 2 aging reports, 10 new bills, 20 invoice views."""
+    operations = []
+    for _ in range(rounds):
+        operations += [('search', random.choice(house_numbers)) for _ in range(40)]
+        operations += [('history', None), ('history', None), ('aging', None), ('aging', None)]
+        operations += [('bill', random.choice(household_ids)) for _ in range(10)]
+        operations += [('invoice', None) for _ in range(20)]
+    random.shuffle(operations)
+    return operations
+
+
+def run_workload(db, operations, threads):
+    # The reporting read preference is resolved when the services are built
+    bill_service = BillService(db)
+    aging_service = AgingReportService(db)
+    bill_service.ensure_indexes()
+    created = []
+
+    def run(operation):
+        kind, argument = operation
+        if kind == 'search':
+            bill_service.search_by_house_number(argument, reporting=True)
+        elif kind == 'history':
+            for _ in bill_service.iter_expanded(bill_service.reporting_bills_collection.find().sort("date", -1)):
+                pass
+        elif kind == 'aging':
+            aging_service.get_aging_report(reporting=True)
+        elif kind == 'bill':
+            created.append(bill_service.create_bill({'household_id': argument, 'units': random.uniform(0, 300)}))
+        elif created:
+            bill_service.get_invoice(random.choice(created)['_id'])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run, operations))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--households', type=int, default=2000)
+    parser.add_argument('--bills-per-household', type=int, default=6)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    mongo_uri = os.environ.get(
+        'MONGO_URI', 'mongodb://localhost:27018,localhost:27019,localhost:27020/billing_readrouting?replicaSet=rs0')
+    household_ids, house_numbers, _ = seed(mongo_uri, args.households, args.bills_per_household)
+    operations = build_workload(args.rounds, household_ids, house_numbers)
+
+    counter = MemberCounter()
+    client = MongoClient(mongo_uri, event_listeners=[counter], maxPoolSize=args.threads + 4)
+    db = client.get_default_database()
+    db.command('ping')
+    primary = client.primary
+    if primary is None or not client.secondaries:
+        print(f"warning: {mongo_uri} is not a replica set with secondaries; every read hits one server")
+    print(f"{args.households:,} households, {args.households * args.bills_per_household:,} bills, "
+          f"{len(operations):,} operations on {args.threads} threads; primary {primary}\n")
+
+    print(f"{'mode':<20} {'seconds':>8} {'reads':>8} {'on primary':>11} {'offloaded':>10} {'writes':>7}")
+    members = {}
+    for mode in MODES:
+        os.environ['MONGO_READ_PREFERENCE'] = mode
+        counter.take()
+        seconds = run_workload(db, operations, args.threads)
+        counts = counter.take()
+        reads = sum(count for (_, kind), count in counts.items() if kind == 'reads')
+        primary_reads = counts[(primary, 'reads')]
+        writes = sum(count for (_, kind), count in counts.items() if kind == 'writes')
+        offloaded = 1 - primary_reads / reads if reads else 0.0
+        print(f"{mode:<20} {seconds:8.2f} {reads:8,} {primary_reads:11,} {offloaded:10.0%} {writes:7,}")
+        members[mode] = counts
+
+    print("\nreads per member")
+    for mode, counts in members.items():
+        per_member = sorted((address, count) for (address, kind), count in counts.items() if kind == 'reads')
+        described = ', '.join(f"{host}:{port}{' (primary)' if (host, port) == primary else ''} {count:,}"
+                              for (host, port), count in per_member)
+        print(f"  {mode:<20} {described}")
+    client.drop_database(db.name)
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+API Serialization Benchmark
+---------------------------
+Measures the cost of encoding 1,000 bill documents (ObjectId, datetime and
+nested rate_breakdown) as JSON, with and without field projection and gzip.
+
+Usage:
+    python benchmarks/bench_serialization.py [--repeat 200]
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import json_util
+from bson.objectid import ObjectId
+from modules import serialization
+from services.tariff_service import TariffService
+
+
+def make_bills(count=1000):
+    now = datetime.now()
+    bills = []
+    for i in range(count):
+        units = float(i % 400)
+        tariff = TariffService.calculate_bill(units)
+        bills.append({
+            '_id': ObjectId(),
+            'household_id': ObjectId(),
+            'household_name': f"consumer {i}",
+            'service_number': f"{i + 1:08d}",
+            'house_number': f"H{i}",
+            'address': f"{i} Main Street",
+            'phone': '9876543210',
+            'connection_type': 'Household',
+            'units': units,
+            'rate_breakdown': {
+                'base_amount': tariff['base_amount'],
+                'fine_amount': 0.0,
+                'previous_dues': 0.0,
+                'slab_breakdown': tariff['breakdown'],
+                'minimum_charge_applied': tariff['minimum_charge_applied']
+            },
+            'total_amount': tariff['base_amount'],
+            'date': now,
+            'due_date': now + timedelta(days=15),
+            'status': 'Unpaid',
+            'notes': ''
+        })
+    return bills
+
+
+def stdlib_dumps(data):
+    return json.dumps(data, default=serialization._default, separators=(',', ':')).encode('utf-8')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    bills = make_bills()
+    page = {'data': bills, 'next': None}
+    projected = {'data': [{'_id': b['_id'], 'units': b['units'], 'total_amount': b['total_amount'],
+                           'status': b['status']} for b in bills], 'next': None}
+
+    cases = [
+        ("bson.json_util (extended JSON)", lambda: json_util.dumps(page).encode('utf-8')),
+        ("json + default hook", lambda: stdlib_dumps(page)),
+        ("serialization.dumps", lambda: serialization.dumps(page)),
+        ("serialization.dumps, 4 fields", lambda: serialization.dumps(projected)),
+        ("serialization.dumps + gzip(5)", lambda: gzip.compress(serialization.dumps(page), 5)),
+    ]
+
+    backend = 'orjson' if serialization.orjson is not None else 'json (orjson not installed)'
+    print(f"Encoding 1,000 bills per call, serializer backend: {backend}")
+    print(f"{'case':<34} {'ms / 1k bills':>14} {'bytes':>10}")
+    for label, func in cases:
+        seconds = min(timeit.repeat(func, number=args.repeat, repeat=3)) / args.repeat
+        print(f"{label:<34} {seconds * 1000:14.3f} {len(func()):10,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Startup Latency Benchmark
+-------------------------
+Measures import-to-first-request latency of the web application, the way
+a freshly booted worker experiences it.
+
+Each run happens in a new interpreter and reports:
+- import:        time to import app.py
+- create_app:    time to build the Flask application
+- first request: time to serve the first request through the test client
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5] [--path /login]
+
+Use --path /history to include the first MongoDB round trip (requires a
+reachable MONGO_URI).
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside a fresh interpreter; works with both the factory and a
+# module-level `app` object
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import app as module
+imported = time.perf_counter()
+flask_app = module.create_app() if hasattr(module, 'create_app') else module.app
+created = time.perf_counter()
+response = flask_app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'total': served - started,
+    'status': response.status_code,
+}))
+"""
+
+
+def run_once(path):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, path],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/login')
+    args = parser.parse_args()
+
+    results = [run_once(args.path) for _ in range(args.runs)]
+    print(f"GET {args.path} (status {results[-1]['status']}), median of {args.runs} fresh interpreters:")
+    for phase in ('import', 'create_app', 'first_request', 'total'):
+        median = statistics.median(result[phase] for result in results)
+        print(f"  {phase:<14} {median * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Tariff Simulator Benchmark
+--------------------------
+Builds a synthetic columnar snapshot and times TariffSimulator.simulate()
+with two candidate tariffs.
+
+Usage:
+    python benchmarks/bench_tariff_simulator.py [--bills 10000000] [--workers N]
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from services.tariff_simulator import TariffSimulator, MONTH_BASE, SIMULATION_CHUNK_SIZE
+
+CANDIDATES = [
+    {'name': 'flat-household', 'slabs': [[100, 2.0], [None, 5.0]], 'minimum_charge': 30,
+     'connection_types': ['Household']},
+    {'name': 'steeper-top', 'slabs': [[50, 1.5], [50, 2.5], [100, 4.0], [None, 6.0]], 'minimum_charge': 25},
+]
+
+
+def make_snapshot(path, bills, seed=7):
+    """Write `bills` synthetic rows in the export-consumption layout."""
+    rng = np.random.default_rng(seed)
+    units = np.round(rng.gamma(2.0, 80.0, bills), 2)
+    units[rng.random(bills) < 0.02] = 0.0
+    np.save(os.path.join(path, 'units.npy'), units)
+    np.save(os.path.join(path, 'base_amount.npy'), np.zeros(bills))
+    np.save(os.path.join(path, 'connection_type.npy'), rng.choice(3, bills, p=[0.8, 0.15, 0.05]).astype(np.int8))
+    months = 2020 * 12 - MONTH_BASE + rng.integers(0, 72, bills)
+    np.save(os.path.join(path, 'month.npy'), months.astype(np.int16))
+    with open(os.path.join(path, 'meta.json'), 'w') as meta_file:
+        json.dump({'bills': bills, 'connection_types': ['Household', 'Commercial', 'Industrial']}, meta_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--bills', type=int, default=10_000_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=SIMULATION_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as path:
+        started = time.perf_counter()
+        make_snapshot(path, args.bills)
+        print(f"Snapshot of {args.bills:,} bills written in {time.perf_counter() - started:.1f}s")
+
+        simulator = TariffSimulator(None)
+        for workers in sorted({1, args.workers}):
+            report = simulator.simulate(CANDIDATES, snapshot_path=path, workers=workers,
+                                        chunk_size=args.chunk_size)
+            print(f"workers={workers:<3} {report['seconds']:7.1f}s  {report['bills_per_second']:12,.0f} bills/s  "
+                  + "  ".join(f"{c['name']} {c['delta_pct']:+.2f}%" for c in report['candidates']))
+
+
+if __name__ == '__main__':
+    main()
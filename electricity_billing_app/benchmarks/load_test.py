@@ -0,0 +1,321 @@
+"""
+Serving Profile Load Test
+-------------------------
+Starts the application under several serving configurations and reports
+requests/sec and latency percentiles for /history, /search and /add, plus
+/search and /bill on a few hot keys (many customers opening the same
+invoices around a due date). The collapse column is calls / database
+executions of the read coalescer during that scenario, summed over the
+worker processes (sampled from /api/v1/metrics).
+
+The last scenario, /add+flood, posts bills as the admin while as many
+anonymous clients hammer /history; its last column is the share of flood
+requests answered 429/503 by the load shedder.
+
+Prerequisites:
+- A local MongoDB, e.g. `docker compose up -d mongo`
+- gunicorn installed (see requirements.txt)
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017/billing_loadtest \
+        python benchmarks/load_test.py [--duration 20] [--concurrency 32]
+
+The database named in MONGO_URI is dropped and re-seeded (households and
+bills) before the run, so point it at a scratch database.
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+from pymongo import MongoClient
+from services.tariff_service import TariffService
+
+PORT = 5055
+
+# name -> (command, extra environment)
+CONFIGURATIONS = {
+    'flask-dev (threaded)': (
+        [sys.executable, '-m', 'flask', '--app', 'app:create_app()', 'run', '--port', str(PORT)],
+        {}
+    ),
+    'gunicorn sync x4': (
+        ['gunicorn', '-c', 'gunicorn.conf.py', '--worker-class', 'sync', '--workers', '4',
+         '--bind', f'127.0.0.1:{PORT}', '--access-logfile', '/dev/null', 'app:create_app()'],
+        {}
+    ),
+    'gunicorn gthread 2x8': (
+        ['gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{PORT}',
+         '--access-logfile', '/dev/null', 'app:create_app()'],
+        {'GUNICORN_WORKERS': '2', 'GUNICORN_THREADS': '8'}
+    ),
+    'gunicorn gthread 4x4': (
+        ['gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{PORT}',
+         '--access-logfile', '/dev/null', 'app:create_app()'],
+        {'GUNICORN_WORKERS': '4', 'GUNICORN_THREADS': '4'}
+    ),
+}
+
+
+def seed(mongo_uri, households, bills_per_household):
+    """Drop and re-seed the scratch database; return (household ids, house numbers, bill ids)."""
+    client = MongoClient(mongo_uri)
+    db = client.get_default_database()
+    client.drop_database(db.name)
+
+    now = datetime.now()
+    household_docs = [{
+        'household_name': f"consumer {i}",
+        'service_number': f"{i + 1:08d}",
+        'phone': '9876543210',
+        'house_number': f"H{i}",
+        'address': f"{i} Main Street",
+        'connection_type': 'Household',
+        'outstanding_balance': 0.0,
+        'created_at': now
+    } for i in range(households)]
+    household_ids = db['households'].insert_many(household_docs).inserted_ids
+
+    bills = []
+    for household_id, doc in zip(household_ids, household_docs):
+        for month in range(bills_per_household):
+            units = random.uniform(0, 300)
+            tariff = TariffService.calculate_bill(units)
+            bill_date = now - timedelta(days=30 * month)
+            bills.append({
+                'household_id': household_id,
+                'household_name': doc['household_name'],
+                'service_number': doc['service_number'],
+                'house_number': doc['house_number'],
+                'address': doc['address'],
+                'phone': doc['phone'],
+                'connection_type': 'Household',
+                'units': units,
+                'rate_breakdown': {
+                    'base_amount': tariff['base_amount'],
+                    'fine_amount': 0.0,
+                    'previous_dues': 0.0,
+                    'slab_breakdown': tariff['breakdown'],
+                    'minimum_charge_applied': tariff['minimum_charge_applied']
+                },
+                'total_amount': tariff['base_amount'],
+                'date': bill_date,
+                'due_date': bill_date + timedelta(days=15),
+                'status': 'Paid' if month else 'Unpaid',
+                'notes': ''
+            })
+    bill_ids = db['electricity_billing'].insert_many(bills).inserted_ids
+    client.close()
+    return ([str(i) for i in household_ids], [doc['house_number'] for doc in household_docs],
+            [str(i) for i in bill_ids])
+
+
+class Client:
+    """One keep-alive HTTP connection with an admin session cookie."""
+
+    def __init__(self):
+        self.connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+        self.cookie = ''
+
+    def request(self, method, path, form=None):
+        return self.fetch(method, path, form)[0]
+
+    def fetch(self, method, path, form=None):
+        headers = {'Cookie': self.cookie} if self.cookie else {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        content = response.read()
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response.status, content
+
+    # Session cookie shared by all clients: one login per run, so the login
+    # rate limit (anonymous requests) does not throttle client start-up
+    admin_cookie = None
+
+    def login(self):
+        if Client.admin_cookie is None:
+            self.request('POST', '/login', {'username': os.environ.get('ADMIN_USERNAME', 'admin'),
+                                             'password': os.environ.get('ADMIN_PASSWORD', 'admin123')})
+            Client.admin_cookie = self.cookie
+        self.cookie = Client.admin_cookie
+
+
+def wait_until_ready(deadline=30):
+    started = time.time()
+    while time.time() - started < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', PORT, timeout=2)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def run_load(make_request, duration, concurrency):
+    """Hammer one endpoint from `concurrency` threads; return (req/s, latencies, errors)."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        client = Client()
+        client.login()
+        local = []
+        local_errors = 0
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                status = make_request(client)
+                if status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                client = Client()
+                client.login()
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) / duration, latencies, errors[0]
+
+
+def coalescing_totals(samples=40):
+    """Sum read coalescer counters over the worker processes reached by `samples` connections."""
+    by_pid = {}
+    for _ in range(samples):
+        client = Client()
+        client.login()
+        status, content = client.fetch('GET', '/api/v1/metrics')
+        if status == 200:
+            metrics = json.loads(content)
+            by_pid[metrics['pid']] = metrics['read_coalescing']
+    return (sum(stats['calls'] for stats in by_pid.values()),
+            sum(stats['executions'] for stats in by_pid.values()))
+
+
+def flood(path, stop, statuses, lock):
+    """Request path anonymously until stop is set, counting response statuses."""
+    client = Client()
+    local = {}
+    while not stop.is_set():
+        try:
+            status, _ = client.fetch('GET', path)
+        except (OSError, http.client.HTTPException):
+            client = Client()
+            continue
+        local[status] = local.get(status, 0) + 1
+    with lock:
+        for status, count in local.items():
+            statuses[status] = statuses.get(status, 0) + count
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--households', type=int, default=500)
+    parser.add_argument('--bills-per-household', type=int, default=12)
+    parser.add_argument('--config', action='append', choices=list(CONFIGURATIONS),
+                        help='Run only these configurations (repeatable)')
+    args = parser.parse_args()
+
+    mongo_uri = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/billing_loadtest')
+    household_ids, house_numbers, bill_ids = seed(mongo_uri, args.households, args.bills_per_household)
+    hot_house_numbers = house_numbers[:10]
+    hot_bill_ids = bill_ids[:10]
+    print(f"Seeded {len(household_ids)} households, "
+          f"{len(household_ids) * args.bills_per_household} bills into {mongo_uri}\n")
+
+    scenarios = {
+        '/history': lambda c: c.request('GET', '/history'),
+        '/search': lambda c: c.request('GET', '/search?q=' + random.choice(house_numbers)),
+        '/add': lambda c: c.request('POST', '/add', {'household_id': random.choice(household_ids),
+                                                     'units': f"{random.uniform(0, 300):.2f}",
+                                                     'fine_amount': '0'}),
+        '/search hot': lambda c: c.request('GET', '/search?q=' + random.choice(hot_house_numbers)),
+        '/bill hot': lambda c: c.request('GET', '/bill/' + random.choice(hot_bill_ids)),
+    }
+
+    print(f"{'configuration':<24} {'endpoint':<12} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} "
+          f"{'collapse':>9}")
+    for name in args.config or list(CONFIGURATIONS):
+        command, extra_env = CONFIGURATIONS[name]
+        env = dict(os.environ, MONGO_URI=mongo_uri, **extra_env)
+        server = subprocess.Popen(command, cwd=APP_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                  start_new_session=True)
+        try:
+            wait_until_ready()
+            for endpoint, make_request in scenarios.items():
+                calls_before, executions_before = coalescing_totals()
+                rate, latencies, errors = run_load(make_request, args.duration, args.concurrency)
+                calls, executions = coalescing_totals()
+                executions -= executions_before
+                collapse = f"{(calls - calls_before) / executions:8.1f}x" if executions else f"{'-':>9}"
+                print(f"{name:<24} {endpoint:<12} {rate:9.1f} "
+                      f"{statistics.median(latencies) * 1000 if latencies else 0:9.1f} "
+                      f"{percentile(latencies, 0.99) * 1000:9.1f} {errors:7d} {collapse}")
+
+            stop, lock, statuses = threading.Event(), threading.Lock(), {}
+            flooders = [threading.Thread(target=flood, args=('/history', stop, statuses, lock))
+                        for _ in range(args.concurrency)]
+            for thread in flooders:
+                thread.start()
+            try:
+                rate, latencies, errors = run_load(scenarios['/add'], args.duration, args.concurrency)
+            finally:
+                stop.set()
+                for thread in flooders:
+                    thread.join()
+            flooded = sum(statuses.values())
+            rejected = statuses.get(429, 0) + statuses.get(503, 0)
+            shed = f"{100.0 * rejected / flooded:8.0f}%" if flooded else f"{'-':>9}"
+            print(f"{name:<24} {'/add+flood':<12} {rate:9.1f} "
+                  f"{statistics.median(latencies) * 1000 if latencies else 0:9.1f} "
+                  f"{percentile(latencies, 0.99) * 1000:9.1f} {errors:7d} {shed}")
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Bill Creation Stress Test
+-------------------------
+Hammers BillService.create_bill from many threads, first all on one
+household and then each thread on its own household, and checks that no
+arrears were double counted or lost.
+
+Invariant checked per household (no bill is paid during the run):
+- bill_sequence runs 1..n without gaps or duplicates
+- bill k's previous_dues equals the sum of total_amount of bills 1..k-1
+
+Requests that give up after CREATE_BILL_ATTEMPTS lost races are counted
+as conflicts (the API answers 409); they are expected only under extreme
+contention on one household and never break the invariant.
+
+Usage:
+    MONGO_URI=mongodb://localhost:27017/billing_stress \
+        python benchmarks/stress_bill_creation.py [--threads 16] [--bills 25]
+
+The database named in MONGO_URI is dropped first, so point it at a scratch
+database.
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+from services.bill_service import BillService, BillConflictError
+
+
+def seed_households(db, count):
+    households = [{
+        'household_name': f"consumer {i}",
+        'service_number': f"{i + 1:08d}",
+        'phone': '9876543210',
+        'house_number': f"H{i}",
+        'address': f"{i} Main Street",
+        'connection_type': 'Household',
+        'outstanding_balance': 0.0,
+        'created_at': datetime.now()
+    } for i in range(count)]
+    return db['households'].insert_many(households).inserted_ids
+
+
+def hammer(bill_service, household_for_thread, threads, bills_per_thread):
+    """Create bills from `threads` threads at once; return (seconds, conflicts, errors)."""
+    conflicts = []
+    errors = []
+    barrier = threading.Barrier(threads)
+
+    def worker(index):
+        household_id = str(household_for_thread(index))
+        barrier.wait()
+        for _ in range(bills_per_thread):
+            try:
+                bill_service.create_bill({'household_id': household_id, 'units': 10})
+            except BillConflictError:
+                conflicts.append(index)
+            except Exception as e:
+                errors.append(repr(e))
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, len(conflicts), errors
+
+
+def check_household(bills_collection, household_id):
+    """Return a list of invariant violations for one household."""
+    bills = list(bills_collection.find({'household_id': household_id}).sort('bill_sequence', 1))
+    violations = []
+    running_total = 0.0
+    for position, bill in enumerate(bills, start=1):
+        if bill.get('bill_sequence') != position:
+            violations.append(f"{household_id}: sequence {bill.get('bill_sequence')} at position {position}")
+        dues = bill['rate_breakdown']['previous_dues']
+        if not math.isclose(dues, running_total, rel_tol=1e-9, abs_tol=0.005):
+            violations.append(f"{household_id} bill {position}: previous_dues {dues} != {running_total}")
+        running_total += bill['total_amount']
+    return len(bills), violations
+
+
+def report(label, bills, seconds, conflicts, errors, violations):
+    print(f"{label:<28} {bills:7d} bills {seconds:7.2f}s {bills / seconds:9.1f} bills/s "
+          f"{conflicts:4d} conflicts {len(errors):4d} errors {len(violations):4d} violations")
+    for line in (errors + violations)[:5]:
+        print(f"    {line}")
+    return bool(errors or violations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--bills', type=int, default=25, help='Bills per thread')
+    args = parser.parse_args()
+
+    mongo_uri = os.environ.get('MONGO_URI', 'mongodb://localhost:27017/billing_stress')
+    client = MongoClient(mongo_uri, maxPoolSize=args.threads + 4)
+    db = client.get_default_database()
+    client.drop_database(db.name)
+    bill_service = BillService(db)
+
+    household_ids = seed_households(db, args.threads + 1)
+    shared, own = household_ids[0], household_ids[1:]
+
+    seconds, conflicts, errors = hammer(bill_service, lambda index: shared, args.threads, args.bills)
+    bills, violations = check_household(db['electricity_billing'], shared)
+    failed = report(f"same household x{args.threads}", bills, seconds, conflicts, errors, violations)
+
+    seconds, conflicts, errors = hammer(bill_service, lambda index: own[index], args.threads, args.bills)
+    bills, violations = 0, []
+    for household_id in own:
+        count, problems = check_household(db['electricity_billing'], household_id)
+        bills += count
+        violations += problems
+    failed |= report(f"{args.threads} different households", bills, seconds, conflicts, errors, violations)
+
+    client.drop_database(db.name)
+    client.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
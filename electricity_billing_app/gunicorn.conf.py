@@ -0,0 +1,108 @@
+"""
+Gunicorn Configuration
+----------------------
+Production serving profile for the electricity billing application.
+
+Usage:
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Every setting can be overridden from the environment (GUNICORN_* below),
+so the same file serves all deployment sizes.
+
+Worker model:
+- gthread workers: each worker process runs GUNICORN_THREADS request
+  threads. Requests spend most of their time waiting on MongoDB, so threads
+  give concurrency without the memory cost of extra processes
+- Each worker owns one MongoClient whose pool is sized to its thread count
+  (plus headroom for background jobs), so threads never queue for a
+  connection and the server never opens more than
+  workers x MONGO_MAX_POOL_SIZE connections
+- preload_app imports the application once in the master; no MongoDB
+  client exists at that point (see services/database.py). Each worker
+  creates its own client right after fork in post_fork
+
+Reloading:
+- kill -HUP <master pid>   graceful restart of workers with the new config
+- Because the app is preloaded, code changes need a full swap:
+  kill -USR2 <master pid> (start new master), then kill -QUIT <old master>
+- Workers get graceful_timeout seconds to finish in-flight requests
+
+Author: Software Engineering Lab
+Date: 2026-01-27
+"""
+
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# ==================================================================================
+# SOCKET
+# ==================================================================================
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+backlog = _env_int("GUNICORN_BACKLOG", 2048)
+# Served behind one reverse proxy (ALB/nginx): client addresses come from its
+# X-Forwarded-For entry. Set 0 if the port is reachable without the proxy,
+# or clients could pick their own address by sending the header
+os.environ.setdefault("TRUSTED_PROXY_HOPS", "1")
+
+# ==================================================================================
+# WORKERS
+# ==================================================================================
+
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = _env_int("GUNICORN_WORKERS", multiprocessing.cpu_count() + 1)
+threads = _env_int("GUNICORN_THREADS", 8)
+
+# One pooled connection per request thread, plus two for background work
+os.environ.setdefault("MONGO_MAX_POOL_SIZE", str(threads + 2))
+os.environ.setdefault("MONGO_MIN_POOL_SIZE", str(min(threads, 2)))
+# Load shedding keeps public requests to a share of these threads (modules/load_shedding.py)
+os.environ.setdefault("LOAD_SHED_MAX_IN_FLIGHT", str(threads))
+
+# Recycle workers periodically to bound memory growth; jitter avoids all
+# workers restarting at once
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 5000)
+max_requests_jitter = _env_int("GUNICORN_MAX_REQUESTS_JITTER", 500)
+
+# ==================================================================================
+# TIMEOUTS AND KEEP-ALIVE
+# ==================================================================================
+
+timeout = _env_int("GUNICORN_TIMEOUT", 30)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+# Must exceed the reverse proxy's idle timeout for upstream connections (AWS ALB
+# idle timeout 60 s, nginx upstream keepalive_timeout 60 s); otherwise a worker
+# closes a connection the proxy is about to reuse and the client gets a 502.
+# gthread workers park idle connections in the poller, not on a thread
+keepalive = _env_int("GUNICORN_KEEPALIVE", 65)
+
+# ==================================================================================
+# APPLICATION LOADING
+# ==================================================================================
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Create this worker's own MongoClient (never the master's)."""
+    from services import database
+    database.reset()
+    if database.get_client() is not None:
+        server.log.info("Worker %s: MongoDB pool ready (maxPoolSize=%s)",
+                        worker.pid, database.get_client_options()['maxPoolSize'])
+
+
+def worker_exit(server, worker):
+    """Close the worker's MongoDB pool on shutdown."""
+    from services import database
+    database.reset()
@@ -4,9 +4,11 @@ Lab Tasks 1 & 2 - Software Engineering Coursework
 
 This package contains modular components for the billing system:
 - validation: Input validation functions
-- input_handler: User input collection with re-prompting
+- input_handler: User input collection with re-prompting, and batch record reading/validation
 - output_handler: Bill formatting and display
 - constants: System-wide configuration constants
+- statistics: Single-pass summary statistics accumulators
+- records: Compact slotted Bill records for batch code paths
 """
 
 __version__ = "2.0.0"
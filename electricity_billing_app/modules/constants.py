@@ -10,6 +10,7 @@ Date: 2026-01-27
 """
 
 import re
+from datetime import datetime
 
 # ==================================================================================
 # TARIFF RATES (Lab Task 1 Specification)
@@ -32,6 +33,73 @@ MINIMUM_CHARGE = 25.0       # Minimum charge when units consumed = 0
 FINE_AMOUNT = 150.0         # Fine amount after due date
 DUE_DATE_DAYS = 15          # Number of days before bill is due
 
+# ==================================================================================
+# TARIFF VERSIONS
+# ==================================================================================
+
+# Built-in plans, always present in the tariff registry. Further plans are
+# published to the tariff_plans collection (see services/tariff_registry.py).
+# Compact bills store units + tariff_version and the slab breakdown is
+# recomputed from the plan, so a published plan must never be edited.
+TARIFF_VERSION = 1
+TARIFF_VERSIONS = {
+    1: {
+        'connection_type': 'Household',
+        'effective_from': datetime.min,
+        'slabs': TARIFF_SLABS,
+        'minimum_charge': MINIMUM_CHARGE
+    },
+}
+
+# Connection types without plans of their own are priced with this type's plans
+DEFAULT_CONNECTION_TYPE = 'Household'
+CONNECTION_TYPES = ('Household', 'Commercial', 'Industrial')
+
+# Seconds between checks for plans published by other processes
+TARIFF_RELOAD_SECONDS = 30
+
+# ==================================================================================
+# BILL STORAGE
+# ==================================================================================
+
+# 'compact': bills keep identifying fields only (household name/address/phone
+#            and slab breakdown are rebuilt on render)
+# 'full':    legacy documents with everything embedded
+BILL_STORAGE_MODES = ('compact', 'full')
+DEFAULT_BILL_STORAGE_MODE = 'compact'
+# Household fields copied onto full bills and looked up for compact ones
+HOUSEHOLD_SNAPSHOT_FIELDS = ('household_name', 'address', 'phone')
+
+# Optimistic concurrency for bill creation: attempts per bill when another
+# bill for the same household is created at the same time
+CREATE_BILL_ATTEMPTS = 20
+CREATE_BILL_BACKOFF_SECONDS = 0.005      # first back-off window, doubled per attempt
+CREATE_BILL_MAX_BACKOFF_SECONDS = 0.25   # cap on the back-off window
+# Attempts per household when a concurrent registration takes the generated
+# consumer number (same back-off as bills)
+CREATE_HOUSEHOLD_ATTEMPTS = 10
+
+# ==================================================================================
+# ARCHIVAL
+# ==================================================================================
+
+# Paid bills older than this move from the hot collection to the archive
+ARCHIVE_COLLECTION = 'electricity_billing_archive'
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+
+# ==================================================================================
+# METER READINGS
+# ==================================================================================
+
+# Cumulative meter readings (MongoDB time-series collection, one series per household)
+METER_READINGS_COLLECTION = 'meter_readings'
+# A reading is flagged as an anomaly when its daily consumption since the
+# previous reading exceeds this multiple of the household's long-run average
+READING_ANOMALY_FACTOR = 3.0
+# Chart buckets for consumption range queries
+READING_BUCKETS = ('day', 'month')
+
 # ==================================================================================
 # VALIDATION RULES
 # ==================================================================================
@@ -63,7 +131,12 @@ ERROR_MESSAGES = {
     'consumer_invalid': 'Invalid consumer number format (must be numeric)',
     'units_negative': 'Units consumed cannot be negative',
     'units_invalid': 'Units must be a valid number',
+    'fine_invalid': 'Fine amount must be a non-negative number',
     'household_not_found': 'Household/Consumer not found',
+    'bill_conflict': 'Another bill is being generated for this household. Please try again.',
+    'reading_invalid': 'Meter reading must be a non-negative number',
+    'reading_regression': 'Meter reading cannot be lower than an earlier reading (or higher than a later one)',
+    'reading_baseline': 'No earlier meter reading for this household; record an initial reading first',
     'database_error': 'Database operation failed'
 }
 
@@ -77,6 +150,23 @@ SUCCESS_MESSAGES = {
     'payment_recorded': 'Payment recorded successfully'
 }
 
+# ==================================================================================
+# DATABASE CONNECTION (overridable through environment variables)
+# ==================================================================================
+
+DEFAULT_MONGO_URI = 'mongodb://localhost:27017/billing_db'
+
+# Environment variable -> (MongoClient option, default value)
+MONGO_CLIENT_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': ('maxPoolSize', 50),
+    'MONGO_MIN_POOL_SIZE': ('minPoolSize', 0),
+    'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', 60000),
+    'MONGO_CONNECT_TIMEOUT_MS': ('connectTimeoutMS', 5000),
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', 5000),
+    'MONGO_SOCKET_TIMEOUT_MS': ('socketTimeoutMS', 30000),
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', 5000),
+}
+
 # ==================================================================================
 # DISPLAY FORMATS
 # ==================================================================================
@@ -84,3 +174,132 @@ SUCCESS_MESSAGES = {
 CURRENCY_SYMBOL = '₹'
 DATE_FORMAT = '%d-%m-%Y'
 DATETIME_FORMAT = '%d-%m-%Y %H:%M:%S'
+
+# ==================================================================================
+# DASHBOARD KPIs
+# ==================================================================================
+
+# Materialized dashboard document (see services/kpi_service.py)
+KPI_COLLECTION = 'dashboard_kpis'
+KPI_DOCUMENT_ID = 'dashboard'
+RECENT_BILLS_COUNT = 5
+
+# ==================================================================================
+# PAGE RENDERING
+# ==================================================================================
+
+# Rendered bill rows kept per process (about 2 KB each)
+FRAGMENT_CACHE_SIZE = 10000
+# Bills fetched and expanded per step while a history page streams
+HISTORY_STREAM_CHUNK_SIZE = 500
+# Identical concurrent invoice/search reads share one query; its result is
+# reused for this long afterwards (see modules/singleflight.py)
+READ_COALESCE_TTL_SECONDS = 0.5
+READ_COALESCE_MAX_ENTRIES = 10000
+
+# ==================================================================================
+# SLOW QUERY LOG (see services/query_monitor.py)
+# ==================================================================================
+
+# Operations slower than this are recorded (SLOW_QUERY_MS overrides; 0 disables)
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG_COLLECTION = 'slow_queries'
+SLOW_QUERY_SHAPES_COLLECTION = 'slow_query_shapes'
+# Capped log size; the oldest entries are overwritten
+SLOW_QUERY_LOG_BYTES = 16 * 1024 * 1024
+# A shape is explained once it was slow this many times, then at most hourly
+SLOW_QUERY_EXPLAIN_AFTER = 3
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = 3600
+# Slow operations waiting for the writer thread (further ones are dropped)
+SLOW_QUERY_QUEUE_SIZE = 1000
+
+# ==================================================================================
+# BACKGROUND JOBS (see services/job_service.py)
+# ==================================================================================
+
+JOB_COLLECTION = 'jobs'
+JOB_ITEMS_COLLECTION = 'job_items'
+JOB_KINDS = ('import_households', 'generate_bills')
+# Threads per worker process running jobs (JOB_WORKERS overrides)
+JOB_WORKERS = 2
+# Progress is saved after this many items or seconds, whichever comes first
+JOB_CHECKPOINT_ITEMS = 100
+JOB_CHECKPOINT_SECONDS = 5
+# A running job whose progress was not saved for this long is resumed by another worker
+JOB_LEASE_SECONDS = 120
+# Errors kept per job (the failed count keeps counting beyond this)
+JOB_ERROR_LIMIT = 200
+# Rows accepted by one household import
+JOB_MAX_ITEMS = 100000
+
+# ==================================================================================
+# OPERATOR BATCH IMPORTS (`flask import-consumers` / `flask import-bills`)
+# ==================================================================================
+
+# Records validated and written per chunk, and chunks processed in parallel
+BATCH_CHUNK_SIZE = 1000
+BATCH_WORKERS = 4
+# Rejected records listed in the printed summary (--rejects writes all of them)
+BATCH_ERROR_LIMIT = 100
+
+# ==================================================================================
+# RATE LIMITING AND LOAD SHEDDING (see modules/load_shedding.py)
+# ==================================================================================
+
+# Priority class -> limits, highest priority first:
+# - rate/burst: per-client token bucket (requests per second, bucket size); None = unlimited
+# - route_rate/route_burst: token bucket shared by all clients of one route
+# - share: fraction of the worker's request threads the class may occupy
+#   before its new requests are shed with 503
+RATE_LIMIT_CLASSES = {
+    'admin_write': {'rate': None, 'burst': None, 'route_rate': None, 'route_burst': None, 'share': 1.0},
+    'admin_read': {'rate': None, 'burst': None, 'route_rate': None, 'route_burst': None, 'share': 0.9},
+    'public': {'rate': 5, 'burst': 20, 'route_rate': 100, 'route_burst': 200, 'share': 0.6},
+    'scan': {'rate': 0.5, 'burst': 3, 'route_rate': 2, 'route_burst': 5, 'share': 0.25},
+}
+# Anonymous requests to these endpoints read whole collections
+SCAN_ENDPOINTS = ('main.history', 'api.list_bills')
+# Concurrent requests per worker (LOAD_SHED_MAX_IN_FLIGHT overrides; gunicorn.conf.py sets it
+# to GUNICORN_THREADS)
+LOAD_SHED_MAX_IN_FLIGHT = 8
+# Retry-After (seconds) sent with 503 responses
+LOAD_SHED_RETRY_AFTER = 1
+# Client buckets kept per worker (least recently used are dropped)
+RATE_LIMIT_MAX_CLIENTS = 50000
+# Reverse proxies in front of the app whose X-Forwarded-For entry gives the client address
+# (TRUSTED_PROXY_HOPS overrides; gunicorn.conf.py sets it to 1). 0 keeps the socket address
+TRUSTED_PROXY_HOPS = 0
+
+# ==================================================================================
+# READ ROUTING
+# ==================================================================================
+
+# Read preference of the heavy read-only paths (history, search, reports, exports);
+# MONGO_READ_PREFERENCE overrides, 'primary' keeps every read on the primary.
+# Bill creation, dues lookups, invoices and payments always read from the primary
+REPORTING_READ_PREFERENCE = 'secondaryPreferred'
+# Secondaries estimated to lag the primary by more than this are not read from
+# (MONGO_MAX_STALENESS_SECONDS overrides; MongoDB's minimum is 90). A browser session
+# that wrote something also reads from the primary for this long (read-your-writes)
+REPORTING_MAX_STALENESS_SECONDS = 90
+
+# ==================================================================================
+# CACHE INVALIDATION (CHANGE STREAMS)
+# ==================================================================================
+
+# Collections whose changes invalidate in-process caches of every worker
+CHANGE_STREAM_COLLECTIONS = ('households', 'electricity_billing')
+# Seconds between attempts to open a change stream when none is available
+# (standalone server, lost connection)
+CHANGE_STREAM_RETRY_SECONDS = 30
+# Without a change stream, cached fragments expire after this many seconds
+CACHE_FALLBACK_TTL_SECONDS = 30
+
+# ==================================================================================
+# CONSUMPTION ROLLUPS
+# ==================================================================================
+
+# Monthly units, amount and bill count per household and per connection type
+ROLLUP_COLLECTION = 'consumption_rollups'
+# Longest month range one chart request may span
+ROLLUP_MAX_MONTHS = 120
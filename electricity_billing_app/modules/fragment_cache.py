@@ -0,0 +1,106 @@
+"""
+Fragment Cache Module
+---------------------
+In-process cache of rendered HTML fragments (bill rows, household options).
+
+Module: fragment_cache.py
+Purpose: Render each bill row once and reuse it for every history, search and
+         dashboard page until the bill changes
+Input: (key, version) pairs and rendered HTML
+Output: Cached HTML fragments
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- An entry is valid only for the version it was stored with; bills carry a
+  version counter that every payment and fine increments, so a worker never
+  serves a row rendered before another worker changed the bill
+- Payments and deletions in this process also drop the bill's entries right
+  away (invalidate_bill), so stale rows do not linger in memory
+- Writes by other workers (or hosts) drop entries through the change stream
+  listener (services/change_listener.py); while no change stream is open,
+  max_age is set and entries expire after CACHE_FALLBACK_TTL_SECONDS
+- Least recently used entries are evicted beyond max_entries
+- Thread safe; one cache per process
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from modules.constants import FRAGMENT_CACHE_SIZE
+
+# Fragment kinds rendered per bill (see templates/_bill_row.html, _recent_bill.html)
+BILL_FRAGMENTS = ('bill_row', 'recent_bill')
+
+
+class FragmentCache:
+    def __init__(self, max_entries=FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        # Seconds an entry stays valid (None: until invalidated or evicted)
+        self.max_age = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Return the fragment stored for key at this version, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if (entry is None or entry[0] != version or
+                    (self.max_age is not None and time.monotonic() - entry[2] >= self.max_age)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, fragment):
+        with self._lock:
+            self._entries[key] = (version, fragment, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, key, version, render):
+        """
+        Return the cached fragment, rendering and storing it on a miss.
+
+        Input:
+        - key (hashable): Fragment identity, e.g. ('bill_row', bill_id)
+        - version (hashable): Anything that changes when the fragment must change
+        - render (callable): Produces the fragment on a miss
+
+        Output:
+        - The cached or freshly rendered fragment
+        """
+        fragment = self.get(key, version)
+        if fragment is None:
+            fragment = render()
+            self.set(key, version, fragment)
+        return fragment
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_bill(self, bill_id):
+        """Drop every fragment rendered for one bill (after payment or deletion)."""
+        bill_id = str(bill_id)
+        with self._lock:
+            for kind in BILL_FRAGMENTS:
+                self._entries.pop((kind, bill_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'max_age': self.max_age}
+
+
+# Process-wide cache used by the page templates
+fragment_cache = FragmentCache()
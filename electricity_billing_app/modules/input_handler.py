@@ -5,7 +5,7 @@ Handles user input collection with validation and re-prompting.
 
 Module: input_handler.py
 Purpose: Collect and validate user inputs with error handling
-Input: Prompts and validator functions
+Input: Prompts and validator functions, or record files (CSV / JSON lines)
 Output: Validated user data
 Author: Software Engineering Lab
 Date: 2026-01-27
@@ -18,10 +18,23 @@ This module provides generic input collection functions that:
 - Validate using provided validator functions
 - Re-prompt on validation errors
 - Return validated data
+
+Non-interactive mode (operator batches, see `flask import-consumers` /
+`flask import-bills`):
+- read_records() streams records from a CSV or JSON lines file (or stdin)
+- validate_consumer_record() / validate_bill_record() apply the same
+  validators to one record and return every error instead of re-prompting
+- validate_batch() splits a chunk of records into valid and rejected ones
 """
 
-from typing import Callable, Any, Tuple
-from modules.validation import validate_all_consumer_data
+import csv
+import json
+import re
+from typing import Callable, Any, Iterable, Iterator, List, Optional, TextIO, Tuple
+from modules.validation import (validate_consumer_name, validate_phone_number, validate_consumer_number,
+                                validate_units)
+
+RECORD_FORMATS = ('csv', 'jsonl')
 
 
 def get_validated_input(prompt: str, validator_func: Callable, 
@@ -101,12 +114,6 @@ def collect_consumer_details(db_collection=None) -> dict:
     >>> details = collect_consumer_details()
     >>> # Returns: {'household_name': 'John Doe', 'phone': '1234567890', ...}
     """
-    from modules.validation import (
-        validate_consumer_name, 
-        validate_phone_number, 
-        validate_service_number
-    )
-    
     print("\n" + "="*60)
     print("  CONSUMER REGISTRATION")
     print("="*60 + "\n")
@@ -141,7 +148,7 @@ def collect_consumer_details(db_collection=None) -> dict:
     return {
         'household_name': household_name,
         'phone': phone,
-        'consumer_number': consumer_number,
+        'service_number': consumer_number,
         'house_number': house_number,
         'address': address
     }
@@ -173,8 +180,6 @@ def collect_bill_details() -> dict:
     >>> bill_data = collect_bill_details()
     >>> # Returns: {'service_number': 'SVC001', 'units': 150.5}
     """
-    from modules.validation import validate_units
-    
     print("\n" + "="*60)
     print("  BILL GENERATION")
     print("="*60 + "\n")
@@ -191,6 +196,165 @@ def collect_bill_details() -> dict:
     units = float(units_str)
     
     return {
-        'consumer_number': consumer_number,
+        'service_number': consumer_number,
         'units': units
     }
+
+
+# ==================================================================================
+# NON-INTERACTIVE (BATCH) INPUT
+# ==================================================================================
+
+def read_records(stream: TextIO, record_format: str = 'csv') -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    Stream records from a CSV (with header) or JSON lines file.
+    
+    Input:
+    - stream (TextIO): Open file or sys.stdin
+    - record_format (str): 'csv' or 'jsonl'
+    
+    Output:
+    - Iterator of (line number, record dict); record is None for a JSON
+      line that does not hold an object (reported by the validators)
+    
+    Examples:
+    >>> for line, record in read_records(open('bills.csv')):
+    ...     print(line, record['service_number'])
+    """
+    if record_format not in RECORD_FORMATS:
+        raise ValueError(f"Unknown record format: {record_format}")
+    
+    if record_format == 'csv':
+        # Line 1 is the header
+        for line, row in enumerate(csv.DictReader(stream), start=2):
+            yield line, row
+        return
+    
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError:
+            record = None
+        yield line, record if isinstance(record, dict) else None
+
+
+def _text(record: dict, field: str) -> str:
+    value = record.get(field)
+    return '' if value is None else str(value).strip()
+
+
+def validate_consumer_record(record: Optional[dict]) -> Tuple[Optional[dict], List[str]]:
+    """
+    Validate one consumer record with the registration rules.
+    
+    Logic:
+    1. Sanitize the name as HouseholdService does (digits removed, lowercase)
+    2. Validate name and phone; the consumer number only if supplied (it is
+       generated otherwise); house number must be present
+    3. Return the cleaned household fields and every error found
+    
+    Uniqueness (consumer and house numbers) needs the database and is
+    checked by the caller for the whole batch.
+    
+    Input:
+    - record (dict): household_name, phone, house_number and optional
+      service_number, address, connection_type
+    
+    Output:
+    - Tuple (dict or None, list): (cleaned record, []) or (None, [errors])
+    
+    Examples:
+    >>> validate_consumer_record({'household_name': 'John', 'phone': '9876543210', 'house_number': 'H1'})
+    ({'household_name': 'john', ...}, [])
+    """
+    if record is None:
+        return None, ['Malformed record']
+    
+    cleaned = {
+        'household_name': re.sub(r'\d+', '', _text(record, 'household_name')).lower(),
+        'phone': _text(record, 'phone'),
+        'service_number': _text(record, 'service_number'),
+        'house_number': _text(record, 'house_number'),
+        'address': _text(record, 'address'),
+        'connection_type': _text(record, 'connection_type') or 'Household'
+    }
+    errors = []
+    for validator, value in ((validate_consumer_name, cleaned['household_name']),
+                             (validate_phone_number, cleaned['phone'])):
+        is_valid, error_message = validator(value)
+        if not is_valid:
+            errors.append(error_message)
+    if cleaned['service_number']:
+        is_valid, error_message = validate_consumer_number(cleaned['service_number'])
+        if not is_valid:
+            errors.append(error_message)
+    if not cleaned['house_number']:
+        errors.append('House number is required')
+    
+    return (None, errors) if errors else (cleaned, [])
+
+
+def validate_bill_record(record: Optional[dict]) -> Tuple[Optional[dict], List[str]]:
+    """
+    Validate one bill record (service number and units or meter reading).
+    
+    Input:
+    - record (dict): service_number and units, or reading (optional read_at);
+      optional notes
+    
+    Output:
+    - Tuple (dict or None, list): (BillService.create_bill data, []) or
+      (None, [errors])
+    
+    Examples:
+    >>> validate_bill_record({'service_number': '00000001', 'units': '150'})
+    ({'service_number': '00000001', 'units': 150.0}, [])
+    """
+    if record is None:
+        return None, ['Malformed record']
+    
+    errors = []
+    service_number = _text(record, 'service_number')
+    if not service_number:
+        errors.append('Consumer number is required')
+    
+    data = {'service_number': service_number}
+    if _text(record, 'reading'):
+        is_valid, error_message = validate_units(_text(record, 'reading'))
+        if is_valid:
+            data['reading'] = float(record['reading'])
+            if _text(record, 'read_at'):
+                data['read_at'] = _text(record, 'read_at')
+        else:
+            errors.append(error_message)
+    else:
+        is_valid, error_message = validate_units(_text(record, 'units'))
+        if is_valid:
+            data['units'] = float(record['units'])
+        else:
+            errors.append(error_message)
+    if _text(record, 'notes'):
+        data['notes'] = _text(record, 'notes')
+    
+    return (None, errors) if errors else (data, [])
+
+
+def validate_batch(records: Iterable[Tuple[int, Optional[dict]]],
+                   validator: Callable) -> Tuple[List[Tuple[int, dict]], List[dict]]:
+    """
+    Validate a chunk of (line, record) pairs with one of the record validators.
+    
+    Output:
+    - Tuple (list, list): ([(line, cleaned record), ...],
+      [{'line': int, 'errors': [str, ...]}, ...])
+    """
+    valid, rejected = [], []
+    for line, record in records:
+        cleaned, errors = validator(record)
+        if errors:
+            rejected.append({'line': line, 'errors': errors})
+        else:
+            valid.append((line, cleaned))
+    return valid, rejected
@@ -0,0 +1,183 @@
+"""
+Load Shedding Module
+--------------------
+Per-client and per-route rate limiting with priority-based load shedding.
+
+Module: load_shedding.py
+Purpose: Keep bursts on the public pages (search, payment, a scraper on
+         /history) from starving the admin billing routes
+Input: Every request (before_request / teardown_request hooks)
+Output: Fast 429 (rate limited) or 503 (shed) responses with Retry-After
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Each request gets a priority class (RATE_LIMIT_CLASSES): admin_write
+  (logged-in admin or API key, non-GET), admin_read, public (anonymous),
+  scan (anonymous requests to SCAN_ENDPOINTS, which read whole collections)
+- Shedding: a class may only start a request while fewer than
+  share x max_in_flight requests of any class are running in this worker;
+  otherwise 503. Lower classes have smaller shares, so under load the
+  remaining threads are kept for admin requests
+- Rate limiting: token buckets per (class, client) and per (class, route);
+  an empty bucket gives 429 with the seconds until the next token
+- Clients are the admin user, the API key, or the remote address; behind
+  a reverse proxy, create_app() takes it from the X-Forwarded-For entry of
+  the TRUSTED_PROXY_HOPS trusted proxies, otherwise every anonymous visitor
+  would share the proxy's bucket
+- State is in memory, per worker process (no shared store): a client may get
+  up to workers x its rate in total
+- Counters (admitted, rate_limited, shed per class) are exposed by
+  GET /api/v1/metrics
+"""
+
+import hmac
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, g, request
+from flask_login import current_user
+from modules.constants import (RATE_LIMIT_CLASSES, SCAN_ENDPOINTS, LOAD_SHED_MAX_IN_FLIGHT,
+                               LOAD_SHED_RETRY_AFTER, RATE_LIMIT_MAX_CLIENTS)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class LoadShedder:
+    def __init__(self, classes=RATE_LIMIT_CLASSES, max_in_flight=None, max_clients=RATE_LIMIT_MAX_CLIENTS):
+        self.classes = classes
+        self.max_in_flight = max_in_flight
+        self.max_clients = max_clients
+        self.enabled = True
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.in_flight = dict.fromkeys(classes, 0)
+        self.admitted = dict.fromkeys(classes, 0)
+        self.rate_limited = dict.fromkeys(classes, 0)
+        self.shed = dict.fromkeys(classes, 0)
+
+    def init_app(self, app):
+        """Install the hooks (RATE_LIMIT_ENABLED=0 turns them into no-ops)."""
+        self.enabled = os.environ.get('RATE_LIMIT_ENABLED', '1') != '0'
+        if self.max_in_flight is None:
+            self.max_in_flight = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT') or LOAD_SHED_MAX_IN_FLIGHT)
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def classify(self):
+        """(priority class, client key) of the current request."""
+        safe = request.method in SAFE_METHODS
+        if current_user.is_authenticated:
+            return ('admin_read' if safe else 'admin_write'), f"user:{current_user.get_id()}"
+        api_key = os.environ.get('API_KEY')
+        supplied = request.headers.get('X-API-Key')
+        if api_key and supplied and hmac.compare_digest(supplied, api_key):
+            return ('admin_read' if safe else 'admin_write'), 'api-key'
+        return ('scan' if request.endpoint in SCAN_ENDPOINTS else 'public'), f"ip:{request.remote_addr}"
+
+    def _take(self, key, rate, burst, now):
+        """Take one token from a bucket (lock held); return 0, or the seconds until one is available."""
+        tokens, last = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def admit(self, priority, client, route, now=None):
+        """
+        Decide whether a request may run.
+
+        Logic:
+        1. Shed (503) if the worker already runs share x max_in_flight requests
+        2. Take a token from the client's bucket, then from the route's
+        3. Rate limit (429) if either bucket is empty
+        4. Otherwise count the request as in flight
+
+        Input:
+        - priority (str): Class from classify()
+        - client (str): Client key from classify()
+        - route (str): Endpoint name
+
+        Output:
+        - Tuple (int or None, int): (None, 0) when admitted, else (status, Retry-After seconds)
+        """
+        limits = self.classes[priority]
+        now = now if now is not None else time.monotonic()
+        with self._lock:
+            if sum(self.in_flight.values()) >= limits['share'] * self.max_in_flight:
+                self.shed[priority] += 1
+                return 503, LOAD_SHED_RETRY_AFTER
+            wait = 0.0
+            if limits['rate']:
+                wait = self._take(('client', priority, client), limits['rate'], limits['burst'], now)
+            if not wait and limits['route_rate']:
+                wait = self._take(('route', priority, route), limits['route_rate'], limits['route_burst'], now)
+            if wait:
+                self.rate_limited[priority] += 1
+                return 429, max(1, math.ceil(wait))
+            self.in_flight[priority] += 1
+            self.admitted[priority] += 1
+            return None, 0
+
+    def release(self, priority):
+        with self._lock:
+            self.in_flight[priority] -= 1
+
+    # ------------------------------------------------------------------
+    # Flask hooks
+    # ------------------------------------------------------------------
+
+    def _before_request(self):
+        if not self.enabled or request.endpoint == 'static':
+            return None
+        priority, client = self.classify()
+        status, retry_after = self.admit(priority, client, request.endpoint or request.path)
+        if status is None:
+            g.load_shed_class = priority
+            return None
+        return self._reject(status, retry_after)
+
+    def _teardown_request(self, exception=None):
+        priority = g.pop('load_shed_class', None)
+        if priority is not None:
+            self.release(priority)
+
+    @staticmethod
+    def _reject(status, retry_after):
+        # No templates or database: rejecting must stay cheaper than serving
+        message = 'Too many requests, please retry later.' if status == 429 else 'Server busy, please retry shortly.'
+        headers = {'Retry-After': str(retry_after)}
+        if request.path.startswith('/api/'):
+            return Response(json.dumps({'error': message}), status=status, mimetype='application/json',
+                            headers=headers)
+        return Response(message, status=status, mimetype='text/plain', headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'max_in_flight': self.max_in_flight,
+                'in_flight': dict(self.in_flight),
+                'admitted': dict(self.admitted),
+                'rate_limited': dict(self.rate_limited),
+                'shed': dict(self.shed),
+                'buckets': len(self._buckets)
+            }
+
+
+# Process-wide limiter installed by create_app()
+load_shedder = LoadShedder()
@@ -16,11 +16,14 @@ This module provides output formatting functions for:
 - Console bill display
 - Detailed bill breakdown
 - Summary reports
+- Streaming statistics reports (single pass over lists or cursors)
+- Tariff what-if simulation reports
 """
 
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional
 from modules.constants import CURRENCY_SYMBOL, DATE_FORMAT
+from modules.statistics import SummaryAccumulator, summarize_bills, DEFAULT_PERCENTILES
 
 
 def format_bill_display(bill_data: dict) -> str:
@@ -179,22 +182,22 @@ def format_bill_breakdown(breakdown_list: List[dict]) -> str:
     return "\n".join(output)
 
 
-def format_summary_report(bills_list: List[dict]) -> str:
+def format_summary_report(bills_list: Iterable[dict]) -> str:
     """
     Format summary report for multiple bills.
     
     Preconditions:
-    - bills_list is a list of bill dictionaries
+    - bills_list is any iterable of bill dictionaries (list, generator or
+      MongoDB cursor); it is consumed exactly once
     
     Logic:
-    1. Count total bills
-    2. Calculate total amount
-    3. Calculate average consumption
-    4. Format summary statistics
-    5. Return formatted report
+    1. Walk the bills once, accumulating count, units and amount
+    2. Calculate averages from the running totals
+    3. Format summary statistics
+    4. Return formatted report
     
     Input:
-    - bills_list (list): List of bill dictionaries
+    - bills_list (Iterable[dict]): Bill dictionaries
     
     Output:
     - str: Formatted summary report
@@ -204,14 +207,18 @@ def format_summary_report(bills_list: List[dict]) -> str:
     >>> print(format_summary_report(bills))
     # Displays summary statistics
     """
-    if not bills_list:
+    summary = SummaryAccumulator(percentiles=())
+    for bill in bills_list:
+        summary.add(bill)
+    
+    if summary.count == 0:
         return "No bills found"
     
-    total_bills = len(bills_list)
-    total_units = sum(bill.get('units', 0) for bill in bills_list)
-    total_amount = sum(bill.get('total_amount', 0) for bill in bills_list)
-    avg_units = total_units / total_bills if total_bills > 0 else 0
-    avg_amount = total_amount / total_bills if total_bills > 0 else 0
+    total_bills = summary.count
+    total_units = summary.units.total
+    total_amount = summary.amount.total
+    avg_units = summary.units.mean
+    avg_amount = summary.amount.mean
     
     output = []
     output.append("\n" + "="*60)
@@ -225,3 +232,137 @@ def format_summary_report(bills_list: List[dict]) -> str:
     output.append("="*60 + "\n")
     
     return "\n".join(output)
+
+
+def format_statistics_report(bills: Iterable[dict], group_by: Optional[str] = None,
+                             percentiles=DEFAULT_PERCENTILES) -> str:
+    """
+    Format a detailed statistics report over a stream of bills.
+    
+    Preconditions:
+    - bills is any iterable of bill dictionaries (list, generator or
+      MongoDB cursor); it is consumed exactly once with constant memory
+    - group_by is None, 'connection_type' or 'status'
+    
+    Logic:
+    1. Summarize bills in a single pass (Welford mean/variance and
+       P-square percentile estimates for units and amounts)
+    2. Format the overall section
+    3. Format one section per group value, if grouping was requested
+    4. Return formatted report
+    
+    Input:
+    - bills (Iterable[dict]): Bill dictionaries
+    - group_by (str, optional): Bill field to group by
+    - percentiles (tuple): Percentiles to estimate (values between 0 and 1)
+    
+    Output:
+    - str: Formatted statistics report
+    
+    Examples:
+    >>> cursor = bills_collection.find({}, {'units': 1, 'total_amount': 1, 'status': 1})
+    >>> print(format_statistics_report(cursor, group_by='status'))
+    # Displays overall and per-status statistics
+    """
+    summary = summarize_bills(bills, group_by=group_by, percentiles=percentiles)
+    
+    if summary['overall']['count'] == 0:
+        return "No bills found"
+    
+    output = []
+    output.append("\n" + "="*60)
+    output.append("                  STATISTICS REPORT")
+    output.append("="*60)
+    output.extend(_format_statistics_section("ALL BILLS", summary['overall']))
+    
+    for group_value, group_summary in summary['groups'].items():
+        output.extend(_format_statistics_section(f"{group_by.upper()}: {group_value}", group_summary))
+    
+    output.append("="*60 + "\n")
+    
+    return "\n".join(output)
+
+
+def _format_statistics_section(title: str, section: Dict) -> List[str]:
+    """Format one group of a statistics report."""
+    units = section['units']
+    amount = section['amount']
+    
+    lines = []
+    lines.append("-" * 60)
+    lines.append(title)
+    lines.append("-" * 60)
+    lines.append(f"Total Bills       : {section['count']}")
+    lines.append(f"Total Units       : {units['total']:.2f}")
+    lines.append(f"Total Amount      : {CURRENCY_SYMBOL}{amount['total']:.2f}")
+    lines.append(f"Average Units     : {units['mean']:.2f} (std dev {units['std_dev']:.2f})")
+    lines.append(f"Average Amount    : {CURRENCY_SYMBOL}{amount['mean']:.2f} "
+                 f"(std dev {CURRENCY_SYMBOL}{amount['std_dev']:.2f})")
+    
+    for p, value in units['percentiles'].items():
+        label = f"P{p * 100:g} Units"
+        lines.append(f"{label:<18}: {value:.2f}")
+    for p, value in amount['percentiles'].items():
+        label = f"P{p * 100:g} Amount"
+        lines.append(f"{label:<18}: {CURRENCY_SYMBOL}{value:.2f}")
+    
+    return lines
+
+
+def format_simulation_report(report: Dict) -> str:
+    """
+    Format a tariff what-if simulation report (see TariffSimulator.simulate).
+    
+    Input:
+    - report (dict): Simulation report
+    
+    Output:
+    - str: Baseline summary, then per candidate the revenue delta and its
+      split per slab, per connection type and per month
+    """
+    if report['bills'] == 0:
+        return "No bills found"
+    
+    output = []
+    output.append("\n" + "="*72)
+    output.append("                     TARIFF WHAT-IF SIMULATION")
+    output.append("="*72)
+    output.append(f"Bills Re-priced    : {report['bills']:,} in {report['seconds']:.1f}s "
+                  f"({report['bills_per_second']:,.0f} bills/s)")
+    output.append(f"Billed (stored)    : {CURRENCY_SYMBOL}{report['billed']:,.2f}")
+    plans = ", ".join(f"{name} {plan}" for name, plan in report['baseline_plans'].items())
+    output.append(f"Baseline Revenue   : {CURRENCY_SYMBOL}{report['baseline']:,.2f} ({plans})")
+    output.append("")
+    output.append(f"{'Baseline Slab':<28} {'Units':>16} {'Revenue':>18}")
+    for row in report['baseline_slabs']:
+        label = f"{row['connection_type']} {row['plan']} {row['slab']}"
+        output.append(f"{label:<28} {row['units']:>16,.2f} {CURRENCY_SYMBOL}{row['revenue']:>17,.2f}")
+    
+    for candidate in report['candidates']:
+        output.append("-" * 72)
+        output.append(f"CANDIDATE: {candidate['name']}")
+        output.append("-" * 72)
+        output.append(f"Revenue            : {CURRENCY_SYMBOL}{candidate['revenue']:,.2f}")
+        output.append(f"Delta              : {CURRENCY_SYMBOL}{candidate['delta']:+,.2f} "
+                      f"({candidate['delta_pct']:+.2f}%)")
+        
+        output.append("")
+        output.append(f"{'Slab':<16} {'Units':>16} {'Revenue':>18}")
+        for row in candidate['slabs']:
+            output.append(f"{row['slab']:<16} {row['units']:>16,.2f} {CURRENCY_SYMBOL}{row['revenue']:>17,.2f}")
+        
+        output.append("")
+        output.append(f"{'Connection Type':<16} {'Bills':>10} {'Baseline':>15} {'Candidate':>15} {'Delta':>13}")
+        for row in candidate['by_connection_type']:
+            output.append(f"{row['connection_type']:<16} {row['bills']:>10,} {row['baseline']:>15,.2f} "
+                          f"{row['candidate']:>15,.2f} {row['delta']:>+13,.2f}")
+        
+        output.append("")
+        output.append(f"{'Month':<16} {'Bills':>10} {'Baseline':>15} {'Candidate':>15} {'Delta':>13}")
+        for row in candidate['by_month']:
+            output.append(f"{row['month']:<16} {row['bills']:>10,} {row['baseline']:>15,.2f} "
+                          f"{row['candidate']:>15,.2f} {row['delta']:>+13,.2f}")
+    
+    output.append("="*72 + "\n")
+    
+    return "\n".join(output)
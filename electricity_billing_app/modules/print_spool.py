@@ -0,0 +1,305 @@
+"""
+Print Spool Module
+------------------
+Renders invoices for a whole billing cycle into a single print spool file.
+
+Module: print_spool.py
+Purpose: Bulk invoice rendering for printing and mailing
+Input: Iterable of bill dictionaries or Bill records (list, generator or MongoDB cursor)
+Output: Text spool file (optionally paged with form feeds)
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- The invoice layout is compiled once into a format string; separators and
+  currency labels are built once at import time
+- Dates are formatted once per calendar day and cached, as are breakdown
+  rows for full slabs
+- Bills are rendered in chunks; large cycles are spread over a process pool
+- Rendered chunks are written to disk as soon as they are ready, in input
+  order, so memory stays bounded by (workers x chunk size)
+- Bills are rendered from Bill records (modules/records.py): dictionaries
+  are converted as they are chunked, so chunks sent to worker processes
+  pickle as flat tuples with shared slab rows
+
+The rendered text matches format_bill_display() followed by
+format_bill_breakdown() from output_handler.py.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from modules.constants import CURRENCY_SYMBOL, DATE_FORMAT, FINE_AMOUNT
+from modules.records import Bill
+
+# ==================================================================================
+# PRECOMPILED LAYOUT
+# ==================================================================================
+
+PAGE_BREAK = "\f"
+SPOOL_CHUNK_SIZE = 1000           # Bills rendered per worker task
+PARALLEL_THRESHOLD = 20000        # Use a process pool at or above this many bills
+
+_RULE = "=" * 70
+_LINE = "-" * 70
+_CUR = CURRENCY_SYMBOL
+
+_INVOICE_HEAD = (
+    "\n" + _RULE + "\n"
+    "                    ELECTRICITY BILL\n"
+    + _RULE + "\n"
+    "\n"
+    "Bill Date         : {bill_date}\n"
+    "Consumer Number   : {consumer_number}\n"
+    "\n"
+    + _LINE + "\n"
+    "CONSUMER DETAILS\n"
+    + _LINE + "\n"
+    "Name              : {name}\n"
+    "House Number      : {house_number}\n"
+    "Address           : {address}\n"
+    "\n"
+    + _LINE + "\n"
+    "BILLING DETAILS\n"
+    + _LINE + "\n"
+    "Units Consumed    : {units:.2f} units\n"
+    "Current Charges   : " + _CUR + "{base_amount:.2f}\n"
+).format
+
+_PREVIOUS_DUES = ("Previous Dues     : " + _CUR + "{:.2f}\n").format
+
+_TOTALS = (
+    "\n"
+    "Total Amount      : " + _CUR + "{total_amount:.2f}\n"
+    "Due Date          : {due_date}\n"
+    "\n"
+).format
+
+_FINE_APPLIED = (
+    "⚠️  OVERDUE - Fine Applied: " + _CUR + "{fine_amount:.2f}\n"
+    "Amount After Due  : " + _CUR + "{total_amount:.2f}\n"
+).format
+
+_FINE_PENDING = (
+    "Late Payment Fine : " + _CUR + "{fine:.2f} (after {due_date})\n"
+    "Amount After Due  : " + _CUR + "{after_due:.2f}\n"
+).format
+
+_INVOICE_FOOT = (
+    "\n"
+    + _RULE + "\n"
+    "          Thank you for your prompt payment!\n"
+    + _RULE + "\n"
+)
+
+_BREAKDOWN_HEAD = (
+    "\n" + _LINE + "\n"
+    "DETAILED BREAKDOWN\n"
+    + _LINE + "\n"
+    + f"{'Slab':<15} {'Units':<15} {'Rate':<15} {'Amount':<15}\n"
+    + _LINE + "\n"
+)
+_BREAKDOWN_ROW = ("{:<15} {:<15.2f} " + _CUR + "{:<14.2f} " + _CUR + "{:<14.2f}\n").format
+_BREAKDOWN_TOTAL = (_LINE + "\n" + f"{'TOTAL':<15} {'':<15} {'':<15} " + _CUR + "{:<14.2f}\n"
+                    + _LINE + "\n").format
+_NO_BREAKDOWN = "No breakdown available"
+
+# Formatted dates keyed by (year, month, day)
+_date_cache: Dict[tuple, str] = {}
+
+# Formatted breakdown rows keyed by (slab, units, rate, amount); full slabs
+# repeat on almost every invoice
+_row_cache: Dict[tuple, str] = {}
+_ROW_CACHE_LIMIT = 4096
+
+
+def _format_date(value) -> str:
+    """Format a bill date, caching the result per calendar day."""
+    if not isinstance(value, datetime):
+        return str(value)
+    key = (value.year, value.month, value.day)
+    formatted = _date_cache.get(key)
+    if formatted is None:
+        formatted = _date_cache[key] = value.strftime(DATE_FORMAT)
+    return formatted
+
+
+def render_invoice(bill) -> str:
+    """
+    Render a single invoice using the precompiled layout.
+
+    Preconditions:
+    - bill is a full bill (compact bills are passed through
+      BillService.expand_bills(..., with_breakdown=True) first)
+
+    Logic:
+    1. Fill the invoice header template
+    2. Append previous dues and fine sections when applicable
+    3. Append the slab breakdown table
+
+    Input:
+    - bill (Bill or dict): Bill record or document
+
+    Output:
+    - str: Rendered invoice text
+    """
+    if not isinstance(bill, Bill):
+        bill = Bill.from_document(bill)
+    bill_date_str = _format_date(bill.date or datetime.now())
+    due_date_str = _format_date(bill.due_date or datetime.now())
+
+    base_amount = bill.base_amount or 0
+    fine_amount = bill.fine_amount or 0
+    previous_dues = bill.previous_dues or 0
+    total_amount = bill.total_amount or 0
+    house_number = bill.house_number if bill.house_number is not None else 'N/A'
+
+    parts = [_INVOICE_HEAD(
+        bill_date=bill_date_str,
+        consumer_number=bill.service_number if bill.service_number is not None else house_number,
+        name=bill.household_name if bill.household_name is not None else 'N/A',
+        house_number=house_number,
+        address=bill.address if bill.address is not None else 'N/A',
+        units=bill.units or 0,
+        base_amount=base_amount,
+    )]
+
+    if previous_dues > 0:
+        parts.append(_PREVIOUS_DUES(previous_dues))
+
+    parts.append(_TOTALS(total_amount=total_amount, due_date=due_date_str))
+
+    if fine_amount > 0:
+        parts.append(_FINE_APPLIED(fine_amount=fine_amount, total_amount=total_amount))
+    else:
+        parts.append(_FINE_PENDING(fine=FINE_AMOUNT, due_date=due_date_str,
+                                   after_due=total_amount + FINE_AMOUNT))
+
+    parts.append(_INVOICE_FOOT)
+    parts.append("\n")
+
+    slabs = bill.slab_breakdown
+    if slabs:
+        parts.append(_BREAKDOWN_HEAD)
+        total = 0
+        for line in slabs:
+            # SlabLine is a (slab, units, rate, amount) tuple, shared between bills
+            if None in line:
+                line = (line.get('slab', 'N/A'), line.get('units', 0), line.get('rate', 0), line.get('amount', 0))
+            total += line[3]
+            row = _row_cache.get(line)
+            if row is None:
+                if len(_row_cache) >= _ROW_CACHE_LIMIT:
+                    _row_cache.clear()
+                row = _row_cache[line] = _BREAKDOWN_ROW(*line)
+            parts.append(row)
+        parts.append(_BREAKDOWN_TOTAL(total))
+    else:
+        parts.append(_NO_BREAKDOWN)
+
+    return "".join(parts)
+
+
+def render_invoice_chunk(bills: List[Bill], paged: bool = False) -> str:
+    """
+    Render a chunk of invoices into one block of spool text.
+
+    Input:
+    - bills (list): Bill records (or documents)
+    - paged (bool): Terminate each invoice with a form feed
+
+    Output:
+    - str: Concatenated invoices, one per page when paged
+    """
+    separator = "\n" + PAGE_BREAK if paged else "\n\n"
+    return "".join(render_invoice(bill) + separator for bill in bills)
+
+
+def _chunked(bills: Iterable, size: int) -> Iterator[List[Bill]]:
+    iterator = (bill if isinstance(bill, Bill) else Bill.from_document(bill) for bill in bills)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def write_print_spool(bills: Iterable, output_path: str, paged: bool = False,
+                      workers: Optional[int] = None, chunk_size: int = SPOOL_CHUNK_SIZE,
+                      expected_count: Optional[int] = None) -> Dict:
+    """
+    Render all bills of a cycle into a single spool file.
+
+    Preconditions:
+    - bills is any iterable of bill dictionaries or Bill records; it is
+      consumed once
+    - output_path's directory exists and is writable
+
+    Logic:
+    1. Split the bills into chunks of chunk_size
+    2. If the cycle is large (expected_count >= PARALLEL_THRESHOLD) or
+       workers is given, render chunks in a process pool; otherwise inline
+    3. Write each rendered chunk to disk in input order as soon as it is ready
+    4. Return counts and timing
+
+    Input:
+    - bills (Iterable): Bill documents or records
+    - output_path (str): Destination spool file
+    - paged (bool): Put every invoice on its own page (form feed separated)
+    - workers (int, optional): Process pool size; 1 forces inline rendering
+    - chunk_size (int): Bills per rendering task
+    - expected_count (int, optional): Number of bills, used to pick the
+      parallel strategy when bills is a cursor or generator
+
+    Output:
+    - dict: {'invoices': int, 'characters': int, 'seconds': float, 'invoices_per_second': float}
+
+    Examples:
+    >>> cursor = bills_collection.find({'status': 'Unpaid'}).sort('service_number', 1)
+    >>> write_print_spool(cursor, 'cycle_2026_01.txt', paged=True, expected_count=120000)
+    """
+    if expected_count is None and hasattr(bills, '__len__'):
+        expected_count = len(bills)
+
+    use_pool = workers != 1 and (
+        workers is not None or (expected_count or 0) >= PARALLEL_THRESHOLD
+    )
+
+    started = time.perf_counter()
+    invoices = 0
+    characters = 0
+
+    with open(output_path, 'w', encoding='utf-8', newline='') as spool:
+        chunks = _chunked(bills, chunk_size)
+
+        if use_pool:
+            max_workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                # Keep a bounded window of in-flight chunks so a cursor is
+                # never fully materialized
+                window = []
+                for chunk in chunks:
+                    window.append((len(chunk), executor.submit(render_invoice_chunk, chunk, paged)))
+                    if len(window) >= max_workers * 2:
+                        count, future = window.pop(0)
+                        characters += spool.write(future.result())
+                        invoices += count
+                for count, future in window:
+                    characters += spool.write(future.result())
+                    invoices += count
+        else:
+            for chunk in chunks:
+                characters += spool.write(render_invoice_chunk(chunk, paged))
+                invoices += len(chunk)
+
+    elapsed = time.perf_counter() - started
+    return {
+        'invoices': invoices,
+        'characters': characters,
+        'seconds': elapsed,
+        'invoices_per_second': invoices / elapsed if elapsed > 0 else 0.0
+    }
@@ -0,0 +1,194 @@
+"""
+Records Module
+--------------
+Compact typed records for bills in batch code paths.
+
+Module: records.py
+Purpose: Hold hundreds of thousands of bills (print spools, reports) in a
+         fraction of the memory of nested dictionaries
+Input: Bill documents (dicts from MongoDB, or raw BSON)
+Output: Bill and SlabLine records, and documents rebuilt from them
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Bill uses __slots__ (no per-instance __dict__); a bill's
+  rate_breakdown is flattened into the record, so one bill is one object
+  instead of three dictionaries plus one per slab
+- Slab breakdown rows are SlabLine tuples shared between bills: full slabs
+  are identical on almost every bill, so each distinct row is stored once
+  (bounded cache)
+- Low-cardinality strings (connection type, status) are interned
+- Fields a record does not know are kept in `extra`, so
+  Bill.from_document(document).to_document() == document, except that
+  fields stored as None are dropped
+- get(key, default) mirrors dict.get (including 'rate_breakdown'), so code
+  written for bill dictionaries (output_handler, statistics) accepts records
+- Records pickle as plain tuples, which keeps process pool transfers small
+"""
+
+import sys
+from operator import itemgetter
+from typing import Dict, NamedTuple, Optional
+import bson
+
+BILL_FIELDS = ('_id', 'household_id', 'bill_sequence', 'household_name', 'service_number', 'house_number',
+               'address', 'phone', 'connection_type', 'units', 'tariff_version', 'total_amount', 'date',
+               'due_date', 'status', 'notes', 'payment_date', 'version')
+RATE_FIELDS = ('base_amount', 'fine_amount', 'previous_dues', 'minimum_charge_applied')
+
+_BILL_KEYS = frozenset(BILL_FIELDS + ('rate_breakdown',))
+_RATE_KEYS = frozenset(RATE_FIELDS + ('slab_breakdown',))
+
+# Shared slab rows, looked up by (slab, units, rate, amount)
+_slab_lines: Dict[tuple, 'SlabLine'] = {}
+_SLAB_LINE_LIMIT = 65536
+_slab_fields = itemgetter('slab', 'units', 'rate', 'amount')
+
+
+class SlabLine(NamedTuple):
+    """One row of a bill's slab breakdown."""
+    slab: str
+    units: float
+    rate: float
+    amount: float
+
+    @classmethod
+    def from_document(cls, item):
+        try:
+            key = _slab_fields(item)
+        except KeyError:
+            get = item.get
+            key = (get('slab'), get('units'), get('rate'), get('amount'))
+        line = _slab_lines.get(key)
+        if line is None:
+            if len(_slab_lines) >= _SLAB_LINE_LIMIT:
+                _slab_lines.clear()
+            line = cls(*key)
+            # A SlabLine hashes and compares as its plain tuple: store it as its own key
+            _slab_lines[line] = line
+        return line
+
+    def to_document(self):
+        return self._asdict()
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Bill:
+    """One bill; attributes are the document's fields with rate_breakdown flattened."""
+
+    __slots__ = BILL_FIELDS + RATE_FIELDS + ('slab_breakdown', 'extra')
+
+    @classmethod
+    def from_document(cls, document):
+        """
+        Build a record from a bill document (full or compact).
+
+        Input:
+        - document (dict): Bill document
+
+        Output:
+        - Bill
+        """
+        bill = cls.__new__(cls)
+        # Spelled out rather than looped over BILL_FIELDS: this is the hot path of every batch
+        get = document.get
+        bill._id = get('_id')
+        bill.household_id = get('household_id')
+        bill.bill_sequence = get('bill_sequence')
+        bill.household_name = get('household_name')
+        bill.service_number = get('service_number')
+        bill.house_number = get('house_number')
+        bill.address = get('address')
+        bill.phone = get('phone')
+        bill.connection_type = _intern(get('connection_type'))
+        bill.units = get('units')
+        bill.tariff_version = get('tariff_version')
+        bill.total_amount = get('total_amount')
+        bill.date = get('date')
+        bill.due_date = get('due_date')
+        bill.status = _intern(get('status'))
+        bill.notes = get('notes')
+        bill.payment_date = get('payment_date')
+        bill.version = get('version')
+
+        rate_breakdown = get('rate_breakdown') or {}
+        rate_get = rate_breakdown.get
+        bill.base_amount = rate_get('base_amount')
+        bill.fine_amount = rate_get('fine_amount')
+        bill.previous_dues = rate_get('previous_dues')
+        bill.minimum_charge_applied = rate_get('minimum_charge_applied')
+        slabs = rate_get('slab_breakdown')
+        bill.slab_breakdown = tuple(map(SlabLine.from_document, slabs)) if slabs is not None else None
+
+        extra = None
+        if not _BILL_KEYS.issuperset(document):
+            extra = {key: value for key, value in document.items() if key not in _BILL_KEYS}
+        if not _RATE_KEYS.issuperset(rate_breakdown):
+            extra = extra or {}
+            extra['rate_breakdown'] = {key: value for key, value in rate_breakdown.items()
+                                       if key not in _RATE_KEYS}
+        bill.extra = extra
+        return bill
+
+    @classmethod
+    def from_bson(cls, data):
+        """Build a record from one encoded BSON document."""
+        return cls.from_document(bson.decode(data))
+
+    @property
+    def rate_breakdown(self) -> Optional[Dict]:
+        """The nested rate_breakdown dictionary (built on each access)."""
+        breakdown = {name: getattr(self, name) for name in RATE_FIELDS if getattr(self, name) is not None}
+        if self.slab_breakdown is not None:
+            breakdown['slab_breakdown'] = [line.to_document() for line in self.slab_breakdown]
+        if self.extra and 'rate_breakdown' in self.extra:
+            breakdown.update(self.extra['rate_breakdown'])
+        return breakdown or None
+
+    def to_document(self):
+        """
+        Rebuild the bill document (fields that are None are left out).
+
+        Output:
+        - dict: Document with a nested rate_breakdown, ready for BSON encoding
+        """
+        document = {name: getattr(self, name) for name in BILL_FIELDS if getattr(self, name) is not None}
+        rate_breakdown = self.rate_breakdown
+        if rate_breakdown is not None:
+            document['rate_breakdown'] = rate_breakdown
+        if self.extra:
+            document.update((key, value) for key, value in self.extra.items() if key != 'rate_breakdown')
+        return document
+
+    def to_bson(self):
+        return bson.encode(self.to_document())
+
+    def get(self, key, default=None):
+        """dict.get() over the document form of the bill."""
+        if key == 'rate_breakdown':
+            value = self.rate_breakdown
+        elif key in _BILL_KEYS:
+            value = getattr(self, key)
+        else:
+            value = self.extra.get(key) if self.extra else None
+        return default if value is None else value
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in Bill.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(Bill.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"Bill(_id={self._id!r}, service_number={self.service_number!r}, total_amount={self.total_amount!r})"
+
@@ -0,0 +1,64 @@
+"""
+Serialization Module
+--------------------
+Fast JSON encoding of MongoDB documents for the REST API.
+
+Module: serialization.py
+Purpose: Encode bills and households (ObjectId, datetime, nested dicts)
+         to JSON bytes with minimal overhead
+Input: Documents or lists of documents
+Output: UTF-8 JSON bytes
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Uses orjson when installed: datetimes are encoded natively (ISO 8601)
+  and only ObjectId goes through the fallback hook
+- Falls back to the standard json module with the same output shape
+"""
+
+import json
+from datetime import date, datetime
+from bson.objectid import ObjectId
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+
+def _default(value):
+    """Encode types the JSON encoder does not know natively."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(data) -> bytes:
+    """
+    Serialize data to JSON bytes.
+
+    Input:
+    - data: dict/list containing str, numbers, bool, None, ObjectId, datetime
+
+    Output:
+    - bytes: UTF-8 encoded JSON
+
+    Examples:
+    >>> dumps({'_id': ObjectId('65b0c0ffee0000000000abcd'), 'units': 120.0})
+    b'{"_id":"65b0c0ffee0000000000abcd","units":120.0}'
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def loads(data):
+    """Parse JSON bytes or text."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
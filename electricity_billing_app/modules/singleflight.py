@@ -0,0 +1,154 @@
+"""
+Single Flight Module
+--------------------
+Coalesces identical concurrent reads into one database call.
+
+Module: singleflight.py
+Purpose: When many requests ask for the same invoice or search at once
+         (around due dates), run the query once and hand every caller the
+         same result
+Input: (key, function) pairs
+Output: The function's result, shared by all callers with the same key
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- The first caller for a key runs the function; callers arriving while it
+  runs wait for it and receive the same result (or the same exception)
+- A successful result is reused for ttl seconds after it finished (micro
+  cache); errors are never reused
+- forget(key) drops a key after a write (payment, deletion), so the next
+  caller reads fresh data; forget_kind() and clear() serve the change stream
+  listener, which does not know every affected key
+- Results are shared objects: callers must treat them as read only
+- Counters report how many calls were collapsed (collapse ratio =
+  calls / executions)
+- Thread safe; one instance per process
+"""
+
+import threading
+import time
+from modules.constants import READ_COALESCE_TTL_SECONDS, READ_COALESCE_MAX_ENTRIES
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'finished_at')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    def __init__(self, ttl=READ_COALESCE_TTL_SECONDS, max_entries=READ_COALESCE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.joined = 0
+        self.reused = 0
+
+    def do(self, key, function):
+        """
+        Return function(), sharing one execution among concurrent callers.
+
+        Logic:
+        1. If a call for key is in flight, wait for it and return its outcome
+        2. If a call for key finished successfully less than ttl ago, return
+           its result
+        3. Otherwise run function() and publish the outcome to the waiters
+
+        Input:
+        - key (hashable): Identifies the query, e.g. ('bill', bill_id)
+        - function (callable): Runs the query
+
+        Output:
+        - The (shared) result of function()
+
+        Raises:
+        - Whatever function() raised, in the caller that ran it and in every waiter
+
+        Examples:
+        >>> read_coalescer.do(('search', 'H12'), lambda: bill_service.find_bills({'house_number': 'H12'}))
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set():
+                if call.error is None and time.monotonic() - call.finished_at < self.ttl:
+                    self.reused += 1
+                    return call.result
+                call = None
+            if call is not None:
+                self.joined += 1
+                leader = False
+            else:
+                if len(self._calls) >= self.max_entries:
+                    self._prune()
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            raise
+        finally:
+            call.finished_at = time.monotonic()
+            call.done.set()
+        return call.result
+
+    def _prune(self):
+        """Drop finished calls whose results expired (lock held)."""
+        now = time.monotonic()
+        expired = [key for key, call in self._calls.items()
+                   if call.done.is_set() and now - call.finished_at >= self.ttl]
+        for key in expired:
+            del self._calls[key]
+
+    def forget(self, key):
+        """Make the next caller for key run a fresh query (waiters of a running call are unaffected)."""
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def forget_kind(self, kind):
+        """Forget every key whose first element is kind (e.g. 'search')."""
+        with self._lock:
+            for key in [key for key in self._calls if key[0] == kind]:
+                del self._calls[key]
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+    def stats(self):
+        """Counters since start: calls, executions, joined (waited), reused (micro-TTL hits)."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'joined': self.joined,
+                'reused': self.reused,
+                'collapse_ratio': round(self.calls / self.executions, 2) if self.executions else 1.0,
+                'in_flight': sum(1 for call in self._calls.values() if not call.done.is_set())
+            }
+
+
+# Process-wide coalescer for invoice and search reads (see BillService)
+read_coalescer = SingleFlight()
@@ -0,0 +1,274 @@
+"""
+Statistics Module
+-----------------
+Single-pass, constant-memory accumulators for billing reports.
+
+Module: statistics.py
+Purpose: Summarize arbitrarily large streams of bills (lists, generators or
+         MongoDB cursors) without materializing them in memory
+Input: Numeric values (units, amounts) fed one at a time
+Output: Count, total, mean, variance and approximate percentiles
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- RunningStatistics: Welford's online algorithm for count/total/mean/variance
+- StreamingQuantile: P-square (Jain & Chlamtac) estimator, five markers per
+  tracked percentile regardless of how many values are observed
+- SummaryAccumulator: Tracks units and amounts for one group of bills
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+# Percentiles tracked by default for summary reports
+DEFAULT_PERCENTILES = (0.5, 0.9, 0.99)
+
+
+class RunningStatistics:
+    """
+    Running count, total, mean and variance using Welford's algorithm.
+
+    Memory usage is constant; each value is visited exactly once.
+
+    Examples:
+    >>> stats = RunningStatistics()
+    >>> for value in (2, 4, 4, 4, 5, 5, 7, 9):
+    ...     stats.add(value)
+    >>> stats.mean, stats.variance
+    (5.0, 4.0)
+    """
+
+    __slots__ = ('count', 'total', 'mean', '_m2', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value: float) -> None:
+        """Add a single observation."""
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    @property
+    def variance(self) -> float:
+        """Population variance of the observed values (0 when empty)."""
+        return self._m2 / self.count if self.count > 0 else 0.0
+
+    @property
+    def std_dev(self) -> float:
+        """Population standard deviation of the observed values."""
+        return math.sqrt(self.variance)
+
+
+class StreamingQuantile:
+    """
+    Approximate a single percentile with the P-square algorithm.
+
+    The estimator keeps five marker heights and positions and adjusts them
+    with a piecewise-parabolic formula as values arrive, so it never stores
+    the observations themselves.
+
+    Input:
+    - p (float): Percentile to track, between 0 and 1 (e.g. 0.9)
+
+    Examples:
+    >>> median = StreamingQuantile(0.5)
+    >>> for value in range(1, 102):
+    ...     median.add(value)
+    >>> round(median.value)
+    51
+    """
+
+    __slots__ = ('p', '_heights', '_positions', '_desired', '_increments')
+
+    def __init__(self, p: float):
+        if not 0 < p < 1:
+            raise ValueError("Percentile must be between 0 and 1")
+        self.p = p
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value: float) -> None:
+        """Add a single observation."""
+        heights = self._heights
+
+        # Warm-up: collect the first five observations exactly
+        if len(heights) < 5:
+            heights.append(value)
+            if len(heights) == 5:
+                heights.sort()
+            return
+
+        # Find the cell containing the value, widening the extremes if needed
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = max(heights[4], value)
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+
+        positions = self._positions
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        # Adjust the three middle markers towards their desired positions
+        for i in range(1, 4):
+            offset = self._desired[i] - positions[i]
+            if ((offset >= 1 and positions[i + 1] - positions[i] > 1) or
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1)):
+                step = 1 if offset > 0 else -1
+                candidate = self._parabolic(i, step)
+                if not heights[i - 1] < candidate < heights[i + 1]:
+                    candidate = self._linear(i, step)
+                heights[i] = candidate
+                positions[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (h[i + 1] - h[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, step: int) -> float:
+        h, n = self._heights, self._positions
+        return h[i] + step * (h[i + step] - h[i]) / (n[i + step] - n[i])
+
+    @property
+    def value(self) -> float:
+        """Current percentile estimate (exact while fewer than 5 values seen)."""
+        heights = self._heights
+        if not heights:
+            return 0.0
+        if len(heights) < 5:
+            ordered = sorted(heights)
+            index = min(len(ordered) - 1, int(round(self.p * (len(ordered) - 1))))
+            return ordered[index]
+        return heights[2]
+
+
+class SummaryAccumulator:
+    """
+    Accumulate units and amount statistics for one group of bills.
+
+    Input:
+    - percentiles (tuple): Percentiles to estimate for units and amounts
+
+    Output (via to_dict):
+    - dict: {
+        'count': int,
+        'units': {'total', 'mean', 'variance', 'std_dev', 'min', 'max', 'percentiles'},
+        'amount': {... same keys ...}
+      }
+    """
+
+    __slots__ = ('units', 'amount', '_unit_quantiles', '_amount_quantiles')
+
+    def __init__(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES):
+        self.units = RunningStatistics()
+        self.amount = RunningStatistics()
+        self._unit_quantiles = [StreamingQuantile(p) for p in percentiles]
+        self._amount_quantiles = [StreamingQuantile(p) for p in percentiles]
+
+    @property
+    def count(self) -> int:
+        return self.units.count
+
+    def add(self, bill: dict) -> None:
+        """Add one bill's units and total amount."""
+        units = float(bill.get('units', 0) or 0)
+        amount = float(bill.get('total_amount', 0) or 0)
+
+        self.units.add(units)
+        self.amount.add(amount)
+        for estimator in self._unit_quantiles:
+            estimator.add(units)
+        for estimator in self._amount_quantiles:
+            estimator.add(amount)
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'units': _describe(self.units, self._unit_quantiles),
+            'amount': _describe(self.amount, self._amount_quantiles),
+        }
+
+
+def _describe(stats: RunningStatistics, quantiles) -> Dict:
+    return {
+        'total': stats.total,
+        'mean': stats.mean,
+        'variance': stats.variance,
+        'std_dev': stats.std_dev,
+        'min': stats.minimum if stats.minimum is not None else 0.0,
+        'max': stats.maximum if stats.maximum is not None else 0.0,
+        'percentiles': {q.p: q.value for q in quantiles},
+    }
+
+
+def summarize_bills(bills: Iterable[dict], group_by: Optional[str] = None,
+                    percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict:
+    """
+    Compute summary statistics over any iterable of bills in a single pass.
+
+    Preconditions:
+    - bills is any iterable of bill dictionaries (list, generator, cursor)
+    - group_by is None or a bill field such as 'connection_type' or 'status'
+
+    Logic:
+    1. Create an overall accumulator
+    2. For each bill, add it to the overall accumulator
+    3. If grouping, also add it to the accumulator for its group value
+    4. Convert accumulators to plain dictionaries
+
+    Input:
+    - bills (Iterable[dict]): Bills to summarize
+    - group_by (str, optional): Field to group by
+    - percentiles (tuple): Percentiles to estimate
+
+    Output:
+    - dict: {'overall': {...}, 'groups': {group_value: {...}, ...}}
+
+    Examples:
+    >>> summary = summarize_bills(bills_collection.find({}, {'units': 1, 'total_amount': 1}))
+    >>> summary['overall']['count']
+    """
+    percentiles = tuple(percentiles)
+    overall = SummaryAccumulator(percentiles)
+    groups = {}
+
+    for bill in bills:
+        overall.add(bill)
+        if group_by:
+            key = bill.get(group_by) or 'N/A'
+            accumulator = groups.get(key)
+            if accumulator is None:
+                accumulator = groups[key] = SummaryAccumulator(percentiles)
+            accumulator.add(bill)
+
+    return {
+        'overall': overall.to_dict(),
+        'groups': {key: acc.to_dict() for key, acc in sorted(groups.items(), key=lambda item: str(item[0]))}
+    }
@@ -18,6 +18,7 @@ All validation functions follow a consistent pattern:
 - Return: (True, "") if valid, (False, "error description") if invalid
 """
 
+import math
 import re
 from typing import Tuple
 from modules.constants import (
@@ -196,11 +197,13 @@ def validate_units(units) -> Tuple[bool, str]:
     >>> validate_units("invalid")
     (False, 'Units must be a valid number')
     """
-    # Try to convert to float
+    # Try to convert to float (NaN and infinity are not amounts of energy)
     try:
         units_float = float(units)
     except (ValueError, TypeError):
         return False, ERROR_MESSAGES['units_invalid']
+    if not math.isfinite(units_float):
+        return False, ERROR_MESSAGES['units_invalid']
     
     # Check non-negative
     if units_float < 0:
@@ -209,6 +212,32 @@ def validate_units(units) -> Tuple[bool, str]:
     return True, ""
 
 
+def validate_fine_amount(fine_amount) -> Tuple[bool, str]:
+    """
+    Validate a fine added to a bill.
+    
+    Input:
+    - fine_amount (str/int/float): Fine in rupees
+    
+    Output:
+    - Tuple (bool, str): (True, "") for a finite non-negative number,
+      otherwise (False, error_message)
+    
+    Examples:
+    >>> validate_fine_amount("150")
+    (True, '')
+    >>> validate_fine_amount("abc")
+    (False, 'Fine amount must be a non-negative number')
+    """
+    try:
+        fine_float = float(fine_amount)
+    except (ValueError, TypeError):
+        return False, ERROR_MESSAGES['fine_invalid']
+    if not math.isfinite(fine_float) or fine_float < 0:
+        return False, ERROR_MESSAGES['fine_invalid']
+    return True, ""
+
+
 def validate_all_consumer_data(name: str, phone: str, consumer_num: str, 
                                db_collection=None) -> Tuple[bool, dict]:
     """
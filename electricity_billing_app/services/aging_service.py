@@ -0,0 +1,254 @@
+"""
+Aging Service Module
+--------------------
+Builds the receivables aging report for collections staff.
+
+Module: aging_service.py
+Purpose: Bucket outstanding amounts by days past due date
+Input: Database handle, report time
+Output: Aging totals overall, per connection type and per household
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- The whole report is computed by one aggregation: an indexed range match
+  on (status, due_date) followed by a $facet with one $bucket/$group branch
+  per view, so no bill is pulled into Python
+- A bill's outstanding amount is its own charges (total_amount minus the
+  previous_dues rolled into it); older unpaid bills are aged separately,
+  so arrears are never counted twice
+- Reports are cached in-process for AGING_CACHE_SECONDS
+- With reporting=True the aggregation may run on a secondary
+  (MONGO_READ_PREFERENCE); primary reads skip the cache, so an admin who
+  just recorded a payment sees it at once
+- The cached report is dropped when any bill or household changes
+  (invalidate(), called by services/change_listener.py)
+"""
+
+import csv
+import io
+import time
+from datetime import datetime
+from services.overdue_service import OverdueService
+from services.database import reporting_collection
+
+# Bucket lower boundaries (days past due) and display labels
+AGING_BOUNDARIES = [0, 16, 31, 61]
+AGING_BUCKETS = ['0-15', '16-30', '31-60', '60+']
+AGING_CACHE_SECONDS = 60
+
+MILLISECONDS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+def _bucket_label_expression():
+    """Aggregation expression mapping days_overdue to its bucket label."""
+    branches = []
+    for upper, label in zip(AGING_BOUNDARIES[1:], AGING_BUCKETS):
+        branches.append({"case": {"$lt": ["$days_overdue", upper]}, "then": label})
+    return {"$switch": {"branches": branches, "default": AGING_BUCKETS[-1]}}
+
+
+class AgingReportService:
+    def __init__(self, db, cache_seconds=AGING_CACHE_SECONDS):
+        self.db = db
+        self.bills_collection = db['electricity_billing']
+        self.reporting_bills_collection = reporting_collection(self.bills_collection)
+        self.cache_seconds = cache_seconds
+        self._cached_report = None
+        self._cached_at = 0.0
+        self._indexes_ready = False
+
+    def build_pipeline(self, now):
+        """
+        Build the aging aggregation pipeline.
+
+        Input:
+        - now (datetime): Reference time for days past due
+
+        Output:
+        - list: Aggregation pipeline stages
+        """
+        outstanding_expression = {"$subtract": [
+            {"$ifNull": ["$total_amount", 0]},
+            {"$ifNull": ["$rate_breakdown.previous_dues", 0]}
+        ]}
+        bucket_sums = {
+            f"bucket_{index}": {"$sum": {"$cond": [
+                {"$eq": ["$bucket", label]}, "$outstanding", 0
+            ]}}
+            for index, label in enumerate(AGING_BUCKETS)
+        }
+
+        return [
+            # Range scan on the (status, due_date) index
+            {"$match": {"status": "Unpaid", "due_date": {"$lt": now}}},
+            {"$project": {
+                "_id": 0,
+                "household_id": 1,
+                "household_name": 1,
+                "house_number": 1,
+                "connection_type": {"$ifNull": ["$connection_type", "Household"]},
+                "outstanding": outstanding_expression,
+                "days_overdue": {"$floor": {"$divide": [
+                    {"$subtract": [now, "$due_date"]}, MILLISECONDS_PER_DAY
+                ]}}
+            }},
+            {"$addFields": {"bucket": _bucket_label_expression()}},
+            {"$facet": {
+                "totals": [
+                    {"$bucket": {
+                        "groupBy": "$days_overdue",
+                        "boundaries": AGING_BOUNDARIES,
+                        "default": AGING_BUCKETS[-1],
+                        "output": {
+                            "amount": {"$sum": "$outstanding"},
+                            "bills": {"$sum": 1}
+                        }
+                    }}
+                ],
+                "by_connection_type": [
+                    {"$group": dict({"_id": "$connection_type", "bills": {"$sum": 1}},
+                                    **bucket_sums)},
+                    {"$sort": {"_id": 1}}
+                ],
+                "by_household": [
+                    {"$group": dict({
+                        "_id": "$household_id",
+                        "household_name": {"$first": "$household_name"},
+                        "house_number": {"$first": "$house_number"},
+                        "connection_type": {"$first": "$connection_type"},
+                        "bills": {"$sum": 1},
+                        "total": {"$sum": "$outstanding"}
+                    }, **bucket_sums)},
+                    {"$sort": {"total": -1}},
+                    # Compact bills carry no household_name; take it from households
+                    {"$lookup": {"from": "households", "localField": "_id",
+                                 "foreignField": "_id", "as": "household"}},
+                    {"$addFields": {"household_name": {"$ifNull": [
+                        "$household_name", {"$arrayElemAt": ["$household.household_name", 0]}
+                    ]}}},
+                    {"$project": {"household": 0}}
+                ]
+            }}
+        ]
+
+    def get_aging_report(self, now=None, use_cache=True, reporting=False):
+        """
+        Compute the receivables aging report.
+
+        Preconditions:
+        - Bills carry status, due_date, total_amount and rate_breakdown
+
+        Logic:
+        1. Return the cached report if it is younger than cache_seconds
+           (reporting reads only)
+        2. Ensure the (status, due_date) index exists (once per service)
+        3. Run the single $facet aggregation (on a secondary when reporting)
+        4. Convert bucket ids and per-bucket sums into labelled dictionaries
+
+        Input:
+        - now (datetime, optional): Reference time (defaults to current time)
+        - use_cache (bool): Allow a recently computed report to be returned
+        - reporting (bool): Read with the reporting read preference; False
+          always aggregates on the primary
+
+        Output:
+        - dict: {
+            'generated_at': datetime,
+            'buckets': ['0-15', '16-30', '31-60', '60+'],
+            'totals': {label: {'amount': float, 'bills': int}},
+            'grand_total': float,
+            'by_connection_type': [{'connection_type', 'bills', 'total', 'buckets': {label: amount}}],
+            'by_household': [{'household_id', 'household_name', 'house_number',
+                              'connection_type', 'bills', 'total', 'buckets': {...}}]
+          }
+        """
+        if (use_cache and reporting and now is None and self._cached_report is not None and
+                time.monotonic() - self._cached_at < self.cache_seconds):
+            return self._cached_report
+
+        report_time = now or datetime.now()
+        if not self._indexes_ready:
+            OverdueService(self.db).ensure_indexes()
+            self._indexes_ready = True
+        bills_collection = self.reporting_bills_collection if reporting else self.bills_collection
+        result = next(iter(bills_collection.aggregate(self.build_pipeline(report_time))), {})
+
+        totals = {label: {'amount': 0.0, 'bills': 0} for label in AGING_BUCKETS}
+        for row in result.get('totals', []):
+            bucket_id = row['_id']
+            if bucket_id in AGING_BOUNDARIES:
+                label = AGING_BUCKETS[AGING_BOUNDARIES.index(bucket_id)]
+            else:
+                label = AGING_BUCKETS[-1]
+            totals[label] = {'amount': round(row['amount'], 2), 'bills': row['bills']}
+
+        report = {
+            'generated_at': report_time,
+            'buckets': AGING_BUCKETS,
+            'totals': totals,
+            'grand_total': round(sum(bucket['amount'] for bucket in totals.values()), 2),
+            'by_connection_type': [
+                dict(self._bucket_row(row), connection_type=row['_id'])
+                for row in result.get('by_connection_type', [])
+            ],
+            'by_household': [
+                dict(self._bucket_row(row),
+                     household_id=row['_id'],
+                     household_name=row.get('household_name'),
+                     house_number=row.get('house_number'),
+                     connection_type=row.get('connection_type'))
+                for row in result.get('by_household', [])
+            ]
+        }
+
+        if now is None:
+            self._cached_report = report
+            self._cached_at = time.monotonic()
+        return report
+
+    def invalidate(self):
+        """Drop the cached report (after bills or households changed)."""
+        self._cached_report = None
+
+    @staticmethod
+    def _bucket_row(row):
+        buckets = {label: round(row.get(f"bucket_{index}", 0), 2)
+                   for index, label in enumerate(AGING_BUCKETS)}
+        return {
+            'bills': row.get('bills', 0),
+            'total': round(sum(buckets.values()), 2),
+            'buckets': buckets
+        }
+
+    def export_csv(self, report, view='household'):
+        """
+        Render an aging report as CSV.
+
+        Input:
+        - report (dict): Output of get_aging_report
+        - view (str): 'household' or 'connection_type'
+
+        Output:
+        - str: CSV text with one row per household or connection type
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if view == 'connection_type':
+            writer.writerow(['Connection Type', 'Bills'] + AGING_BUCKETS + ['Total'])
+            for row in report['by_connection_type']:
+                writer.writerow([row['connection_type'], row['bills']] +
+                                [f"{row['buckets'][label]:.2f}" for label in AGING_BUCKETS] +
+                                [f"{row['total']:.2f}"])
+        else:
+            writer.writerow(['Household', 'House Number', 'Connection Type', 'Bills'] +
+                            AGING_BUCKETS + ['Total'])
+            for row in report['by_household']:
+                writer.writerow([row['household_name'], row['house_number'],
+                                 row['connection_type'], row['bills']] +
+                                [f"{row['buckets'][label]:.2f}" for label in AGING_BUCKETS] +
+                                [f"{row['total']:.2f}"])
+
+        return buffer.getvalue()
@@ -0,0 +1,193 @@
+"""
+Archive Service Module
+----------------------
+Moves old paid bills out of the hot electricity_billing collection.
+
+Module: archive_service.py
+Purpose: Keep the hot collection (and its indexes) limited to recent and
+         unpaid bills, so history, dues and overdue queries stay in RAM
+Input: Bills with status "Paid" older than a configurable age
+Output: Bills in the electricity_billing_archive collection and a
+        per-household archive_summary on the households collection
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Bills are copied to the archive before they are deleted from the hot
+  collection, batch by batch; a crash between the two steps is repaired by
+  the next run (copies are keyed by the bill _id, so re-inserts are skipped)
+- Unpaid bills are never archived, so dues and overdue queries only ever
+  need the hot collection
+- archive_summary is recomputed from the archive for the households in each
+  batch, so it stays correct when a run is repeated
+- On MongoDB the archive is created with zstd block compression
+- BillService.find_bill() / find_bills() read the archive when a bill is
+  not in the hot collection
+"""
+
+import time
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from modules.constants import (ARCHIVE_COLLECTION, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE,
+                               DUE_DATE_DAYS)
+from services.overdue_service import OverdueService, OVERDUE_INDEX_NAME
+
+# Error code MongoDB returns for duplicate _id inserts
+DUPLICATE_KEY_ERROR = 11000
+
+
+class ArchiveService:
+    def __init__(self, db):
+        self.db = db
+        self.bills_collection = db['electricity_billing']
+        self.archive_collection = db[ARCHIVE_COLLECTION]
+        self.households_collection = db['households']
+
+    def ensure_archive(self):
+        """
+        Create the archive collection (zstd compressed) and its indexes.
+
+        Indexes match the lookups that fall back to the archive: bill history
+        by household and search by house number.
+        """
+        if ARCHIVE_COLLECTION not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(ARCHIVE_COLLECTION, storageEngine={
+                    'wiredTiger': {'configString': 'block_compressor=zstd'}
+                })
+            except OperationFailure:
+                # Server without zstd support (or a concurrent create): use defaults
+                if ARCHIVE_COLLECTION not in self.db.list_collection_names():
+                    self.db.create_collection(ARCHIVE_COLLECTION)
+        self.archive_collection.create_index(
+            [("household_id", ASCENDING), ("date", DESCENDING)], name="household_id_1_date_-1"
+        )
+        self.archive_collection.create_index(
+            [("house_number", ASCENDING), ("date", DESCENDING)], name="house_number_1_date_-1"
+        )
+
+    def archive_paid_bills(self, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE,
+                           now=None):
+        """
+        Move paid bills older than older_than_days into the archive.
+
+        Preconditions:
+        - older_than_days >= 0, batch_size > 0
+
+        Logic:
+        1. Select paid bills with date < cutoff through the (status, due_date)
+           index (due_date = date + DUE_DATE_DAYS bounds the range scan)
+        2. Insert the batch into the archive (unordered; already archived
+           _ids are skipped)
+        3. Recompute archive_summary for the batch's households
+        4. Delete the batch from the hot collection, only while still Paid
+        5. Repeat until no bill qualifies
+
+        Algorithm:
+        ----------
+        cutoff = now - older_than_days
+        LOOP:
+            batch = FIND {status: Paid, due_date < cutoff + 15 days, date < cutoff} LIMIT batch_size
+            IF batch is empty:
+                BREAK
+            INSERT batch INTO archive (skip duplicates)
+            UPDATE households SET archive_summary = AGGREGATE archive BY household
+            DELETE batch FROM hot collection
+
+        Input:
+        - older_than_days (int): Minimum bill age in days
+        - batch_size (int): Bills moved per batch
+        - now (datetime, optional): Reference time (defaults to current time)
+
+        Output:
+        - dict: {
+            'archived': int - Bills removed from the hot collection
+            'households': int - Households whose summary was refreshed
+            'batches': int
+            'seconds': float
+          }
+
+        Examples:
+        >>> ArchiveService(db).archive_paid_bills(older_than_days=365)
+        {'archived': 120000, 'households': 9000, 'batches': 120, 'seconds': 14.2}
+        """
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=older_than_days)
+        self.ensure_archive()
+        OverdueService(self.db).ensure_indexes()
+
+        archive_filter = {
+            "status": "Paid",
+            "due_date": {"$lt": cutoff + timedelta(days=DUE_DATE_DAYS)},
+            "date": {"$lt": cutoff}
+        }
+
+        started = time.perf_counter()
+        archived = batches = 0
+        households = set()
+
+        while True:
+            batch = list(self.bills_collection.find(archive_filter).hint(OVERDUE_INDEX_NAME).limit(batch_size))
+            if not batch:
+                break
+
+            try:
+                self.archive_collection.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                # Bills copied by an interrupted earlier run are already there
+                if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+                    raise
+
+            batch_households = {bill['household_id'] for bill in batch if bill.get('household_id')}
+            self.refresh_summaries(batch_households)
+            households |= batch_households
+
+            result = self.bills_collection.delete_many({
+                "_id": {"$in": [bill['_id'] for bill in batch]},
+                "status": "Paid"
+            })
+            archived += result.deleted_count
+            batches += 1
+            if result.deleted_count == 0:
+                # Nothing left that this run can move (guards against looping forever)
+                break
+
+        return {
+            'archived': archived,
+            'households': len(households),
+            'batches': batches,
+            'seconds': time.perf_counter() - started
+        }
+
+    def refresh_summaries(self, household_ids):
+        """
+        Recompute archive_summary for the given households from the archive.
+
+        Output:
+        - int: Households updated
+        """
+        if not household_ids:
+            return 0
+        summaries = self.archive_collection.aggregate([
+            {"$match": {"household_id": {"$in": list(household_ids)}}},
+            {"$group": {
+                "_id": "$household_id",
+                "bills": {"$sum": 1},
+                "units": {"$sum": "$units"},
+                "amount": {"$sum": "$total_amount"},
+                "first_date": {"$min": "$date"},
+                "last_date": {"$max": "$date"},
+                "last_sequence": {"$max": "$bill_sequence"},
+                "last_reading": {"$max": "$meter_reading"}
+            }}
+        ])
+        operations = [
+            UpdateOne({"_id": summary.pop('_id')},
+                      {"$set": {"archive_summary": dict(summary, updated_at=datetime.now())}})
+            for summary in summaries
+        ]
+        if operations:
+            self.households_collection.bulk_write(operations, ordered=False)
+        return len(operations)
@@ -0,0 +1,228 @@
+"""
+Batch Import Service Module
+---------------------------
+Non-interactive, parallel import of consumer and bill records.
+
+Module: batch_import_service.py
+Purpose: Let operators register consumers and generate bills from files of
+         100k+ records instead of one prompt at a time
+Input: (line, record) pairs from modules.input_handler.read_records()
+Output: A summary dict (counts, throughput, first errors)
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Records are read lazily and handled in chunks of chunk_size: each chunk is
+  validated with the input_handler record validators on the calling thread,
+  then written by one of `workers` threads; at most 2 x workers chunks are
+  in flight, so memory stays flat for any file size
+- Consumers: consumer and house number uniqueness is checked against the
+  numbers already stored (loaded once) and the earlier records of the same
+  import; missing consumer numbers are assigned in file order; each chunk is
+  one insert_many. Households registered through the web app while an import
+  runs are caught by the unique indexes (HouseholdService.ensure_indexes):
+  those records are rejected as duplicates
+- Bills: each record goes through BillService.create_bill, so tariffs,
+  dues, metered units and sequence conflicts behave as in the web app.
+  Records are split into `workers` lanes by consumer number, each written by
+  one thread in file order, so one household's readings are billed in the
+  order they appear
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from bson.objectid import ObjectId
+from pymongo.errors import BulkWriteError
+from modules.input_handler import validate_batch, validate_consumer_record, validate_bill_record
+from modules.constants import BATCH_CHUNK_SIZE, BATCH_WORKERS, BATCH_ERROR_LIMIT, ERROR_MESSAGES
+from services.bill_service import BillService, BillConflictError
+from services.household_service import HouseholdService, house_number_taken, duplicate_field
+from services.kpi_service import KpiService
+
+
+class BatchImportService:
+    def __init__(self, db):
+        self.households_collection = db['households']
+        self.bill_service = BillService(db)
+        self.household_service = HouseholdService(db)
+        self.kpi_service = KpiService(db)
+
+    def import_consumers(self, records, workers=BATCH_WORKERS, chunk_size=BATCH_CHUNK_SIZE, on_reject=None):
+        """
+        Register households from consumer records.
+
+        Input:
+        - records (iterable): (line, record) pairs
+        - workers (int): Chunks written in parallel
+        - chunk_size (int): Records per chunk
+        - on_reject (callable, optional): Called with {'line', 'errors'} for
+          every rejected or failed record
+
+        Output:
+        - dict: See _run()
+
+        Examples:
+        >>> summary = batch_service.import_consumers(read_records(open('consumers.csv')))
+        """
+        # Make sure the dashboard document is current, so chunk increments apply to it
+        self.kpi_service.get()
+        self.household_service.ensure_indexes()
+        taken_numbers, taken_houses = set(), set()
+        for household in self.households_collection.find({}, {"service_number": 1, "house_number": 1, "_id": 0}):
+            taken_numbers.add(household.get('service_number'))
+            taken_houses.add((household.get('house_number') or '').lower())
+        next_number = [int(self.household_service.next_consumer_number())]
+
+        def prepare(valid):
+            accepted, rejected = [], []
+            now = datetime.now()
+            for line, household in valid:
+                house_key = household['house_number'].lower()
+                if house_key in taken_houses:
+                    rejected.append({'line': line, 'errors': [house_number_taken(household['house_number'])]})
+                    continue
+                if household['service_number']:
+                    if household['service_number'] in taken_numbers:
+                        rejected.append({'line': line, 'errors': [ERROR_MESSAGES['consumer_duplicate']]})
+                        continue
+                else:
+                    while f"{next_number[0]:08d}" in taken_numbers:
+                        next_number[0] += 1
+                    household['service_number'] = f"{next_number[0]:08d}"
+                taken_numbers.add(household['service_number'])
+                taken_houses.add(house_key)
+                # _id assigned here, in file order, so the newest household is also the highest number
+                household.update(_id=ObjectId(), outstanding_balance=0.0, created_at=now)
+                accepted.append((line, household))
+            return accepted, rejected
+
+        return self._run('consumers', records, validate_consumer_record, self._insert_households,
+                         workers, chunk_size, on_reject, prepare)
+
+    def _insert_households(self, valid):
+        households = [household for _, household in valid]
+        failures = []
+        failed_indexes = set()
+        try:
+            self.households_collection.insert_many(households, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                failed_indexes.add(error['index'])
+                line, household = valid[error['index']]
+                message = error.get('errmsg', 'Write failed')
+                if error.get('code') == 11000:
+                    # Taken by a concurrent registration since the numbers were loaded
+                    if duplicate_field(error) == 'house_number':
+                        message = house_number_taken(household['house_number'])
+                    else:
+                        message = ERROR_MESSAGES['consumer_duplicate']
+                failures.append({'line': line, 'errors': [message]})
+        inserted = [household for index, household in enumerate(households) if index not in failed_indexes]
+        self.kpi_service.record_households(inserted)
+        return len(inserted), failures
+
+    def import_bills(self, records, workers=BATCH_WORKERS, chunk_size=BATCH_CHUNK_SIZE, on_reject=None):
+        """
+        Generate bills from bill records (service_number and units or reading).
+
+        Input/Output: as import_consumers()
+
+        Examples:
+        >>> summary = batch_service.import_bills(read_records(sys.stdin, 'jsonl'), workers=8)
+        """
+        # A household's bills stay in one lane: a later reading must not be billed first
+        return self._run('bills', records, validate_bill_record, self._create_bills,
+                         workers, chunk_size, on_reject, lane_key=lambda data: data['service_number'])
+
+    def _create_bills(self, valid):
+        created = 0
+        failures = []
+        for line, data in valid:
+            try:
+                self.bill_service.create_bill(data)
+                created += 1
+            except (ValueError, BillConflictError) as e:
+                failures.append({'line': line, 'errors': [str(e)]})
+        return created, failures
+
+    def _run(self, kind, records, validator, write, workers, chunk_size, on_reject, prepare=None,
+             lane_key=None):
+        """
+        Validate and write records chunk by chunk with a bounded thread pool.
+
+        With lane_key, each chunk is split into `workers` lanes by
+        hash(lane_key(record)); a lane is one single-thread executor, so
+        records sharing a key are written one after another in file order.
+
+        Output:
+        - dict: {
+            'kind', 'records', 'valid', 'rejected' (validation), 'created',
+            'failed' (write), 'chunks', 'workers', 'seconds',
+            'records_per_second', 'errors' (first BATCH_ERROR_LIMIT)
+          }
+        """
+        started = time.perf_counter()
+        summary = {'kind': kind, 'records': 0, 'valid': 0, 'rejected': 0, 'created': 0, 'failed': 0,
+                   'chunks': 0, 'workers': workers, 'errors': []}
+
+        def report(errors):
+            for error in errors:
+                if len(summary['errors']) < BATCH_ERROR_LIMIT:
+                    summary['errors'].append(error)
+                if on_reject:
+                    on_reject(error)
+
+        def collect(futures):
+            for future in futures:
+                created, failures = future.result()
+                summary['created'] += created
+                summary['failed'] += len(failures)
+                report(failures)
+
+        def submit(valid):
+            if lane_key is None:
+                return [pools[0].submit(write, valid)]
+            lanes = [[] for _ in pools]
+            for line, data in valid:
+                lanes[hash(lane_key(data)) % len(pools)].append((line, data))
+            return [pool.submit(write, lane) for pool, lane in zip(pools, lanes) if lane]
+
+        records = iter(records)
+        # One entry (a list of futures) per chunk
+        in_flight = deque()
+        if lane_key is None:
+            pools = [ThreadPoolExecutor(max_workers=workers)]
+        else:
+            pools = [ThreadPoolExecutor(max_workers=1) for _ in range(workers)]
+        try:
+            while True:
+                chunk = list(islice(records, chunk_size))
+                if not chunk:
+                    break
+                summary['records'] += len(chunk)
+                summary['chunks'] += 1
+                valid, rejected = validate_batch(chunk, validator)
+                if prepare:
+                    valid, duplicates = prepare(valid)
+                    rejected.extend(duplicates)
+                summary['valid'] += len(valid)
+                summary['rejected'] += len(rejected)
+                report(rejected)
+                if valid:
+                    in_flight.append(submit(valid))
+                while len(in_flight) >= workers * 2:
+                    collect(in_flight.popleft())
+            while in_flight:
+                collect(in_flight.popleft())
+        finally:
+            for pool in pools:
+                pool.shutdown()
+
+        seconds = time.perf_counter() - started
+        summary['seconds'] = round(seconds, 3)
+        summary['records_per_second'] = round(summary['records'] / seconds, 1) if seconds > 0 else None
+        return summary
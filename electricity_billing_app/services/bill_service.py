@@ -9,39 +9,119 @@ Input: Bill data dictionaries
 Output: Created bill documents
 Author: Software Engineering Lab
 Date: 2026-01-27
+
+Storage Modes:
+--------------
+- compact (default): the stored bill keeps identifying fields, units,
+  tariff_version and the charged amounts. Household name/address/phone and
+  the slab breakdown are rebuilt by expand_bills() when a bill is shown.
+- full: legacy documents with the household snapshot and slab breakdown
+  embedded. Select with BILL_STORAGE_MODE=full.
+
+Compact invoices show the household's current name, address and phone.
 """
 
+import logging
+import os
+import random
+import time
 from datetime import datetime, timedelta
+from itertools import islice
 from bson.objectid import ObjectId
 from decimal import Decimal
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from services.tariff_service import TariffService
-from modules.validation import validate_units
-from modules.constants import DUE_DATE_DAYS, FINE_AMOUNT, ERROR_MESSAGES
+from services.tariff_registry import tariff_registry
+from services.payment_service import PaymentService
+from services.meter_reading_service import MeterReadingService, parse_read_at
+from services.kpi_service import KpiService
+from services.rollup_service import RollupService
+from services.database import reporting_collection
+from modules.singleflight import read_coalescer
+from modules.records import Bill
+from modules.validation import validate_units, validate_fine_amount
+from modules.constants import (DUE_DATE_DAYS, FINE_AMOUNT, ERROR_MESSAGES, TARIFF_VERSION,
+                               BILL_STORAGE_MODES, DEFAULT_BILL_STORAGE_MODE,
+                               HOUSEHOLD_SNAPSHOT_FIELDS, CREATE_BILL_ATTEMPTS,
+                               CREATE_BILL_BACKOFF_SECONDS, CREATE_BILL_MAX_BACKOFF_SECONDS,
+                               ARCHIVE_COLLECTION, HISTORY_STREAM_CHUNK_SIZE)
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 1000
+SEQUENCE_INDEX_NAME = "household_id_1_bill_sequence_1"
+
+
+class BillConflictError(RuntimeError):
+    """Raised when a bill could not be created because of repeated concurrent writes."""
 
 
 class BillService:
-    def __init__(self, db):
+    def __init__(self, db, storage_mode=None):
+        self.db = db
         self.bills_collection = db['electricity_billing']
         self.households_collection = db['households']
+        self.archive_collection = db[ARCHIVE_COLLECTION]
+        # History and search may read from secondaries (MONGO_READ_PREFERENCE)
+        self.reporting_bills_collection = reporting_collection(self.bills_collection)
+        self.reporting_archive_collection = reporting_collection(self.archive_collection)
+        self.payment_service = PaymentService(db)
+        self.meter_service = MeterReadingService(db)
+        self.kpi_service = KpiService(db)
+        self.rollup_service = RollupService(db)
+        self.storage_mode = storage_mode or os.environ.get('BILL_STORAGE_MODE', DEFAULT_BILL_STORAGE_MODE)
+        if self.storage_mode not in BILL_STORAGE_MODES:
+            raise ValueError(f"Unknown bill storage mode: {self.storage_mode}")
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """
+        Create the unique (household_id, bill_sequence) index.
+        
+        Partial, so bills created before bill_sequence existed are ignored.
+        """
+        self.bills_collection.create_index(
+            [("household_id", ASCENDING), ("bill_sequence", ASCENDING)],
+            unique=True, name=SEQUENCE_INDEX_NAME,
+            partialFilterExpression={"bill_sequence": {"$exists": True}}
+        )
+        self._indexes_ready = True
 
     def create_bill(self, data):
         """
         Create a new bill with validation and calculations.
         
         Preconditions:
-        - data contains required keys: household_id or service_number, units
+        - data contains required keys: household_id or service_number, and
+          units, reading or from_readings
         - Database collections are properly initialized
         
         Logic:
-        1. Validate input data (units must be non-negative)
+        1. Validate input data (units and fine must be non-negative numbers)
         2. Find household by ID or service number
-        3. Calculate current charges using TariffService
-        4. Query previous unpaid bills for this household
+        3. Metered bills: validate data['reading'] (or take the household's last
+           stored reading when from_readings is set); units = this reading -
+           the reading of the household's previous metered bill (or its first
+           reading when it has none)
+        4. Read the household's latest bill_sequence, then its unpaid bills;
+           calculate current charges using the tariff plan in force for the
+           household's connection type today (TariffService)
         5. Calculate fine if applicable
         6. Calculate total amount = current + previous dues + fine
         7. Set due date = bill date + 15 days
-        8. Create and insert bill document
-        9. Return created bill
+        8. Insert the bill with bill_sequence = latest + 1 (compacted in compact mode),
+           then store the new meter reading
+        9. If another bill took that sequence first (unique index), back off
+           and repeat from step 4 so its amount is included in the dues
+        10. Return created bill (always the full document)
+        
+        Concurrency:
+        ------------
+        Bills for one household are serialized by the unique
+        (household_id, bill_sequence) index: of two concurrent requests
+        only one insert succeeds, the other retries with fresh dues.
+        Different households never wait for each other.
         
         Algorithm:
         ----------
@@ -68,7 +148,9 @@ class BillService:
         Input:
         - data (dict): {
             'household_id': str (ObjectId) OR 'service_number': str,
-            'units': float,
+            'units': float, OR
+            'reading': float (cumulative meter reading) and 'read_at' (optional), OR
+            'from_readings': True (bill up to the last stored reading),
             'fine_amount': float (optional),
             'notes': str (optional)
           }
@@ -78,19 +160,28 @@ class BillService:
         
         Raises:
         - ValueError: If validation fails or household not found
+        - BillConflictError: If CREATE_BILL_ATTEMPTS attempts all lost a race
         
         Examples:
         >>> bill_service.create_bill({'household_id': '...', 'units': 100})
         # Returns complete bill document
         """
+        metered = 'reading' in data or bool(data.get('from_readings'))
+        
         # Extract and validate units
-        units = data.get('units', 0)
-        is_valid, error_msg = validate_units(units)
+        units = Decimal('0')
+        if not metered:
+            units = data.get('units', 0)
+            is_valid, error_msg = validate_units(units)
+            if not is_valid:
+                raise ValueError(error_msg)
+            units = Decimal(str(float(units)))
+        
+        fine_amount = data.get('fine_amount') or 0
+        is_valid, error_msg = validate_fine_amount(fine_amount)
         if not is_valid:
             raise ValueError(error_msg)
-        
-        units = Decimal(str(units))
-        fine_amount = Decimal(str(data.get('fine_amount', 0)))
+        fine_amount = Decimal(str(float(fine_amount)))
         
         # Find household by ID or service number
         household = None
@@ -108,60 +199,416 @@ class BillService:
         connection_type = household.get('connection_type', 'Household')
         service_number = household.get('service_number', household.get('house_number', 'N/A'))
         
-        # Calculate Current Charges using new tariff service
-        tariff_result = TariffService.calculate_bill(float(units))
-        current_charges = Decimal(str(tariff_result['base_amount']))
-        breakdown = tariff_result['breakdown']
-        minimum_charge_applied = tariff_result['minimum_charge_applied']
-        
-        # Calculate Previous Dues
-        # Query all unpaid bills for this household
-        previous_unpaid_bills = self.bills_collection.find({
-            "household_id": household_id,
-            "status": "Unpaid",
-            "_id": {"$exists": True}  # Ensure we don't count the bill we're creating
-        })
+        bill_date = datetime.now()
         
-        previous_dues = Decimal('0.00')
-        for prev_bill in previous_unpaid_bills:
-            previous_dues += Decimal(str(prev_bill.get('total_amount', 0)))
+        # Metered bill: the reading this bill runs up to. A new reading is only
+        # validated here and stored once the bill is, so a failed bill leaves no
+        # orphaned reading for the next bill to be measured against
+        meter_summary = household.get('meter_summary')
+        new_reading = None
+        if 'reading' in data:
+            if not meter_summary:
+                raise ValueError(ERROR_MESSAGES['reading_baseline'])
+            new_reading = self.meter_service.prepare_reading(
+                household, data['reading'], parse_read_at(data.get('read_at') or bill_date), source='bill'
+            )
+            current_reading, reading_at = new_reading['reading'], new_reading['read_at']
+        elif metered:
+            if not meter_summary:
+                raise ValueError(ERROR_MESSAGES['reading_baseline'])
+            current_reading, reading_at = meter_summary['last_reading'], meter_summary['last_at']
         
-        # Calculate Total
-        total_amount = current_charges + fine_amount + previous_dues
+        tariff_registry.refresh_if_stale(self.db)
         
         # Calculate due date (15 days from today)
-        bill_date = datetime.now()
         due_date = bill_date + timedelta(days=DUE_DATE_DAYS)
         
-        # Create bill document
-        bill_document = {
-            "household_id": ObjectId(household_id),
-            "household_name": household.get('household_name'),
-            "service_number": service_number,
-            "house_number": household.get('house_number'),
-            "address": household.get('address', 'N/A'),
-            "phone": household.get('phone', 'N/A'),
-            "connection_type": connection_type,
-            "units": float(units),
-            "rate_breakdown": {
-                "base_amount": float(current_charges),
-                "fine_amount": float(fine_amount),
-                "previous_dues": float(previous_dues),
-                "slab_breakdown": breakdown,
-                "minimum_charge_applied": minimum_charge_applied
-            },
-            "total_amount": float(total_amount),
-            "date": bill_date,
-            "due_date": due_date,
-            "status": "Unpaid",
-            "notes": data.get('notes', '')
-        }
-        
-        # Insert into database
-        result = self.bills_collection.insert_one(bill_document)
-        bill_document['_id'] = result.inserted_id
-        
-        return bill_document
+        if not self._indexes_ready:
+            self.ensure_indexes()
+        
+        for attempt in range(CREATE_BILL_ATTEMPTS):
+            # The sequence is read before the dues: any bill inserted after this
+            # read takes the same sequence, so one of the two inserts must fail
+            latest_bill = self.bills_collection.find_one(
+                {"household_id": household_id, "bill_sequence": {"$exists": True}},
+                {"bill_sequence": 1},
+                sort=[("bill_sequence", DESCENDING)]
+            )
+            if latest_bill:
+                bill_sequence = latest_bill['bill_sequence'] + 1
+            else:
+                # All earlier bills may have been archived; continue their numbering
+                archived = self.households_collection.find_one({"_id": household_id}, {"archive_summary": 1}) or {}
+                bill_sequence = (archived.get('archive_summary', {}).get('last_sequence') or 0) + 1
+            
+            if metered:
+                # Units = delta since the reading the previous metered bill ran up to
+                last_metered_bill = self.bills_collection.find_one(
+                    {"household_id": household_id, "bill_sequence": {"$exists": True},
+                     "meter_reading": {"$exists": True}},
+                    {"meter_reading": 1},
+                    sort=[("bill_sequence", DESCENDING)]
+                )
+                if last_metered_bill:
+                    previous_reading = last_metered_bill['meter_reading']
+                else:
+                    previous_reading = household.get('archive_summary', {}).get('last_reading')
+                    if previous_reading is None:
+                        previous_reading = meter_summary['first_reading']
+                if current_reading < previous_reading:
+                    raise ValueError(ERROR_MESSAGES['reading_regression'])
+                units = Decimal(str(current_reading)) - Decimal(str(previous_reading))
+            
+            # Calculate Current Charges with the plan for this connection type and date
+            tariff_result = TariffService.calculate_bill(float(units), connection_type=connection_type,
+                                                         bill_date=bill_date)
+            current_charges = Decimal(str(tariff_result['base_amount']))
+            breakdown = tariff_result['breakdown']
+            minimum_charge_applied = tariff_result['minimum_charge_applied']
+            
+            # Calculate Previous Dues
+            # Query all unpaid bills for this household
+            previous_unpaid_bills = self.bills_collection.find({
+                "household_id": household_id,
+                "status": "Unpaid"
+            }, {"total_amount": 1})
+            
+            previous_dues = Decimal('0.00')
+            for prev_bill in previous_unpaid_bills:
+                previous_dues += Decimal(str(prev_bill.get('total_amount', 0)))
+            
+            # Calculate Total
+            total_amount = current_charges + fine_amount + previous_dues
+            
+            # Create bill document
+            bill_document = {
+                "household_id": ObjectId(household_id),
+                "bill_sequence": bill_sequence,
+                "household_name": household.get('household_name'),
+                "service_number": service_number,
+                "house_number": household.get('house_number'),
+                "address": household.get('address', 'N/A'),
+                "phone": household.get('phone', 'N/A'),
+                "connection_type": connection_type,
+                "units": float(units),
+                "tariff_version": tariff_result['tariff_version'],
+                "rate_breakdown": {
+                    "base_amount": float(current_charges),
+                    "fine_amount": float(fine_amount),
+                    "previous_dues": float(previous_dues),
+                    "slab_breakdown": breakdown,
+                    "minimum_charge_applied": minimum_charge_applied
+                },
+                "total_amount": float(total_amount),
+                "date": bill_date,
+                "due_date": due_date,
+                "status": "Unpaid",
+                "notes": data.get('notes', '')
+            }
+            if metered:
+                bill_document.update({
+                    "previous_reading": previous_reading,
+                    "meter_reading": current_reading,
+                    "reading_at": reading_at
+                })
+            
+            # Insert into database
+            stored_document = bill_document
+            if self.storage_mode == 'compact':
+                stored_document = self.compact_bill(bill_document)
+            try:
+                result = self.bills_collection.insert_one(stored_document)
+            except DuplicateKeyError:
+                # Lost the race for this sequence: jittered exponential back-off
+                window = min(CREATE_BILL_MAX_BACKOFF_SECONDS, CREATE_BILL_BACKOFF_SECONDS * (2 ** attempt))
+                time.sleep(random.uniform(0, window))
+                continue
+            bill_document['_id'] = result.inserted_id
+            if new_reading is not None:
+                try:
+                    self.meter_service.store_reading(new_reading)
+                except PyMongoError as e:
+                    # The bill keeps its meter_reading, which is what the next bill is measured from
+                    logger.warning("Bill %s created but its meter reading was not stored: %s",
+                                   result.inserted_id, e)
+            self.kpi_service.record_bill(bill_document)
+            self.rollup_service.record_bill(bill_document)
+            return bill_document
+        
+        raise BillConflictError(ERROR_MESSAGES['bill_conflict'])
+    
+    @staticmethod
+    def compact_bill(bill):
+        """
+        Build the compact storage form of a full bill document.
+        
+        Logic:
+        1. Drop the household snapshot (name, address, phone)
+        2. Drop rate_breakdown.slab_breakdown
+        3. Stamp the tariff version used to price the units
+        
+        Input:
+        - bill (dict): Full bill document
+        
+        Output:
+        - dict: New compact document (the input is not modified)
+        """
+        compact = {key: value for key, value in bill.items() if key not in HOUSEHOLD_SNAPSHOT_FIELDS}
+        compact['rate_breakdown'] = {key: value for key, value in bill.get('rate_breakdown', {}).items()
+                                     if key != 'slab_breakdown'}
+        compact['tariff_version'] = bill.get('tariff_version', TARIFF_VERSION)
+        return compact
+    
+    def expand_bills(self, bills, with_breakdown=False):
+        """
+        Fill in the fields a compact bill does not store.
+        
+        Preconditions:
+        - bills are documents from the electricity_billing collection
+        
+        Logic:
+        1. Collect household ids of bills without a household snapshot
+        2. Fetch those households with one $in query
+        3. Copy name, address and phone onto each bill
+        4. If with_breakdown, recompute slab_breakdown from units and tariff_version
+        
+        Full (legacy) bills pass through unchanged.
+        
+        Input:
+        - bills (iterable): Bill documents
+        - with_breakdown (bool): Also rebuild the slab breakdown (invoice views)
+        
+        Output:
+        - list: The same bill dictionaries, expanded in place
+        
+        Examples:
+        >>> bills = bill_service.expand_bills(bills_collection.find().sort("date", -1))
+        """
+        bills = list(bills)
+        if with_breakdown:
+            tariff_registry.require_versions(self.db, {bill['tariff_version'] for bill in bills
+                                                       if 'tariff_version' in bill})
+        household_ids = {bill['household_id'] for bill in bills
+                         if 'household_name' not in bill and bill.get('household_id')}
+        households = {}
+        if household_ids:
+            projection = dict.fromkeys(HOUSEHOLD_SNAPSHOT_FIELDS, 1)
+            households = {household['_id']: household for household in
+                          self.households_collection.find({'_id': {'$in': list(household_ids)}}, projection)}
+        
+        for bill in bills:
+            if 'household_name' not in bill:
+                household = households.get(bill.get('household_id'), {})
+                for field in HOUSEHOLD_SNAPSHOT_FIELDS:
+                    bill[field] = household.get(field, 'N/A')
+            
+            rate_breakdown = bill.get('rate_breakdown')
+            if with_breakdown and rate_breakdown is not None and 'slab_breakdown' not in rate_breakdown:
+                tariff_result = TariffService.calculate_bill(bill.get('units', 0), bill.get('tariff_version'))
+                rate_breakdown['slab_breakdown'] = tariff_result['breakdown']
+        
+        return bills
+    
+    def iter_expanded(self, bills, chunk_size=HISTORY_STREAM_CHUNK_SIZE):
+        """
+        Expand bills lazily, chunk_size at a time (for streamed pages).
+        
+        Input:
+        - bills (iterable): Bill documents, typically a cursor
+        - chunk_size (int): Bills per household lookup
+        
+        Output:
+        - generator: Expanded bills in input order
+        """
+        bills = iter(bills)
+        while True:
+            chunk = list(islice(bills, chunk_size))
+            if not chunk:
+                return
+            yield from self.expand_bills(chunk)
+    
+    def expand_bill(self, bill):
+        """Expand a single bill (household snapshot and slab breakdown); None passes through."""
+        if bill is None:
+            return None
+        return self.expand_bills([bill], with_breakdown=True)[0]
+    
+    def iter_records(self, query=None, sort=("service_number", ASCENDING), reporting=True,
+                     chunk_size=HISTORY_STREAM_CHUNK_SIZE):
+        """
+        Stream bills as compact Bill records, for batch jobs over a whole cycle.
+        
+        Logic:
+        1. Read matching bills from the hot collection chunk_size at a time
+        2. Expand each chunk with its household snapshot and slab breakdown
+        3. Convert the chunk to Bill records before reading the next one, so
+           only records (not documents) outlive a chunk
+        
+        Input:
+        - query (dict, optional): MongoDB filter (default: all bills)
+        - sort (tuple): (field, direction) cursor order
+        - reporting (bool): Read with the reporting read preference
+        - chunk_size (int): Bills per household lookup
+        
+        Output:
+        - generator: Bill records (modules/records.py) in cursor order
+        
+        Examples:
+        >>> write_print_spool(bill_service.iter_records({'status': 'Unpaid'}), 'cycle.txt', paged=True)
+        """
+        collection = self.reporting_bills_collection if reporting else self.bills_collection
+        bills = collection.find(query or {}).sort(*sort)
+        while True:
+            chunk = list(islice(bills, chunk_size))
+            if not chunk:
+                return
+            yield from map(Bill.from_document, self.expand_bills(chunk, with_breakdown=True))
+    
+    def migrate_to_compact(self, batch_size=MIGRATION_BATCH_SIZE):
+        """
+        Convert stored full bills to the compact form.
+        
+        Preconditions:
+        - Bills without tariff_version were priced with built-in version 1
+        
+        Logic:
+        1. Walk bills that still embed slab_breakdown in _id order, batch_size at a time
+        2. Recompute each slab breakdown with the bill's tariff version
+        3. If it matches the stored breakdown, $unset the snapshot fields and
+           slab_breakdown and $set tariff_version (one bulk_write per batch)
+        4. Bills whose stored breakdown differs are left untouched and counted
+        
+        Re-running is safe: migrated bills no longer match the filter.
+        
+        Input:
+        - batch_size (int): Bills per bulk_write
+        
+        Output:
+        - dict: {'migrated': int, 'kept': int, 'seconds': float}
+        """
+        started = time.perf_counter()
+        projection = {'units': 1, 'tariff_version': 1, 'rate_breakdown.slab_breakdown': 1}
+        unset = dict.fromkeys(HOUSEHOLD_SNAPSHOT_FIELDS + ('rate_breakdown.slab_breakdown',), "")
+        query = {'rate_breakdown.slab_breakdown': {'$exists': True}}
+        tariff_registry.refresh_if_stale(self.db)
+        migrated = kept = 0
+        last_id = None
+        
+        while True:
+            batch_query = query if last_id is None else dict(query, _id={'$gt': last_id})
+            batch = list(self.bills_collection.find(batch_query, projection).sort('_id', 1).limit(batch_size))
+            if not batch:
+                break
+            last_id = batch[-1]['_id']
+            
+            operations = []
+            for bill in batch:
+                tariff_version = bill.get('tariff_version', TARIFF_VERSION)
+                stored = bill['rate_breakdown']['slab_breakdown']
+                recomputed = TariffService.calculate_bill(bill.get('units', 0), tariff_version)['breakdown']
+                if stored != recomputed:
+                    kept += 1
+                    continue
+                operations.append(UpdateOne(
+                    {'_id': bill['_id'], 'rate_breakdown.slab_breakdown': {'$exists': True}},
+                    {'$set': {'tariff_version': tariff_version}, '$unset': unset}
+                ))
+            if operations:
+                migrated += self.bills_collection.bulk_write(operations, ordered=False).modified_count
+        
+        return {'migrated': migrated, 'kept': kept, 'seconds': time.perf_counter() - started}
+    
+    def find_bill(self, bill_id, projection=None):
+        """
+        Fetch one bill, falling back to the archive.
+        
+        Input:
+        - bill_id (str or ObjectId): Bill ID
+        - projection (dict, optional): Fields to return
+        
+        Output:
+        - dict or None: Bill document (hot collection first, then archive)
+        
+        Raises:
+        - bson.errors.InvalidId: If bill_id is malformed
+        """
+        bill_id = ObjectId(bill_id)
+        bill = self.bills_collection.find_one({'_id': bill_id}, projection)
+        if bill is None:
+            bill = self.archive_collection.find_one({'_id': bill_id}, projection)
+        return bill
+    
+    def find_bills(self, query, reporting=False):
+        """
+        Fetch all bills matching query from the hot collection and the archive.
+        
+        Meant for per-household lookups (search by house number), which the
+        archive indexes cover; newest first.
+        
+        Input:
+        - query (dict): MongoDB filter
+        - reporting (bool): Read with the reporting read preference (may be
+          served by a secondary); False reads from the primary
+        
+        Output:
+        - list: Bill documents sorted by date, newest first
+        """
+        bills_collection, archive_collection = self.bills_collection, self.archive_collection
+        if reporting:
+            bills_collection, archive_collection = self.reporting_bills_collection, self.reporting_archive_collection
+        bills = list(bills_collection.find(query).sort("date", -1))
+        archived = list(archive_collection.find(query).sort("date", -1))
+        if archived:
+            bills = sorted(bills + archived, key=lambda bill: bill.get('date') or datetime.min, reverse=True)
+        return bills
+    
+    def get_invoice(self, bill_id):
+        """
+        Fetch and expand one bill for the invoice and payment pages.
+        
+        Identical concurrent requests share one query (read_coalescer); the
+        returned dictionary is shared and must not be modified.
+        
+        Output:
+        - dict or None: Expanded bill (hot collection or archive)
+        
+        Raises:
+        - bson.errors.InvalidId: If bill_id is malformed
+        """
+        bill_id = ObjectId(bill_id)
+        return read_coalescer.do(('bill', str(bill_id)), lambda: self.expand_bill(self.find_bill(bill_id)))
+    
+    def search_by_house_number(self, house_number, reporting=False):
+        """
+        Expanded bills of one house number, newest first (hot and archive).
+        
+        Identical concurrent searches share one query (read_coalescer); the
+        returned list is shared and must not be modified. reporting: see
+        find_bills().
+        """
+        return read_coalescer.do(('search', house_number, reporting), lambda: self.expand_bills(
+            self.find_bills({"house_number": house_number}, reporting=reporting)))
+    
+    def delete_bill(self, bill_id):
+        """
+        Delete a bill from the hot collection and update the dashboard KPIs
+        and consumption rollups.
+        
+        Input:
+        - bill_id (str or ObjectId): Bill ID
+        
+        Output:
+        - dict or None: The deleted bill, or None if there was no such bill
+        
+        Raises:
+        - bson.errors.InvalidId: If bill_id is malformed
+        """
+        bill = self.bills_collection.find_one_and_delete({'_id': ObjectId(bill_id)})
+        read_coalescer.forget(('bill', str(bill_id)))
+        if bill is not None:
+            self.kpi_service.record_deletion(bill)
+            self.rollup_service.record_deletion(bill)
+        return bill
     
     def get_bill_by_service_number(self, service_number):
         """
@@ -173,26 +620,24 @@ class BillService:
         Output:
         - list: List of bill documents
         """
-        return list(self.bills_collection.find(
-            {"service_number": service_number}
-        ).sort("date", -1))
+        return self.find_bills({"service_number": service_number})
     
-    def mark_bill_paid(self, bill_id):
+    def mark_bill_paid(self, bill_id, idempotency_key=None):
         """
         Mark a bill as paid.
         
+        Delegates to PaymentService so the bill is only updated while it is
+        still Unpaid and repeated keys are ignored.
+        
         Input:
         - bill_id (str): Bill ID to mark as paid
+        - idempotency_key (str, optional): Key identifying this payment attempt
         
         Output:
-        - bool: True if successful, False otherwise
+        - bool: True if this call paid the bill, False otherwise
         """
         try:
-            result = self.bills_collection.update_one(
-                {"_id": ObjectId(bill_id)},
-                {"$set": {"status": "Paid", "paid_date": datetime.now()}}
-            )
-            return result.modified_count > 0
+            result = self.payment_service.pay_bill(bill_id, idempotency_key=idempotency_key)
+            return result['outcome'] == 'paid' and not result['replayed']
         except Exception:
             return False
-
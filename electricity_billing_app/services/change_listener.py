@@ -0,0 +1,237 @@
+"""
+Change Listener Module
+----------------------
+Keeps the in-process caches of every worker coherent through a MongoDB
+change stream.
+
+Module: change_listener.py
+Purpose: When several workers (on several hosts) serve the app, a write by
+         one worker must drop the cached copies held by all the others
+Input: Change events on CHANGE_STREAM_COLLECTIONS (households, bills)
+Output: Invalidation calls on the registered local caches
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- One daemon thread per process watches the database with a $match on the
+  collections; insert/update/replace/delete events are dispatched with the
+  collection, operation and document _id (no document lookups), drops and
+  renames reset every cache
+- Caches subscribe with register(collections, on_change, on_reset,
+  on_fallback); on_change(collection, operation, document_id) drops what
+  the event touches, on_reset() drops everything
+- The last resume token is kept in memory by each process: a reconnected
+  listener resumes after it, so no event is missed. It is not persisted,
+  since a restarted worker starts with empty caches and has nothing to
+  invalidate (a shared token would also let one worker resume from
+  another's position). When there is no token, or the oplog no longer
+  holds it, the stream starts from now and every cache is reset
+- Change streams need a replica set (a single-node set is enough:
+  `mongod --replSet rs0` then `rs.initiate()`). Until a stream is open, or
+  when none can be opened (standalone server, CHANGE_STREAMS_ENABLED=0),
+  on_fallback(CACHE_FALLBACK_TTL_SECONDS) tells caches to expire entries by
+  age; the listener retries every CHANGE_STREAM_RETRY_SECONDS and resets
+  the caches once a stream is open again
+- Started by the first request of each worker process (again after fork)
+- Counters are exposed by GET /api/v1/metrics
+"""
+
+import logging
+import os
+import threading
+from pymongo.errors import OperationFailure, PyMongoError
+from modules.constants import (CHANGE_STREAM_COLLECTIONS, CHANGE_STREAM_RETRY_SECONDS,
+                               CACHE_FALLBACK_TTL_SECONDS)
+from modules.fragment_cache import fragment_cache
+from modules.singleflight import read_coalescer
+from services.database import get_db, get_service
+from services.aging_service import AgingReportService
+
+logger = logging.getLogger(__name__)
+
+WATCHED_OPERATIONS = ('insert', 'update', 'replace', 'delete')
+# Server error code when the resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class ChangeListener:
+    def __init__(self, collections=CHANGE_STREAM_COLLECTIONS, fallback_ttl=CACHE_FALLBACK_TTL_SECONDS):
+        self.collections = tuple(collections)
+        self.fallback_ttl = fallback_ttl
+        self.enabled = True
+        self.state = 'stopped'
+        self.events = 0
+        self.resets = 0
+        self.last_error = None
+        self._subscribers = []
+        self._thread = None
+        self._pid = None
+        # This process's position in the stream, kept across reconnects only
+        self._token = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, collections, on_change, on_reset, on_fallback=None):
+        """
+        Subscribe a local cache to changes of some collections.
+
+        Input:
+        - collections (tuple): Collection names the cache depends on
+        - on_change (callable): on_change(collection, operation, document_id)
+        - on_reset (callable): Drops the whole cache (events may have been missed)
+        - on_fallback (callable, optional): on_fallback(seconds) while no stream
+          is open, on_fallback(None) once one is
+        """
+        self._subscribers.append((tuple(collections), on_change, on_reset, on_fallback))
+
+    def init_app(self, app):
+        """Start the listener on each worker's first request (CHANGE_STREAMS_ENABLED=0 keeps TTL expiry)."""
+        self.enabled = os.environ.get('CHANGE_STREAMS_ENABLED', '1') != '0'
+        self._set_state('fallback')
+        app.before_request(self._before_request)
+
+    def _before_request(self):
+        if self.enabled and (self._pid != os.getpid() or self._thread is None):
+            db = get_db()
+            if db is not None:
+                self.start(db)
+
+    def start(self, db):
+        """Start this process's watcher thread (no-op when already running)."""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(db,), name='change-listener', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Watcher thread
+    # ------------------------------------------------------------------
+
+    def _run(self, db):
+        self._token = None
+        while not self._stop.is_set():
+            try:
+                self._watch(db)
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Resume token no longer in the oplog; restarting the change stream")
+                    self._token = None
+                    continue
+                self._fail(e)
+            except PyMongoError as e:
+                self._fail(e)
+
+    def _fail(self, error):
+        if self.state != 'fallback':
+            logger.warning("Change stream unavailable, caches fall back to %ss expiry: %s",
+                           self.fallback_ttl, error)
+        self.last_error = str(error)
+        self._set_state('fallback')
+        self._stop.wait(CHANGE_STREAM_RETRY_SECONDS)
+
+    def _watch(self, db):
+        """Follow the change stream until it ends, keeping the last resume token in self._token."""
+        pipeline = [{'$match': {'$or': [
+            {'ns.coll': {'$in': list(self.collections)}},
+            # Database-wide events carry no collection name
+            {'operationType': {'$in': ['dropDatabase', 'invalidate']}}
+        ]}}]
+        with db.watch(pipeline, resume_after=self._token, max_await_time_ms=1000) as stream:
+            if self._token is None or self.state != 'watching':
+                # Events since the caches were filled cannot be replayed (no token) or
+                # may not have been (TTL mode): start from a clean slate
+                self._reset()
+            self._set_state('watching')
+            self.last_error = None
+            while stream.alive and not self._stop.is_set():
+                change = stream.try_next()
+                if change is not None:
+                    if change['operationType'] in WATCHED_OPERATIONS:
+                        self._dispatch(change)
+                    else:
+                        # Collection dropped or renamed: nothing cached can be trusted
+                        self._reset()
+                        self._token = None
+                        if change['operationType'] == 'invalidate':
+                            return
+                self._token = stream.resume_token or self._token
+
+    def _dispatch(self, change):
+        collection = change['ns']['coll']
+        operation = change['operationType']
+        document_id = change['documentKey']['_id']
+        self.events += 1
+        for collections, on_change, _, _ in self._subscribers:
+            if collection in collections:
+                try:
+                    on_change(collection, operation, document_id)
+                except Exception:
+                    logger.exception("Cache invalidation failed for %s %s", collection, document_id)
+
+    def _reset(self):
+        self.resets += 1
+        for _, _, on_reset, _ in self._subscribers:
+            on_reset()
+
+    def _set_state(self, state):
+        self.state = state
+        ttl = None if state == 'watching' else self.fallback_ttl
+        for _, _, _, on_fallback in self._subscribers:
+            if on_fallback is not None:
+                on_fallback(ttl)
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'state': self.state,
+            'events': self.events,
+            'resets': self.resets,
+            'last_error': self.last_error
+        }
+
+
+# ----------------------------------------------------------------------
+# Local caches
+# ----------------------------------------------------------------------
+
+def _fragment_change(collection, operation, document_id):
+    if collection == 'electricity_billing':
+        fragment_cache.invalidate_bill(document_id)
+    elif operation == 'insert':
+        fragment_cache.invalidate(('household_options',))
+    else:
+        # Bill rows show household fields (compact bills are expanded from the household)
+        fragment_cache.clear()
+
+
+def _set_fragment_max_age(seconds):
+    fragment_cache.max_age = seconds
+
+
+def _coalescer_change(collection, operation, document_id):
+    if collection == 'electricity_billing':
+        read_coalescer.forget(('bill', str(document_id)))
+        read_coalescer.forget_kind('search')
+    else:
+        read_coalescer.clear()
+
+
+def _invalidate_aging_report(*args):
+    aging_service = get_service(AgingReportService)
+    if aging_service is not None:
+        aging_service.invalidate()
+
+
+# Process-wide listener installed by create_app()
+change_listener = ChangeListener()
+change_listener.register(('households', 'electricity_billing'), _fragment_change, fragment_cache.clear,
+                         _set_fragment_max_age)
+change_listener.register(('households', 'electricity_billing'), _coalescer_change, read_coalescer.clear)
+change_listener.register(('households', 'electricity_billing'), _invalidate_aging_report, _invalidate_aging_report)
@@ -0,0 +1,244 @@
+"""
+Database Module
+---------------
+Lazily creates one MongoClient (and one set of services) per process.
+
+Module: database.py
+Purpose: Fork-safe, lazily initialized MongoDB access for the web app,
+         CLI commands and scripts
+Input: MONGO_URI and MONGO_* pool settings from the environment
+Output: Database handle and service instances
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Nothing connects at import time; the client is created on first use
+- The client is tied to the process id that created it. A forked worker
+  (e.g. gunicorn with preload) never reuses its parent's client: the first
+  call in the child builds a fresh one, because MongoClient is not fork-safe
+- Pool sizing and timeouts come from MONGO_CLIENT_OPTIONS in constants.py,
+  each overridable by its environment variable
+- Services are built once per process by get_service(ServiceClass)
+- Each client gets its own slow query listener (services/query_monitor.py)
+  unless SLOW_QUERY_MS is 0
+- Read routing: reporting_collection() gives a view of a collection that
+  reads with MONGO_READ_PREFERENCE (default secondaryPreferred, bounded by
+  MONGO_MAX_STALENESS_SECONDS); services use it only for heavy read-only
+  paths, everything else stays on the primary. Against a standalone server
+  secondaryPreferred simply reads from that server
+"""
+
+import logging
+import os
+import threading
+from pymongo import MongoClient, ReadPreference
+from pymongo.read_preferences import PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from modules.constants import (DEFAULT_MONGO_URI, MONGO_CLIENT_OPTIONS, REPORTING_READ_PREFERENCE,
+                               REPORTING_MAX_STALENESS_SECONDS)
+from services.query_monitor import SlowQueryLog, get_threshold_ms
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+READ_PREFERENCE_MODES = {
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest
+}
+_state = {
+    'pid': None,
+    'client': None,
+    'db': None,
+    'services': {},
+    'slow_query_log': None
+}
+
+
+def get_client_options():
+    """
+    Build MongoClient keyword arguments from the environment.
+
+    Output:
+    - dict: MongoClient option name -> value
+    """
+    options = {}
+    for env_name, (option, default) in MONGO_CLIENT_OPTIONS.items():
+        value = os.environ.get(env_name)
+        if value is None or value == '':
+            options[option] = default
+        else:
+            options[option] = int(value)
+    return options
+
+
+def get_max_staleness_seconds():
+    """Staleness bound of reporting reads (and length of the read-your-writes window)."""
+    value = os.environ.get('MONGO_MAX_STALENESS_SECONDS')
+    return int(value) if value else REPORTING_MAX_STALENESS_SECONDS
+
+
+def get_reporting_read_preference():
+    """
+    Build the read preference of heavy read-only paths from the environment.
+
+    Output:
+    - pymongo read preference (ReadPreference.PRIMARY when routing is off)
+
+    Raises:
+    - ValueError: If MONGO_READ_PREFERENCE is not a read preference mode
+    """
+    mode = os.environ.get('MONGO_READ_PREFERENCE') or REPORTING_READ_PREFERENCE
+    if mode == 'primary':
+        return ReadPreference.PRIMARY
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown MONGO_READ_PREFERENCE: {mode}")
+    return READ_PREFERENCE_MODES[mode](max_staleness=get_max_staleness_seconds())
+
+
+def reporting_collection(collection):
+    """
+    Return a view of collection for heavy read-only queries.
+
+    Reads through the view may be served by a secondary up to
+    MONGO_MAX_STALENESS_SECONDS behind the primary; never use it for
+    reads that decide a write (dues, sequence numbers, payments).
+
+    Input:
+    - collection (Collection): e.g. db['electricity_billing']
+
+    Output:
+    - Collection: Same collection with the reporting read preference
+
+    Examples:
+    >>> reporting_bills = reporting_collection(db['electricity_billing'])
+    """
+    return collection.with_options(read_preference=get_reporting_read_preference())
+
+
+def _ensure_client():
+    pid = os.getpid()
+    if _state['pid'] == pid and _state['client'] is not None:
+        return
+
+    with _lock:
+        if _state['pid'] == pid and _state['client'] is not None:
+            return
+
+        mongo_uri = os.environ.get("MONGO_URI")
+        if not mongo_uri:
+            logger.warning("MONGO_URI not found. Using default local connection '%s'", DEFAULT_MONGO_URI)
+            mongo_uri = DEFAULT_MONGO_URI
+
+        # connect=False defers the first network round trip to the first
+        # operation, so worker boot never waits on MongoDB
+        threshold_ms = get_threshold_ms()
+        slow_query_log = SlowQueryLog(threshold_ms) if threshold_ms > 0 else None
+        client = MongoClient(mongo_uri, connect=False, event_listeners=[slow_query_log] if slow_query_log else [],
+                             **get_client_options())
+
+        _state['client'] = client
+        _state['db'] = client.get_default_database()
+        if slow_query_log is not None:
+            slow_query_log.attach(_state['db'])
+        _state['slow_query_log'] = slow_query_log
+        _state['services'] = {}
+        _state['pid'] = pid
+        logger.info("MongoDB client created for database %s (pid %s)", _state['db'].name, pid)
+
+
+def get_client():
+    """
+    Return this process's MongoClient, creating it on first use.
+
+    Output:
+    - MongoClient, or None if the client could not be created
+    """
+    try:
+        _ensure_client()
+    except Exception as e:
+        logger.error("Error creating MongoDB client: %s", e)
+        return None
+    return _state['client']
+
+
+def get_db():
+    """
+    Return this process's default database, creating the client on first use.
+
+    Output:
+    - Database, or None if the client could not be created
+    """
+    if get_client() is None:
+        return None
+    return _state['db']
+
+
+def get_collection(name):
+    """
+    Return a collection of the default database.
+
+    Input:
+    - name (str): Collection name
+
+    Output:
+    - Collection, or None if the database is unavailable
+    """
+    db = get_db()
+    return db[name] if db is not None else None
+
+
+def get_service(service_class):
+    """
+    Return this process's instance of a service class.
+
+    Preconditions:
+    - service_class takes the database handle as its only constructor argument
+
+    Input:
+    - service_class (type): e.g. BillService
+
+    Output:
+    - service_class instance, or None if the database is unavailable
+
+    Examples:
+    >>> bill_service = get_service(BillService)
+    """
+    db = get_db()
+    if db is None:
+        return None
+
+    services = _state['services']
+    service = services.get(service_class)
+    if service is None:
+        with _lock:
+            service = services.get(service_class)
+            if service is None:
+                service = services[service_class] = service_class(db)
+    return service
+
+
+def get_slow_query_log():
+    """Return this process's slow query listener (None when disabled or not connected)."""
+    return _state['slow_query_log'] if _state['pid'] == os.getpid() else None
+
+
+def reset():
+    """Drop this process's client and services (closing them if owned)."""
+    with _lock:
+        if _state['client'] is not None and _state['pid'] == os.getpid():
+            _state['client'].close()
+        _state.update(pid=None, client=None, db=None, services={}, slow_query_log=None)
+
+
+def _after_fork_in_child():
+    # The inherited client belongs to the parent; forget it without closing
+    global _lock
+    _lock = threading.Lock()
+    _state.update(pid=None, client=None, db=None, services={}, slow_query_log=None)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
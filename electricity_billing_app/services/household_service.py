@@ -0,0 +1,206 @@
+"""
+Household Service Module
+------------------------
+Registers new consumer connections with validation.
+
+Module: household_service.py
+Purpose: Sanitize, validate and insert household documents
+Input: Household data dictionaries (form fields or API payloads)
+Output: Created household documents or validation errors
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Consumer numbers and house numbers (case insensitive) are unique through
+unique indexes: when two registrations (web form, background job, batch
+import) generate the same consumer number at once, the loser backs off and
+takes the next number; a house number registered concurrently is rejected.
+"""
+
+import logging
+import random
+import re
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from modules.validation import validate_consumer_name, validate_phone_number, validate_consumer_number
+from modules.constants import (ERROR_MESSAGES, CREATE_HOUSEHOLD_ATTEMPTS, CREATE_BILL_BACKOFF_SECONDS,
+                               CREATE_BILL_MAX_BACKOFF_SECONDS)
+from services.kpi_service import KpiService
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NUMBER_INDEX_NAME = "service_number_1"
+HOUSE_NUMBER_INDEX_NAME = "house_number_1"
+# Strength 2 compares case insensitively, like the house number check
+HOUSE_NUMBER_COLLATION = {"locale": "en", "strength": 2}
+
+
+def house_number_taken(house_number):
+    return f"Household with house number {house_number} already exists."
+
+
+def duplicate_field(details):
+    """
+    Which unique index rejected a write: 'house_number' or 'service_number'.
+
+    Input:
+    - details (dict): DuplicateKeyError.details or one BulkWriteError writeError
+    """
+    details = details or {}
+    if 'house_number' in (details.get('keyPattern') or {}) or HOUSE_NUMBER_INDEX_NAME in details.get('errmsg', ''):
+        return 'house_number'
+    return 'service_number'
+
+
+class HouseholdService:
+    def __init__(self, db):
+        self.households_collection = db['households']
+        self.kpi_service = KpiService(db)
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """
+        Create the unique service_number and house_number indexes.
+
+        A build fails while duplicates are stored; that is logged (the
+        duplicates have to be fixed by hand) and registration carries on with
+        the find-based checks only.
+        """
+        try:
+            self.households_collection.create_index([("service_number", ASCENDING)], unique=True,
+                                                    name=SERVICE_NUMBER_INDEX_NAME)
+        except OperationFailure as e:
+            logger.error("Unique consumer number index not created: %s", e)
+        try:
+            self.households_collection.create_index([("house_number", ASCENDING)], unique=True,
+                                                    name=HOUSE_NUMBER_INDEX_NAME, collation=HOUSE_NUMBER_COLLATION)
+        except OperationFailure as e:
+            logger.error("Unique house number index not created: %s", e)
+        self._indexes_ready = True
+
+    def next_consumer_number(self) -> str:
+        """
+        Generate the next consumer number from the most recent household.
+
+        Output:
+        - str: Zero-padded 8 digit consumer number (e.g. '00000001')
+        """
+        # _id breaks ties between households created within the same millisecond (bulk imports)
+        last_household = self.households_collection.find_one(sort=[("created_at", -1), ("_id", -1)])
+        if last_household and 'service_number' in last_household:
+            # Extract number from last consumer number
+            try:
+                new_num = int(last_household['service_number']) + 1
+            except ValueError:
+                new_num = 1
+        else:
+            new_num = 1
+        return f"{new_num:08d}"  # Format: 00000001
+
+    def create_household(self, data) -> Tuple[Optional[dict], List[str]]:
+        """
+        Create a new household with validation.
+
+        Preconditions:
+        - data contains household_name, house_number, phone; optional
+          address, connection_type and service_number
+
+        Logic:
+        1. Sanitize name (remove numbers, lowercase)
+        2. Auto-generate consumer number if not supplied
+        3. Validate name, phone and consumer number (uniqueness)
+        4. Reject duplicate house numbers (case insensitive)
+        5. Insert and return the household document; if a concurrent
+           registration took a generated consumer number first (unique
+           index), back off and retry with the next number
+
+        Concurrency:
+        ------------
+        A supplied consumer number that is taken concurrently is reported as
+        a duplicate; a generated one is replaced, up to
+        CREATE_HOUSEHOLD_ATTEMPTS times. A house number registered
+        concurrently is reported as taken.
+
+        Input:
+        - data (dict): Household fields
+
+        Output:
+        - Tuple (dict or None, list): (created household, []) on success,
+          (None, [error messages]) on failure
+
+        Examples:
+        >>> household, errors = service.create_household({'household_name': 'John', ...})
+        """
+        household_name = (data.get('household_name') or '').strip()
+        # Sanitize name: remove numbers and convert to lowercase
+        household_name = re.sub(r'\d+', '', household_name).lower()
+
+        house_number = (data.get('house_number') or '').strip()
+        phone = (data.get('phone') or '').strip()
+        address = (data.get('address') or '').strip()
+        connection_type = data.get('connection_type') or 'Household'
+
+        consumer_number = (data.get('service_number') or '').strip()
+        generated = not consumer_number
+        if generated:
+            consumer_number = self.next_consumer_number()
+
+        # Validate all inputs
+        errors = []
+
+        name_valid, name_error = validate_consumer_name(household_name)
+        if not name_valid:
+            errors.append(name_error)
+
+        phone_valid, phone_error = validate_phone_number(phone)
+        if not phone_valid:
+            errors.append(phone_error)
+
+        consumer_valid, consumer_error = validate_consumer_number(consumer_number, self.households_collection)
+        if not consumer_valid:
+            errors.append(consumer_error)
+
+        if errors:
+            return None, errors
+
+        # Check if house number already exists (case insensitive)
+        existing_household = self.households_collection.find_one({
+            "house_number": {"$regex": f"^{re.escape(house_number)}$", "$options": "i"}
+        })
+        if existing_household:
+            return None, [house_number_taken(house_number)]
+
+        household = {
+            "household_name": household_name,
+            "service_number": consumer_number,  # Keep field name as service_number in DB
+            "phone": phone,
+            "house_number": house_number,
+            "address": address,
+            "connection_type": connection_type,
+            "outstanding_balance": 0.0,
+            "created_at": datetime.now()
+        }
+        if not self._indexes_ready:
+            self.ensure_indexes()
+        for attempt in range(CREATE_HOUSEHOLD_ATTEMPTS):
+            try:
+                result = self.households_collection.insert_one(household)
+                break
+            except DuplicateKeyError as e:
+                household.pop('_id', None)
+                if duplicate_field(e.details) == 'house_number':
+                    return None, [house_number_taken(house_number)]
+                if not generated:
+                    return None, [ERROR_MESSAGES['consumer_duplicate']]
+                # Lost the race for this number: jittered exponential back-off, then the next one
+                window = min(CREATE_BILL_MAX_BACKOFF_SECONDS, CREATE_BILL_BACKOFF_SECONDS * (2 ** attempt))
+                time.sleep(random.uniform(0, window))
+                household['service_number'] = self.next_consumer_number()
+        else:
+            return None, [ERROR_MESSAGES['consumer_duplicate']]
+        household['_id'] = result.inserted_id
+        self.kpi_service.record_household(household)
+
+        return household, []
@@ -0,0 +1,428 @@
+"""
+Job Service Module
+------------------
+Background execution of long admin operations with persisted progress.
+
+Module: job_service.py
+Purpose: Run household imports and area-wide bill generation outside the
+         request, report their progress, and resume them after a restart
+Input: Job kind, parameters and (for imports) the rows to process
+Output: Job documents in the jobs collection (status, position,
+        processed/failed counts, errors)
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- enqueue() stores the job (and its rows in job_items) and hands it to this
+  process's thread pool; the request returns the job id at once
+- A job is owned by one worker at a time: claiming it sets owner and
+  heartbeat_at atomically, and every checkpoint renews the heartbeat
+- Checkpoints (every JOB_CHECKPOINT_ITEMS items or JOB_CHECKPOINT_SECONDS)
+  save the resume position and add processed/failed counts, and only apply
+  while this worker still owns the job
+- A running job whose heartbeat is older than JOB_LEASE_SECONDS (its worker
+  died or was restarted), or a queued job nobody picked up, is claimed by
+  the next worker that calls resume_stale() and continues from its last
+  checkpoint
+- Items after the last checkpoint run again on resume: household rows come
+  back as "already exists" failures, and households already billed up to
+  their last reading are skipped
+- Threads, not processes: the work is database round trips, and each
+  process already has one pooled MongoClient
+"""
+
+import csv
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import islice
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import PyMongoError
+from services.database import get_service
+from services.bill_service import BillService
+from services.household_service import HouseholdService
+from modules.constants import (JOB_COLLECTION, JOB_ITEMS_COLLECTION, JOB_KINDS, JOB_WORKERS,
+                               JOB_CHECKPOINT_ITEMS, JOB_CHECKPOINT_SECONDS, JOB_LEASE_SECONDS,
+                               JOB_ERROR_LIMIT, JOB_MAX_ITEMS)
+
+logger = logging.getLogger(__name__)
+
+JOB_ITEM_BATCH_SIZE = 1000
+HOUSEHOLD_IMPORT_FIELDS = ('household_name', 'house_number', 'phone', 'address', 'connection_type',
+                           'service_number')
+
+# kind -> handler(job_service, job) yielding (position, label, error or None) per item
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobExecutor:
+    """This process's job thread pool (recreated in forked children)."""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.environ.get('JOB_WORKERS') or JOB_WORKERS)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.last_resume = 0.0
+
+    def submit(self, function, *args):
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+                self._pid = os.getpid()
+            return self._pool.submit(function, *args)
+
+
+# Process-wide executor used by JobService
+job_executor = JobExecutor()
+
+
+class JobService:
+    def __init__(self, db):
+        self.db = db
+        self.jobs_collection = db[JOB_COLLECTION]
+        self.items_collection = db[JOB_ITEMS_COLLECTION]
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """Indexes for stale job lookup and for reading a job's rows in order."""
+        self.jobs_collection.create_index([("status", ASCENDING), ("heartbeat_at", ASCENDING)],
+                                          name="status_1_heartbeat_at_1")
+        self.items_collection.create_index([("job_id", ASCENDING), ("seq", ASCENDING)],
+                                           unique=True, name="job_id_1_seq_1")
+        self._indexes_ready = True
+
+    # ------------------------------------------------------------------
+    # Enqueueing
+    # ------------------------------------------------------------------
+
+    def enqueue(self, kind, params=None, items=None, created_by=None):
+        """
+        Store a job and start it in the background.
+
+        Logic:
+        1. Insert the job as 'queued' (with total = number of items, if any)
+        2. Store the items in job_items, numbered from 0
+        3. Submit the job to this process's thread pool
+
+        Input:
+        - kind (str): One of JOB_KINDS
+        - params (dict): Handler parameters, e.g. {'area': 'Sector 4'}
+        - items (iterable): Rows to process (imports only)
+        - created_by (str): Admin user id
+
+        Output:
+        - ObjectId: The job id
+
+        Raises:
+        - ValueError: Unknown kind, or more than JOB_MAX_ITEMS items
+
+        Examples:
+        >>> job_id = job_service.enqueue('generate_bills', {'area': 'Sector 4'})
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if not self._indexes_ready:
+            self.ensure_indexes()
+
+        now = datetime.now()
+        job = {
+            "_id": ObjectId(),
+            "kind": kind,
+            "params": params or {},
+            "status": "queued",
+            "total": None,
+            "processed": 0,
+            "failed": 0,
+            "position": None,
+            "errors": [],
+            "active_seconds": 0.0,
+            "created_by": created_by,
+            "created_at": now,
+            "heartbeat_at": now
+        }
+        if items is not None:
+            total = self._store_items(job['_id'], items)
+            job['total'] = total
+        self.jobs_collection.insert_one(job)
+        job_executor.submit(self.run, job['_id'])
+        return job['_id']
+
+    def _store_items(self, job_id, items):
+        items = iter(items)
+        total = 0
+        while True:
+            batch = list(islice(items, JOB_ITEM_BATCH_SIZE))
+            if not batch:
+                return total
+            if total + len(batch) > JOB_MAX_ITEMS:
+                self.items_collection.delete_many({"job_id": job_id})
+                raise ValueError(f"A job can process at most {JOB_MAX_ITEMS} rows")
+            self.items_collection.insert_many(
+                [{"job_id": job_id, "seq": total + i, "data": data} for i, data in enumerate(batch)],
+                ordered=False
+            )
+            total += len(batch)
+
+    def enqueue_household_import(self, stream, created_by=None):
+        """Queue a household CSV import (columns as in HOUSEHOLD_IMPORT_FIELDS)."""
+        reader = csv.DictReader(stream)
+        missing = {'household_name', 'house_number', 'phone'} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+        rows = ({field: (row.get(field) or '').strip() for field in HOUSEHOLD_IMPORT_FIELDS} for row in reader)
+        return self.enqueue('import_households', items=rows, created_by=created_by)
+
+    # ------------------------------------------------------------------
+    # Running
+    # ------------------------------------------------------------------
+
+    def claim(self, job_id=None, now=None):
+        """
+        Take ownership of a job, atomically.
+
+        With job_id: claim that job if it is still queued. Without: claim
+        the oldest queued job nobody picked up within JOB_LEASE_SECONDS, or
+        a running job whose heartbeat is that old.
+
+        Output:
+        - dict: The claimed job, or None
+        """
+        now = now or datetime.now()
+        if job_id is not None:
+            query = {"_id": job_id, "status": "queued"}
+        else:
+            cutoff = now - timedelta(seconds=JOB_LEASE_SECONDS)
+            query = {"status": {"$in": ["queued", "running"]}, "heartbeat_at": {"$lt": cutoff}}
+        return self.jobs_collection.find_one_and_update(
+            query,
+            {"$set": {"status": "running", "owner": worker_id(), "heartbeat_at": now},
+             "$min": {"started_at": now},
+             "$inc": {"attempts": 1}},
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def run(self, job_id=None, job=None):
+        """
+        Run a claimed job to completion, checkpointing as it goes.
+
+        Input:
+        - job_id (ObjectId): Claim and run this queued job, or
+        - job (dict): An already claimed job
+
+        Output:
+        - str: Final status ('completed', 'failed', 'lost' if another
+          worker took the job over), or None if it could not be claimed
+        """
+        try:
+            job = job or self.claim(job_id)
+            if job is None:
+                return None
+            return self._run(job)
+        except Exception:
+            logger.exception("Job %s crashed", job_id or (job and job['_id']))
+            raise
+
+    def _run(self, job):
+        handler = JOB_HANDLERS[job['kind']]
+        owner = job['owner']
+        processed = failed = 0
+        errors = []
+        position = job.get('position')
+        started = last_checkpoint = time.monotonic()
+        pending = 0
+
+        try:
+            for position, label, error in handler(self, job):
+                if error is None:
+                    processed += 1
+                else:
+                    failed += 1
+                    errors.append({"item": label, "error": error})
+                pending += 1
+                if pending >= JOB_CHECKPOINT_ITEMS or time.monotonic() - last_checkpoint >= JOB_CHECKPOINT_SECONDS:
+                    elapsed = time.monotonic() - started
+                    if not self._checkpoint(job['_id'], owner, position, processed, failed, errors, elapsed):
+                        logger.warning("Job %s was taken over by another worker", job['_id'])
+                        return 'lost'
+                    processed = failed = pending = 0
+                    errors = []
+                    started = last_checkpoint = time.monotonic()
+        except Exception as e:
+            logger.exception("Job %s failed", job['_id'])
+            self._checkpoint(job['_id'], owner, position, processed, failed, errors,
+                             time.monotonic() - started, status='failed', error=str(e))
+            return 'failed'
+
+        if not self._checkpoint(job['_id'], owner, position, processed, failed, errors,
+                                time.monotonic() - started, status='completed'):
+            return 'lost'
+        self.items_collection.delete_many({"job_id": job['_id']})
+        return 'completed'
+
+    def _checkpoint(self, job_id, owner, position, processed, failed, errors, elapsed, status=None, error=None):
+        """Save progress while owner still holds the job; False if it does not."""
+        now = datetime.now()
+        update = {
+            "$set": {"position": position, "heartbeat_at": now},
+            "$inc": {"processed": processed, "failed": failed, "active_seconds": elapsed}
+        }
+        if errors:
+            update["$push"] = {"errors": {"$each": errors, "$slice": JOB_ERROR_LIMIT}}
+        if status:
+            update["$set"].update(status=status, finished_at=now)
+        if error:
+            update["$set"]["error"] = error
+        result = self.jobs_collection.update_one({"_id": job_id, "owner": owner, "status": "running"}, update)
+        return result.matched_count == 1
+
+    def resume_stale(self, limit=None):
+        """
+        Claim abandoned jobs and continue them in this process's pool.
+
+        Output:
+        - int: Number of jobs resumed
+        """
+        job_executor.last_resume = time.monotonic()
+        resumed = 0
+        while limit is None or resumed < limit:
+            job = self.claim()
+            if job is None:
+                break
+            logger.info("Resuming job %s (%s) from position %s", job['_id'], job['kind'], job.get('position'))
+            job_executor.submit(self.run, None, job)
+            resumed += 1
+        return resumed
+
+    def maybe_resume_stale(self):
+        """resume_stale() at most once per JOB_LEASE_SECONDS per process (called on signed-in requests)."""
+        if job_executor.last_resume and time.monotonic() - job_executor.last_resume < JOB_LEASE_SECONDS:
+            return 0
+        try:
+            return self.resume_stale()
+        except PyMongoError as e:
+            logger.warning("Could not resume stale jobs: %s", e)
+            return 0
+
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+
+    def get_job(self, job_id):
+        """
+        Job document with derived progress fields.
+
+        Output:
+        - dict: The job plus 'done' (processed + failed), 'percent',
+          'rate' (items per second of running time) and 'eta_seconds',
+          or None if not found
+        """
+        job = self.jobs_collection.find_one({"_id": job_id})
+        if job is None:
+            return None
+        return self.with_progress(job)
+
+    @staticmethod
+    def with_progress(job):
+        done = job.get('processed', 0) + job.get('failed', 0)
+        total = job.get('total')
+        active = job.get('active_seconds') or 0.0
+        rate = done / active if active > 0 else None
+        job['done'] = done
+        job['percent'] = round(100.0 * done / total, 1) if total else None
+        job['rate'] = round(rate, 2) if rate else None
+        job['eta_seconds'] = (round((total - done) / rate) if rate and total is not None and job['status'] == 'running'
+                              else None)
+        return job
+
+    def list_jobs(self, limit=20):
+        jobs = self.jobs_collection.find({}, {"errors": 0}).sort("created_at", DESCENDING).limit(limit)
+        return [self.with_progress(job) for job in jobs]
+
+
+# ==================================================================================
+# HANDLERS
+# ==================================================================================
+
+@job_handler('import_households')
+def import_households(job_service, job):
+    """Create one household per stored row, resuming after the last checkpointed row."""
+    household_service = get_service(HouseholdService)
+
+    start = job.get('position')
+    query = {"job_id": job['_id']}
+    if start is not None:
+        query["seq"] = {"$gt": start}
+    for item in job_service.items_collection.find(query).sort("seq", ASCENDING):
+        label = f"row {item['seq'] + 2}: {item['data'].get('house_number') or '?'}"  # header is row 1
+        household, errors = household_service.create_household(item['data'])
+        yield item['seq'], label, '; '.join(errors) if errors else None
+
+
+@job_handler('generate_bills')
+def generate_bills(job_service, job):
+    """
+    Bill every metered household of an area up to its last stored reading.
+
+    The area is matched (case insensitively) against the household address;
+    households are visited in _id order so the position is a keyset cursor.
+    Households already billed up to their last reading are skipped.
+    """
+    bill_service = get_service(BillService)
+    households = bill_service.households_collection
+
+    query = {}
+    area = (job['params'].get('area') or '').strip()
+    if area:
+        query["address"] = {"$regex": re.escape(area), "$options": "i"}
+    if job.get('total') is None:
+        job_service.jobs_collection.update_one({"_id": job['_id']},
+                                               {"$set": {"total": households.count_documents(query)}})
+    if job.get('position') is not None:
+        query["_id"] = {"$gt": job['position']}
+
+    note = job['params'].get('notes') or f"Generated by job {job['_id']}"
+    projection = {"house_number": 1, "meter_summary": 1, "archive_summary": 1}
+    for household in households.find(query, projection).sort("_id", ASCENDING):
+        label = household.get('house_number') or str(household['_id'])
+        meter_summary = household.get('meter_summary')
+        if not meter_summary:
+            yield household['_id'], label, "No meter readings"
+            continue
+        last_metered_bill = bill_service.bills_collection.find_one(
+            {"household_id": household['_id'], "meter_reading": {"$exists": True}},
+            {"meter_reading": 1}, sort=[("bill_sequence", DESCENDING)]
+        )
+        if last_metered_bill:
+            billed_reading = last_metered_bill['meter_reading']
+        else:
+            # Earlier bills may all have been archived (same fallback as BillService.create_bill)
+            billed_reading = household.get('archive_summary', {}).get('last_reading')
+        if billed_reading is not None and billed_reading >= meter_summary['last_reading']:
+            yield household['_id'], label, None    # already billed up to the last reading
+            continue
+        try:
+            bill_service.create_bill({"household_id": str(household['_id']), "from_readings": True, "notes": note})
+        except (ValueError, RuntimeError) as e:
+            yield household['_id'], label, str(e)
+            continue
+        yield household['_id'], label, None
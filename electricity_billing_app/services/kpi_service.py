@@ -0,0 +1,265 @@
+"""
+KPI Service Module
+------------------
+Maintains the materialized dashboard document for the admin index page.
+
+Module: kpi_service.py
+Purpose: Serve the dashboard's headline numbers, recent bills and household
+         list version from one document instead of live queries
+Input: Bill creation, payment, fine, deletion and household events
+Output: The dashboard_kpis document
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- One document holds: total outstanding and unpaid bill count, bills this
+  cycle (calendar month), collections today, the five newest bills and the
+  household count / newest household _id
+- Every event applies an atomic $inc/$push to the document; the update only
+  matches while the stored cycle and day are current, so the first event of
+  a new day (or a missing document) triggers a full recompute instead
+- A bill's outstanding amount is its own charges (total_amount minus
+  previous_dues), as in the aging report
+- refresh() recomputes everything from the bills with indexed queries; run
+  it periodically (`flask refresh-kpis`) to repair increments lost to a
+  crash or to a recompute racing with an event
+"""
+
+import logging
+from datetime import datetime
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
+from modules.constants import KPI_COLLECTION, KPI_DOCUMENT_ID, RECENT_BILLS_COUNT, FINE_AMOUNT
+
+logger = logging.getLogger(__name__)
+
+# Bill fields kept for the dashboard's recent bills list (see _recent_bill.html)
+RECENT_BILL_FIELDS = ('household_name', 'date', 'connection_type', 'total_amount', 'version')
+
+
+def own_charges(bill):
+    """Outstanding amount of one bill, excluding the arrears rolled into it."""
+    previous_dues = (bill.get('rate_breakdown') or {}).get('previous_dues', 0)
+    return round(bill.get('total_amount', 0) - previous_dues, 2)
+
+
+def current_period(now=None):
+    """(cycle, day) labels the document must carry for increments to apply."""
+    now = now or datetime.now()
+    return now.strftime('%Y-%m'), now.strftime('%Y-%m-%d')
+
+
+class KpiService:
+    def __init__(self, db):
+        self.bills_collection = db['electricity_billing']
+        self.households_collection = db['households']
+        self.kpi_collection = db[KPI_COLLECTION]
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """Indexes for refresh(): bills by date and paid bills by payment date."""
+        self.bills_collection.create_index([("date", DESCENDING)], name="date_-1")
+        self.bills_collection.create_index(
+            [("payment_date", ASCENDING)], name="payment_date_1",
+            partialFilterExpression={"payment_date": {"$exists": True}}
+        )
+        self._indexes_ready = True
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def get(self):
+        """
+        Return the dashboard document (one read; recomputed on a new day).
+
+        Output:
+        - dict: {
+            'outstanding_amount', 'unpaid_bills', 'cycle', 'cycle_bills',
+            'day', 'collected_today', 'payments_today', 'recent_bills',
+            'households', 'newest_household_id', 'computed_at'
+          }
+        """
+        kpis = self.kpi_collection.find_one({"_id": KPI_DOCUMENT_ID})
+        cycle, day = current_period()
+        if kpis is None or kpis.get('cycle') != cycle or kpis.get('day') != day:
+            kpis = self.refresh()
+        return kpis
+
+    # ------------------------------------------------------------------
+    # Full recompute
+    # ------------------------------------------------------------------
+
+    def refresh(self, now=None):
+        """
+        Recompute the whole document from the bills and households.
+
+        Logic:
+        1. Unpaid bills (status prefix of the overdue index): count and own charges
+        2. Bills dated this month (date index): count
+        3. Bills paid today (payment_date index): count and total_amount
+        4. Five newest bills, with household names for compact bills
+        5. Household count and newest household _id
+
+        Output:
+        - dict: The stored document
+        """
+        now = now or datetime.now()
+        cycle, day = current_period(now)
+        cycle_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if not self._indexes_ready:
+            self.ensure_indexes()
+
+        unpaid = next(self.bills_collection.aggregate([
+            {"$match": {"status": "Unpaid"}},
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "amount": {"$sum": {"$subtract": [
+                    {"$ifNull": ["$total_amount", 0]},
+                    {"$ifNull": ["$rate_breakdown.previous_dues", 0]}
+                ]}}
+            }}
+        ]), {})
+        collected = next(self.bills_collection.aggregate([
+            {"$match": {"payment_date": {"$gte": day_start}, "status": "Paid"}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "amount": {"$sum": "$total_amount"}}}
+        ]), {})
+        newest_household = self.households_collection.find_one({}, {"_id": 1}, sort=[("_id", DESCENDING)])
+
+        kpis = {
+            "outstanding_amount": round(unpaid.get('amount', 0.0), 2),
+            "unpaid_bills": unpaid.get('count', 0),
+            "cycle": cycle,
+            "cycle_bills": self.bills_collection.count_documents({"date": {"$gte": cycle_start}}),
+            "day": day,
+            "collected_today": round(collected.get('amount', 0.0), 2),
+            "payments_today": collected.get('count', 0),
+            "recent_bills": self._recent_bills(),
+            "households": self.households_collection.count_documents({}),
+            "newest_household_id": newest_household and newest_household['_id'],
+            "computed_at": now
+        }
+        self.kpi_collection.replace_one({"_id": KPI_DOCUMENT_ID}, kpis, upsert=True)
+        kpis['_id'] = KPI_DOCUMENT_ID
+        return kpis
+
+    def _recent_bills(self):
+        projection = dict.fromkeys(RECENT_BILL_FIELDS + ('household_id',), 1)
+        bills = list(self.bills_collection.find({}, projection).sort("date", DESCENDING).limit(RECENT_BILLS_COUNT))
+        missing = {bill['household_id'] for bill in bills if 'household_name' not in bill and bill.get('household_id')}
+        names = {}
+        if missing:
+            names = {household['_id']: household.get('household_name') for household in
+                     self.households_collection.find({"_id": {"$in": list(missing)}}, {"household_name": 1})}
+        for bill in bills:
+            if 'household_name' not in bill:
+                bill['household_name'] = names.get(bill.pop('household_id', None), 'N/A')
+            bill.pop('household_id', None)
+        return bills
+
+    def refresh_recent_bills(self):
+        """Rebuild only the recent bills list (after deletions and fines)."""
+        try:
+            self.kpi_collection.update_one({"_id": KPI_DOCUMENT_ID},
+                                           {"$set": {"recent_bills": self._recent_bills()}})
+        except PyMongoError as e:
+            logger.warning("Dashboard recent bills update failed: %s", e)
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def _apply(self, update, now=None):
+        """
+        Apply an increment while the document is current; recompute otherwise.
+        
+        Failures are logged, never raised: the bill or payment that triggered
+        the update has already been stored, and the next refresh() repairs
+        the numbers.
+        """
+        cycle, day = current_period(now)
+        try:
+            result = self.kpi_collection.update_one({"_id": KPI_DOCUMENT_ID, "cycle": cycle, "day": day}, update)
+            if result.matched_count == 0:
+                self.refresh(now)
+        except PyMongoError as e:
+            logger.warning("Dashboard KPI update failed: %s", e)
+
+    def record_bill(self, bill):
+        """
+        Account for a newly created bill.
+
+        Input:
+        - bill (dict): Full bill document (with household_name and _id)
+        """
+        snapshot = {field: bill.get(field) for field in RECENT_BILL_FIELDS}
+        snapshot['_id'] = bill['_id']
+        snapshot['version'] = bill.get('version', 0)
+        self._apply({
+            "$inc": {"outstanding_amount": own_charges(bill), "unpaid_bills": 1, "cycle_bills": 1},
+            "$push": {"recent_bills": {
+                "$each": [snapshot],
+                "$sort": {"date": -1},
+                "$slice": RECENT_BILLS_COUNT
+            }}
+        })
+
+    def record_payments(self, bills):
+        """
+        Account for bills that were just paid.
+
+        Input:
+        - bills (list): Paid bill documents (total_amount, rate_breakdown.previous_dues)
+        """
+        if not bills:
+            return
+        self._apply({"$inc": {
+            "outstanding_amount": -round(sum(own_charges(bill) for bill in bills), 2),
+            "unpaid_bills": -len(bills),
+            "collected_today": round(sum(bill.get('total_amount', 0) for bill in bills), 2),
+            "payments_today": len(bills)
+        }})
+
+    def record_fines(self, count):
+        """Account for count bills that were each fined FINE_AMOUNT."""
+        if count:
+            self._apply({"$inc": {"outstanding_amount": FINE_AMOUNT * count}})
+            self.refresh_recent_bills()
+
+    def record_deletion(self, bill, now=None):
+        """
+        Account for a deleted bill.
+
+        Input:
+        - bill (dict): The deleted bill document
+        """
+        now = now or datetime.now()
+        increments = {}
+        if bill.get('status') == 'Unpaid':
+            increments.update(outstanding_amount=-own_charges(bill), unpaid_bills=-1)
+        elif bill.get('payment_date') and bill['payment_date'].date() == now.date():
+            increments.update(collected_today=-bill.get('total_amount', 0), payments_today=-1)
+        if bill.get('date') and bill['date'].strftime('%Y-%m') == current_period(now)[0]:
+            increments['cycle_bills'] = -1
+
+        if increments:
+            self._apply({"$inc": increments}, now)
+        self.refresh_recent_bills()
+
+    def record_household(self, household):
+        """Account for a newly registered household."""
+        self._apply({
+            "$inc": {"households": 1},
+            "$max": {"newest_household_id": household['_id']}
+        })
+
+    def record_households(self, households):
+        """Account for a batch of newly registered households (one update)."""
+        if households:
+            self._apply({
+                "$inc": {"households": len(households)},
+                "$max": {"newest_household_id": max(household['_id'] for household in households)}
+            })
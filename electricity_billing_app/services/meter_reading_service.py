@@ -0,0 +1,408 @@
+"""
+Meter Reading Service Module
+----------------------------
+Stores cumulative meter readings and derives consumption from them.
+
+Module: meter_reading_service.py
+Purpose: Keep every household's meter reading history so bills can be
+         computed from reading deltas, readings validated against earlier
+         ones and consumption charted over any date range
+Input: Readings {household_id or service_number, reading, read_at}
+Output: Reading documents, per-household meter_summary and consumption series
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Readings live in a MongoDB time-series collection (timeField read_at,
+  metaField household_id), so one household's readings are stored together
+  and a date range query reads only that household's buckets
+- A reading must not be lower than the reading before it or higher than the
+  reading after it (meters only count up)
+- households.meter_summary keeps the first and last reading, updated with
+  $min/$max, so billing and bulk imports need no scan of the history
+- A reading whose daily consumption exceeds READING_ANOMALY_FACTOR times the
+  household's average is stored with anomaly=True
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid, OperationFailure
+from modules.constants import (METER_READINGS_COLLECTION, READING_ANOMALY_FACTOR, READING_BUCKETS,
+                               ERROR_MESSAGES)
+
+SECONDS_PER_DAY = 86400.0
+# Rows per add_readings() call when importing a CSV file
+READING_IMPORT_CHUNK_SIZE = 5000
+
+
+def daily_rate(units, start, end):
+    """Average units per day between two readings (None if no time passed)."""
+    seconds = (end - start).total_seconds()
+    if seconds <= 0:
+        return None
+    return units / (seconds / SECONDS_PER_DAY)
+
+
+def is_anomaly(summary, reading, read_at):
+    """
+    Check a new reading against the household's long-run average.
+
+    Input:
+    - summary (dict or None): households.meter_summary before the reading
+    - reading (float): New cumulative reading
+    - read_at (datetime): When it was taken
+
+    Output:
+    - bool: True if consumption since the last reading is unusually high
+    """
+    if not summary:
+        return False
+    average = daily_rate(summary['last_reading'] - summary['first_reading'],
+                         summary['first_at'], summary['last_at'])
+    current = daily_rate(reading - summary['last_reading'], summary['last_at'], read_at)
+    if not average or current is None:
+        return False
+    return current > READING_ANOMALY_FACTOR * average
+
+
+def parse_reading(value):
+    """Convert a reading to float, raising ValueError if it is not a valid reading."""
+    try:
+        reading = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(ERROR_MESSAGES['reading_invalid'])
+    if reading < 0 or reading != reading:
+        raise ValueError(ERROR_MESSAGES['reading_invalid'])
+    return reading
+
+
+def parse_read_at(value):
+    """
+    Convert an ISO 8601 string (or datetime) to a naive local datetime.
+
+    Raises:
+    - ValueError: If the string is not a valid ISO 8601 date/time
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+class MeterReadingService:
+    def __init__(self, db):
+        self.db = db
+        self.readings_collection = db[METER_READINGS_COLLECTION]
+        self.households_collection = db['households']
+        self._collection_ready = False
+
+    def ensure_collection(self):
+        """
+        Create the time-series collection and its (household_id, read_at) index.
+
+        Falls back to a regular collection on servers without time-series
+        support (MongoDB < 5.0); the index makes range queries fast either way.
+        """
+        if METER_READINGS_COLLECTION not in self.db.list_collection_names():
+            try:
+                self.db.create_collection(METER_READINGS_COLLECTION, timeseries={
+                    'timeField': 'read_at',
+                    'metaField': 'household_id',
+                    'granularity': 'hours'
+                })
+            except CollectionInvalid:
+                pass  # Created by another process in the meantime
+            except OperationFailure:
+                if METER_READINGS_COLLECTION not in self.db.list_collection_names():
+                    self.db.create_collection(METER_READINGS_COLLECTION)
+        self.readings_collection.create_index(
+            [("household_id", ASCENDING), ("read_at", ASCENDING)], name="household_id_1_read_at_1"
+        )
+        self._collection_ready = True
+
+    def _resolve_household(self, household_id=None, service_number=None):
+        if household_id is not None:
+            household = self.households_collection.find_one({"_id": ObjectId(household_id)},
+                                                            {"meter_summary": 1})
+        else:
+            household = self.households_collection.find_one({"service_number": service_number},
+                                                            {"meter_summary": 1})
+        if not household:
+            raise ValueError(ERROR_MESSAGES['household_not_found'])
+        return household
+
+    @staticmethod
+    def _summary_update(household_id, first, last, count):
+        """UpdateOne that widens meter_summary to cover the given first/last readings."""
+        return UpdateOne({"_id": household_id}, {
+            "$min": {"meter_summary.first_reading": first['reading'], "meter_summary.first_at": first['read_at']},
+            "$max": {"meter_summary.last_reading": last['reading'], "meter_summary.last_at": last['read_at']},
+            "$inc": {"meter_summary.readings": count}
+        })
+
+    def add_reading(self, household_id=None, reading=None, read_at=None, source='manual',
+                    service_number=None):
+        """
+        Record one meter reading.
+
+        Preconditions:
+        - household_id or service_number identifies an existing household
+
+        Logic:
+        1. Validate the reading (non-negative number)
+        2. Check it against the nearest readings before and after read_at
+        3. Flag it as an anomaly when consumption is far above the average
+        4. Insert it and widen the household's meter_summary
+
+        Input:
+        - household_id (str or ObjectId, optional)
+        - reading (float): Cumulative meter reading (kWh)
+        - read_at (datetime, optional): Defaults to now
+        - source (str): 'manual', 'import', 'bill', ...
+        - service_number (str, optional): Used when household_id is not given
+
+        Output:
+        - dict: Inserted reading document, plus 'previous' (the reading before it or None)
+
+        Raises:
+        - ValueError: If the reading is invalid, out of order or the household is unknown
+
+        Examples:
+        >>> meter_service.add_reading(household_id, 10250.5)
+        {'household_id': ObjectId('...'), 'reading': 10250.5, 'anomaly': False, ...}
+        """
+        household = self._resolve_household(household_id, service_number)
+        return self.store_reading(self.prepare_reading(household, reading, read_at, source))
+
+    def prepare_reading(self, household, reading, read_at=None, source='manual'):
+        """
+        Validate one reading without storing it (steps 1-3 of add_reading).
+
+        Lets a caller check a reading, write what depends on it (a bill), and
+        only then store it with store_reading(), so a failed write leaves no
+        orphaned reading behind.
+
+        Input:
+        - household (dict): Household document with _id (and meter_summary)
+        - reading (float): Cumulative meter reading (kWh)
+        - read_at (datetime, optional): Defaults to now
+        - source (str): Stored on the reading
+
+        Output:
+        - dict: Reading document ready for store_reading(), plus 'previous'
+
+        Raises:
+        - ValueError: If the reading is invalid or out of order
+        """
+        reading = parse_reading(reading)
+        read_at = parse_read_at(read_at or datetime.now())
+        household_id = household['_id']
+
+        if not self._collection_ready:
+            self.ensure_collection()
+
+        previous = self.readings_collection.find_one(
+            {"household_id": household_id, "read_at": {"$lte": read_at}},
+            {"_id": 0, "reading": 1, "read_at": 1}, sort=[("read_at", DESCENDING)]
+        )
+        following = self.readings_collection.find_one(
+            {"household_id": household_id, "read_at": {"$gt": read_at}},
+            {"_id": 0, "reading": 1}, sort=[("read_at", ASCENDING)]
+        )
+        if (previous and reading < previous['reading']) or (following and reading > following['reading']):
+            raise ValueError(ERROR_MESSAGES['reading_regression'])
+
+        summary = household.get('meter_summary')
+        return {
+            "household_id": household_id,
+            "read_at": read_at,
+            "reading": reading,
+            "source": source,
+            "anomaly": following is None and is_anomaly(summary, reading, read_at),
+            "previous": previous
+        }
+
+    def store_reading(self, document):
+        """Insert a reading from prepare_reading() and widen the household's meter_summary."""
+        previous = document.pop('previous', None)
+        self.readings_collection.insert_one(document)
+        self.households_collection.bulk_write([self._summary_update(document['household_id'], document, document, 1)])
+        document['previous'] = previous
+        return document
+
+    def add_readings(self, readings, source='import'):
+        """
+        Record many meter readings at once (a meter-reading round).
+
+        Preconditions:
+        - Each reading is newer than the household's last stored reading
+          (use add_reading() to insert a correction into the past)
+
+        Logic:
+        1. Resolve households by _id or service_number with one $in query each
+        2. Group readings per household and sort them by read_at
+        3. Reject readings that are older than, or lower than, the one before
+        4. Insert the accepted readings in one unordered insert_many
+        5. Widen each household's meter_summary in one bulk_write
+
+        Input:
+        - readings (list): [{'household_id' or 'service_number', 'reading', 'read_at' (optional)}]
+        - source (str): Stored on every reading
+
+        Output:
+        - dict: {
+            'inserted': int,
+            'anomalies': int,
+            'rejected': [{'index': int, 'error': str}]
+          }
+
+        Examples:
+        >>> meter_service.add_readings([{'service_number': '00000001', 'reading': 10250.5}])
+        {'inserted': 1, 'anomalies': 0, 'rejected': []}
+        """
+        now = datetime.now()
+        rejected = []
+        by_id = {}
+        by_service_number = {}
+        for index, entry in enumerate(readings):
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError("Each reading must be an object")
+                if entry.get('household_id'):
+                    by_id.setdefault(ObjectId(str(entry['household_id'])), []).append(index)
+                elif entry.get('service_number'):
+                    by_service_number.setdefault(str(entry['service_number']), []).append(index)
+                else:
+                    raise ValueError("household_id or service_number is required")
+            except Exception as e:
+                rejected.append({'index': index, 'error': str(e)})
+
+        households = {}
+        series = defaultdict(list)
+        if by_id:
+            for household in self.households_collection.find({"_id": {"$in": list(by_id)}}, {"meter_summary": 1}):
+                households[household['_id']] = household
+                series[household['_id']].extend(by_id.pop(household['_id']))
+        if by_service_number:
+            for household in self.households_collection.find(
+                {"service_number": {"$in": list(by_service_number)}}, {"meter_summary": 1, "service_number": 1}
+            ):
+                households[household['_id']] = household
+                series[household['_id']].extend(by_service_number.pop(household['service_number']))
+        for indexes in list(by_id.values()) + list(by_service_number.values()):
+            rejected.extend({'index': index, 'error': ERROR_MESSAGES['household_not_found']} for index in indexes)
+
+        documents = []
+        summary_updates = []
+        for household_id, indexes in series.items():
+            entries = []
+            for index in indexes:
+                try:
+                    read_at = parse_read_at(readings[index].get('read_at') or now)
+                    entries.append((read_at, parse_reading(readings[index].get('reading')), index))
+                except ValueError as e:
+                    rejected.append({'index': index, 'error': str(e)})
+            entries.sort(key=lambda entry: entry[:2])
+
+            summary = households[household_id].get('meter_summary')
+            accepted = []
+            for read_at, reading, index in entries:
+                if summary and (read_at <= summary['last_at'] or reading < summary['last_reading']):
+                    rejected.append({'index': index, 'error': ERROR_MESSAGES['reading_regression']})
+                    continue
+                document = {
+                    "household_id": household_id,
+                    "read_at": read_at,
+                    "reading": reading,
+                    "source": source,
+                    "anomaly": is_anomaly(summary, reading, read_at)
+                }
+                accepted.append(document)
+                if summary is None:
+                    summary = {'first_reading': reading, 'first_at': read_at}
+                summary = dict(summary, last_reading=reading, last_at=read_at)
+
+            if accepted:
+                documents.extend(accepted)
+                summary_updates.append(self._summary_update(household_id, accepted[0], accepted[-1],
+                                                            len(accepted)))
+
+        if documents:
+            if not self._collection_ready:
+                self.ensure_collection()
+            self.readings_collection.insert_many(documents, ordered=False)
+            self.households_collection.bulk_write(summary_updates, ordered=False)
+
+        rejected.sort(key=lambda item: item['index'])
+        return {
+            'inserted': len(documents),
+            'anomalies': sum(1 for document in documents if document['anomaly']),
+            'rejected': rejected
+        }
+
+    def get_readings(self, household_id, start=None, end=None):
+        """
+        Readings of one household in [start, end), oldest first.
+
+        Output:
+        - list: [{'read_at', 'reading', 'anomaly'}]
+        """
+        query = {"household_id": ObjectId(household_id)}
+        if start or end:
+            query['read_at'] = {}
+            if start:
+                query['read_at']['$gte'] = start
+            if end:
+                query['read_at']['$lt'] = end
+        return list(self.readings_collection.find(
+            query, {"_id": 0, "read_at": 1, "reading": 1, "anomaly": 1}
+        ).sort("read_at", ASCENDING))
+
+    def consumption(self, household_id, start=None, end=None, bucket='day'):
+        """
+        Consumption per day or month between start and end, for charts.
+
+        Logic:
+        1. Fetch the readings in range plus the last reading before start
+        2. Attribute each delta between consecutive readings to the bucket of
+           the later reading
+
+        Input:
+        - household_id (str or ObjectId)
+        - start, end (datetime, optional): Range [start, end)
+        - bucket (str): 'day' or 'month'
+
+        Output:
+        - list: [{'period': '2026-01-05', 'units': float, 'readings': int, 'anomalies': int}]
+
+        Raises:
+        - ValueError: If bucket is unknown
+        """
+        if bucket not in READING_BUCKETS:
+            raise ValueError(f"bucket must be one of {', '.join(READING_BUCKETS)}")
+        period_format = '%Y-%m-%d' if bucket == 'day' else '%Y-%m'
+
+        readings = self.get_readings(household_id, start, end)
+        previous = None
+        if start:
+            previous = self.readings_collection.find_one(
+                {"household_id": ObjectId(household_id), "read_at": {"$lt": start}},
+                {"_id": 0, "reading": 1}, sort=[("read_at", DESCENDING)]
+            )
+
+        periods = {}
+        previous_reading = previous['reading'] if previous else None
+        for reading in readings:
+            period = periods.setdefault(reading['read_at'].strftime(period_format),
+                                        {'units': 0.0, 'readings': 0, 'anomalies': 0})
+            if previous_reading is not None:
+                period['units'] += reading['reading'] - previous_reading
+            period['readings'] += 1
+            period['anomalies'] += 1 if reading.get('anomaly') else 0
+            previous_reading = reading['reading']
+
+        return [dict(values, period=key, units=round(values['units'], 2)) for key, values in periods.items()]
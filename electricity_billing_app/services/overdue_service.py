@@ -0,0 +1,156 @@
+"""
+Overdue Service Module
+----------------------
+Applies the late payment fine to unpaid bills once their due date passes.
+
+Module: overdue_service.py
+Purpose: Scheduled, idempotent application of FINE_AMOUNT to overdue bills
+Input: Database handle, current time
+Output: Processing report (bills fined, batches, throughput)
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Overdue bills are located through the (status, due_date) index
+- Fines are applied in batches with update_many, so a large backlog never
+  holds one long-running write
+- Every fined bill is marked fine_applied, and the update filter requires
+  the mark to be absent, so re-running the job (or running two at once)
+  never fines a bill twice
+- Fined bills get their version incremented, so cached page fragments of
+  those bills are re-rendered
+"""
+
+import time
+from datetime import datetime
+from pymongo import ASCENDING
+from modules.constants import FINE_AMOUNT
+from services.kpi_service import KpiService
+
+OVERDUE_INDEX_NAME = "status_1_due_date_1"
+OVERDUE_BATCH_SIZE = 1000
+
+
+class OverdueService:
+    def __init__(self, db):
+        self.bills_collection = db['electricity_billing']
+        self.kpi_service = KpiService(db)
+
+    def ensure_indexes(self):
+        """Create the (status, due_date) index used to find overdue bills."""
+        self.bills_collection.create_index(
+            [("status", ASCENDING), ("due_date", ASCENDING)],
+            name=OVERDUE_INDEX_NAME
+        )
+
+    def apply_overdue_fines(self, now=None, batch_size=OVERDUE_BATCH_SIZE):
+        """
+        Apply the late payment fine to every overdue unpaid bill.
+
+        Preconditions:
+        - batch_size is a positive integer
+
+        Logic:
+        1. Ensure the (status, due_date) index exists
+        2. Select up to batch_size ids of bills that are Unpaid, past due
+           and not yet fined
+        3. Add FINE_AMOUNT to fine_amount and total_amount and set
+           fine_applied in one update_many for the batch
+        4. Repeat until no overdue bills remain
+        5. Report bills processed and throughput
+
+        Algorithm:
+        ----------
+        overdue = {status: Unpaid, due_date < now, fine_applied != True}
+
+        LOOP:
+            ids = FIND overdue (ids only, via index) LIMIT batch_size
+            IF ids is empty:
+                BREAK
+            UPDATE_MANY {_id in ids AND overdue}:
+                fine_amount += FINE_AMOUNT
+                total_amount += FINE_AMOUNT
+                fine_applied = True
+
+        Input:
+        - now (datetime, optional): Reference time (defaults to current time)
+        - batch_size (int): Bills updated per update_many
+
+        Output:
+        - dict: {
+            'processed': int - Bills fined in this run
+            'batches': int - Number of update batches issued
+            'seconds': float - Elapsed time
+            'bills_per_second': float - Throughput
+          }
+
+        Examples:
+        >>> OverdueService(db).apply_overdue_fines()
+        {'processed': 42, 'batches': 1, 'seconds': 0.03, 'bills_per_second': 1400.0}
+        """
+        if now is None:
+            now = datetime.now()
+
+        self.ensure_indexes()
+
+        overdue_filter = {
+            "status": "Unpaid",
+            "due_date": {"$lt": now},
+            "fine_applied": {"$ne": True}
+        }
+
+        started = time.perf_counter()
+        processed = 0
+        batches = 0
+
+        while True:
+            batch_ids = [
+                doc['_id'] for doc in self.bills_collection.find(
+                    overdue_filter, {"_id": 1}
+                ).hint(OVERDUE_INDEX_NAME).limit(batch_size)
+            ]
+            if not batch_ids:
+                break
+
+            # Repeat the overdue conditions so a bill paid or fined by a
+            # concurrent run in the meantime is left alone
+            result = self.bills_collection.update_many(
+                dict(overdue_filter, _id={"$in": batch_ids}),
+                {
+                    "$inc": {
+                        "rate_breakdown.fine_amount": FINE_AMOUNT,
+                        "total_amount": FINE_AMOUNT,
+                        "version": 1
+                    },
+                    "$set": {
+                        "fine_applied": True,
+                        "fine_applied_date": now
+                    }
+                }
+            )
+            processed += result.modified_count
+            batches += 1
+
+        self.kpi_service.record_fines(processed)
+        
+        elapsed = time.perf_counter() - started
+        return {
+            'processed': processed,
+            'batches': batches,
+            'seconds': elapsed,
+            'bills_per_second': processed / elapsed if elapsed > 0 else 0.0
+        }
+
+    def run_forever(self, interval_seconds, batch_size=OVERDUE_BATCH_SIZE, report=print):
+        """
+        Run apply_overdue_fines every interval_seconds until interrupted.
+
+        Input:
+        - interval_seconds (float): Delay between runs
+        - batch_size (int): Bills updated per update_many
+        - report (Callable): Receives each run's result dictionary
+        """
+        while True:
+            report(self.apply_overdue_fines(batch_size=batch_size))
+            time.sleep(interval_seconds)
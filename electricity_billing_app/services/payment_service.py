@@ -0,0 +1,404 @@
+"""
+Payment Service Module
+----------------------
+Records bill payments exactly once, singly or in bulk.
+
+Module: payment_service.py
+Purpose: Idempotent payment posting and bank reconciliation file import
+Input: Bill ids with optional idempotency keys, amounts and methods
+Output: Per-payment outcome dictionaries
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- A bill is only ever moved to Paid by a conditional update that requires
+  status "Unpaid", so double submissions cannot pay a bill twice
+- Every payment carries an idempotency key (the bank reference for file
+  imports, a form token for online payments). Keys are stored in the
+  payments collection under a unique index; a repeated key returns the
+  original outcome and amount (with replayed=True) instead of posting again
+- A key left pending by a crashed attempt is claimed again after
+  PAYMENT_CLAIM_LEASE_SECONDS
+- Batches are written with bulk_write in chunks of PAYMENT_CHUNK_SIZE
+
+Payment outcomes:
+- paid          Bill moved from Unpaid to Paid by this payment
+- already_paid  Bill was already Paid (by another payment)
+- duplicate     An earlier attempt with this key is still running; nothing was changed
+- underpaid     Amount is less than the bill total; bill left Unpaid
+- not_found     No bill with this id
+- invalid       Malformed bill id or amount
+"""
+
+import csv
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from modules.fragment_cache import fragment_cache
+from modules.singleflight import read_coalescer
+from services.kpi_service import KpiService
+
+PAYMENT_CHUNK_SIZE = 1000
+DEFAULT_PAYMENT_METHOD = 'Credit Card'
+# A key left 'pending' this long belongs to a crashed attempt and may be claimed again
+PAYMENT_CLAIM_LEASE_SECONDS = 300
+
+# Tolerance when comparing a paid amount with the bill total
+AMOUNT_TOLERANCE = 0.005
+
+
+def new_idempotency_key():
+    """Generate a fresh idempotency key (e.g. for a payment form)."""
+    return uuid.uuid4().hex
+
+
+class PaymentService:
+    def __init__(self, db):
+        self.bills_collection = db['electricity_billing']
+        self.payments_collection = db['payments']
+        self.kpi_service = KpiService(db)
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """Create the unique idempotency key index on payments."""
+        self.payments_collection.create_index(
+            [("idempotency_key", ASCENDING)], unique=True, name="idempotency_key_1"
+        )
+        self._indexes_ready = True
+
+    def pay_bill(self, bill_id, method=DEFAULT_PAYMENT_METHOD, idempotency_key=None, amount=None):
+        """
+        Pay a single bill.
+
+        Preconditions:
+        - bill_id is a bill ObjectId (or its string form)
+
+        Logic:
+        1. Claim the idempotency key by inserting a pending payment record;
+           if the key already has an outcome, return it and change nothing
+        2. Conditionally update the bill (status must be "Unpaid" and, if an
+           amount is given, total_amount must not exceed it)
+        3. If nothing was updated, work out why (already paid, underpaid,
+           not found)
+        4. Store the outcome on the payment record and return it
+
+        Input:
+        - bill_id (str/ObjectId): Bill to pay
+        - method (str): Payment method label
+        - idempotency_key (str, optional): Client supplied key; generated if absent
+        - amount (float, optional): Amount received
+
+        Output:
+        - dict: {'bill_id', 'idempotency_key', 'outcome', 'amount', 'replayed'}
+
+        Examples:
+        >>> payment_service.pay_bill('65b...', idempotency_key='form-token-1')
+        {'bill_id': '65b...', 'idempotency_key': 'form-token-1', 'outcome': 'paid', 'amount': None,
+         'replayed': False}
+        >>> payment_service.pay_bill('65b...', idempotency_key='form-token-1')['replayed']
+        True
+        """
+        results = self.process_batch([{
+            'bill_id': bill_id,
+            'method': method,
+            'idempotency_key': idempotency_key or new_idempotency_key(),
+            'amount': amount
+        }])
+        return results[0]
+
+    def process_batch(self, payments, chunk_size=PAYMENT_CHUNK_SIZE):
+        """
+        Post many payments using chunked bulk writes.
+
+        Preconditions:
+        - payments is an iterable of dicts with at least 'bill_id'; optional
+          'idempotency_key' (or 'reference'), 'amount' and 'method'
+
+        Logic:
+        1. Split payments into chunks
+        2. For each chunk:
+           a. Reject malformed ids/amounts as invalid
+           b. Bulk insert payment records; keys that already have an outcome
+              (or repeat inside the chunk) replay it, stale pending keys are
+              claimed again
+           c. Bulk conditional update of the claimed bills
+           d. Read back the bills to classify every payment's outcome
+           e. Bulk update payment records with their outcomes
+
+        Input:
+        - payments (Iterable[dict]): Payments to post
+        - chunk_size (int): Payments per bulk_write
+
+        Output:
+        - list: One outcome dict per payment, in input order
+        """
+        if not self._indexes_ready:
+            self.ensure_indexes()
+        outcomes = []
+        iterator = iter(payments)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            outcomes.extend(self._process_chunk(chunk))
+        return outcomes
+
+    def _process_chunk(self, chunk):
+        now = datetime.now()
+        results = []
+        claims = []
+
+        # Step a: normalize and validate
+        for payment in chunk:
+            key = payment.get('idempotency_key') or payment.get('reference') or new_idempotency_key()
+            result = {
+                'bill_id': str(payment.get('bill_id', '')),
+                'idempotency_key': str(key),
+                'outcome': None,
+                'amount': None,
+                'replayed': False
+            }
+            results.append(result)
+
+            try:
+                if not payment.get('bill_id'):
+                    raise ValueError("missing bill id")
+                bill_oid = ObjectId(payment['bill_id'])
+                amount = payment.get('amount')
+                if amount not in (None, ''):
+                    amount = float(amount)
+                    if amount < 0:
+                        raise ValueError("negative amount")
+                    result['amount'] = amount
+            except (InvalidId, TypeError, ValueError):
+                result['outcome'] = 'invalid'
+                continue
+
+            claims.append((result, bill_oid, payment.get('method') or DEFAULT_PAYMENT_METHOD))
+
+        # Step b: claim idempotency keys
+        claimed, repeats = self._claim_keys(claims, now)
+        if claimed:
+            self._post_claimed(claimed, now)
+
+        for result, first in repeats:
+            result['outcome'] = first['outcome']
+            result['amount'] = first['amount']
+            result['replayed'] = first['outcome'] != 'duplicate'
+        return results
+
+    def _post_claimed(self, claimed, now):
+        """Steps c-e of process_batch for the payments that won their key."""
+        # Step c: conditional bill updates
+        updates = []
+        for result, bill_oid, method in claimed:
+            bill_filter = {'_id': bill_oid, 'status': 'Unpaid'}
+            if result['amount'] is not None:
+                bill_filter['total_amount'] = {'$lte': result['amount'] + AMOUNT_TOLERANCE}
+            updates.append(UpdateOne(bill_filter, {'$set': {
+                'status': 'Paid',
+                'payment_date': now,
+                'payment_method': method,
+                'payment_reference': result['idempotency_key']
+            }, '$inc': {'version': 1}}))
+        self.bills_collection.bulk_write(updates, ordered=False)
+
+        # Step d: classify outcomes from the bills' current state
+        bills = {
+            bill['_id']: bill for bill in self.bills_collection.find(
+                {'_id': {'$in': [bill_oid for _, bill_oid, _ in claimed]}},
+                {'status': 1, 'payment_reference': 1, 'total_amount': 1, 'rate_breakdown.previous_dues': 1}
+            )
+        }
+        paid_bills = []
+        for result, bill_oid, _ in claimed:
+            bill = bills.get(bill_oid)
+            if bill is None:
+                result['outcome'] = 'not_found'
+            elif bill.get('status') == 'Paid' and bill.get('payment_reference') == result['idempotency_key']:
+                result['outcome'] = 'paid'
+                fragment_cache.invalidate_bill(bill_oid)
+                read_coalescer.forget(('bill', str(bill_oid)))
+                paid_bills.append(bill)
+            elif bill.get('status') == 'Paid':
+                result['outcome'] = 'already_paid'
+            else:
+                result['outcome'] = 'underpaid'
+
+        self.kpi_service.record_payments(paid_bills)
+
+        # Step e: record outcomes
+        self.payments_collection.bulk_write([
+            UpdateOne({'idempotency_key': result['idempotency_key']},
+                      {'$set': {'outcome': result['outcome'], 'completed_at': datetime.now()}})
+            for result, _, _ in claimed
+        ], ordered=False)
+
+    def _claim_keys(self, claims, now):
+        """
+        Claim idempotency keys for a chunk of payments.
+
+        Logic:
+        1. A key repeated inside the chunk follows its first occurrence
+        2. A key already stored with an outcome is replayed: the result gets
+           the stored outcome and amount, and replayed=True
+        3. A key stuck in 'pending' for longer than PAYMENT_CLAIM_LEASE_SECONDS
+           (its worker died between claim and outcome) is claimed again
+        4. New keys are inserted as pending records; keys inserted
+           concurrently by another worker fail the unique index
+
+        Re-claiming is safe: the bill update only matches an Unpaid bill, and
+        a bill already paid by the first attempt is recognised by its
+        payment_reference.
+
+        Output:
+        - tuple: (claims this call won, [(repeat result, first result)])
+        """
+        first_results = {}
+        repeats = []
+        unique_claims = []
+        for claim in claims:
+            result = claim[0]
+            first = first_results.get(result['idempotency_key'])
+            if first is not None:
+                repeats.append((result, first))
+            else:
+                first_results[result['idempotency_key']] = result
+                unique_claims.append(claim)
+        if not unique_claims:
+            return [], repeats
+
+        existing = {
+            doc['idempotency_key']: doc for doc in self.payments_collection.find(
+                {'idempotency_key': {'$in': list(first_results)}},
+                {'idempotency_key': 1, 'outcome': 1, 'amount': 1, 'claimed_at': 1, 'created_at': 1}
+            )
+        }
+
+        lease_cutoff = now - timedelta(seconds=PAYMENT_CLAIM_LEASE_SECONDS)
+        claimed = []
+        inserts = []
+        pending = []
+        for claim in unique_claims:
+            result, bill_oid, method = claim
+            stored = existing.get(result['idempotency_key'])
+            if stored is None:
+                pending.append(claim)
+                inserts.append(InsertOne({
+                    'idempotency_key': result['idempotency_key'],
+                    'bill_id': bill_oid,
+                    'amount': result['amount'],
+                    'method': method,
+                    'outcome': 'pending',
+                    'created_at': now,
+                    'claimed_at': now
+                }))
+            elif stored.get('outcome') != 'pending':
+                result['outcome'] = stored['outcome']
+                result['amount'] = stored.get('amount')
+                result['replayed'] = True
+            elif (stored.get('claimed_at') or stored['created_at']) < lease_cutoff and self._reclaim(
+                    stored, bill_oid, result['amount'], method, now):
+                claimed.append(claim)
+            else:
+                # The first attempt is still running (or another worker just re-claimed it)
+                result['outcome'] = 'duplicate'
+
+        lost = set()
+        if inserts:
+            try:
+                self.payments_collection.bulk_write(inserts, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    if error.get('code') != 11000:
+                        raise
+                    lost.add(error['index'])
+
+        for index, claim in enumerate(pending):
+            if index in lost:
+                claim[0]['outcome'] = 'duplicate'
+            else:
+                claimed.append(claim)
+        return claimed, repeats
+
+    def _reclaim(self, stored, bill_oid, amount, method, now):
+        """Take over a stale pending key; False if another worker got there first."""
+        claim_filter = {'_id': stored['_id'], 'outcome': 'pending'}
+        if stored.get('claimed_at') is not None:
+            claim_filter['claimed_at'] = stored['claimed_at']
+        else:
+            claim_filter['claimed_at'] = {'$exists': False}
+        update = self.payments_collection.update_one(claim_filter, {'$set': {
+            'bill_id': bill_oid,
+            'amount': amount,
+            'method': method,
+            'claimed_at': now
+        }})
+        return update.modified_count == 1
+
+    def import_file(self, stream, chunk_size=PAYMENT_CHUNK_SIZE):
+        """
+        Post payments from a bank reconciliation CSV.
+
+        Preconditions:
+        - stream is a text file object with a header row containing
+          bill_id and reference, and optionally amount and method
+
+        Logic:
+        1. Read rows lazily with csv.DictReader
+        2. Post them through process_batch (chunked bulk writes)
+        3. Return outcomes plus summary counts and throughput
+
+        Input:
+        - stream (TextIO): CSV file
+        - chunk_size (int): Payments per bulk_write
+
+        Output:
+        - dict: {'outcomes': list, 'counts': {outcome: int}, 'replayed': int,
+                 'seconds': float, 'payments_per_second': float}
+        """
+        started = time.perf_counter()
+        rows = ({
+            'bill_id': (row.get('bill_id') or '').strip(),
+            'idempotency_key': (row.get('reference') or '').strip() or None,
+            'amount': (row.get('amount') or '').strip() or None,
+            'method': (row.get('method') or '').strip() or 'Bank Transfer'
+        } for row in csv.DictReader(stream))
+
+        outcomes = self.process_batch(rows, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - started
+
+        counts = {}
+        for result in outcomes:
+            counts[result['outcome']] = counts.get(result['outcome'], 0) + 1
+
+        return {
+            'outcomes': outcomes,
+            'counts': counts,
+            # Rows whose reference was posted before (e.g. a re-imported file)
+            'replayed': sum(1 for result in outcomes if result['replayed']),
+            'seconds': elapsed,
+            'payments_per_second': len(outcomes) / elapsed if elapsed > 0 else 0.0
+        }
+
+    @staticmethod
+    def write_outcome_report(outcomes, stream):
+        """
+        Write a per-payment outcome report as CSV.
+
+        Input:
+        - outcomes (list): Outcome dicts from process_batch/import_file
+        - stream (TextIO): Destination file object
+        """
+        writer = csv.writer(stream)
+        writer.writerow(['bill_id', 'reference', 'amount', 'outcome', 'replayed'])
+        for result in outcomes:
+            amount = '' if result['amount'] is None else f"{result['amount']:.2f}"
+            writer.writerow([result['bill_id'], result['idempotency_key'], amount, result['outcome'],
+                             'yes' if result['replayed'] else ''])
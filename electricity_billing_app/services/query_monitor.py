@@ -0,0 +1,332 @@
+"""
+Query Monitor Module
+--------------------
+Slow-query log built on pymongo command monitoring.
+
+Module: query_monitor.py
+Purpose: Record every database operation slower than a threshold with its
+         normalized shape and duration, and capture the plan MongoDB used
+         for shapes that are slow again and again
+Input: pymongo CommandStartedEvent / CommandSucceededEvent / CommandFailedEvent
+Output: slow_queries (capped log) and slow_query_shapes (per-shape totals
+        and sampled explain output) collections
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Enabled by services/database.py when SLOW_QUERY_MS (default
+  SLOW_QUERY_THRESHOLD_MS) is above 0
+- The listener only keeps the started command and compares the duration;
+  slow operations are handed to a background thread through a bounded
+  queue, so request threads never write the log themselves (when the queue
+  is full the record is dropped and counted)
+- Shapes keep field names, operators, sort orders and projections and
+  replace every value with "?", so queries differing only in values
+  (bill ids, house numbers) share one shape
+- A shape seen SLOW_QUERY_EXPLAIN_AFTER times is explained (queryPlanner
+  verbosity, nothing is executed) with its latest command, at most once
+  per SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+- Operations on the log's own collections are never recorded
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timedelta
+from pymongo import monitoring, ReturnDocument, DESCENDING
+from pymongo.errors import CollectionInvalid, PyMongoError
+from modules.constants import (SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_COLLECTION,
+                               SLOW_QUERY_SHAPES_COLLECTION, SLOW_QUERY_LOG_BYTES,
+                               SLOW_QUERY_EXPLAIN_AFTER, SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS,
+                               SLOW_QUERY_QUEUE_SIZE)
+
+logger = logging.getLogger(__name__)
+
+# Commands whose shape and plan are worth recording (inserts and getMore are not)
+MONITORED_COMMANDS = frozenset(('find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify'))
+
+# Session and transport fields that are not part of a query's shape
+META_FIELDS = frozenset(('lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber', 'autocommit',
+                         'startTransaction', 'readConcern', 'writeConcern', 'maxTimeMS', 'comment',
+                         'cursor', 'batchSize', 'singleBatch', 'ordered', 'apiVersion'))
+
+# Keys whose values describe the shape itself and are kept as they are
+VERBATIM_FIELDS = frozenset(('sort', 'projection', 'fields', 'hint', 'key', '$sort', '$project',
+                             '$group', '$unwind', '$count', '$lookup'))
+
+OWN_COLLECTIONS = frozenset((SLOW_QUERY_LOG_COLLECTION, SLOW_QUERY_SHAPES_COLLECTION))
+
+
+def get_threshold_ms():
+    """Slow query threshold from SLOW_QUERY_MS (0 or negative disables the log)."""
+    value = os.environ.get('SLOW_QUERY_MS')
+    return float(value) if value not in (None, '') else SLOW_QUERY_THRESHOLD_MS
+
+
+def _verbatim(value):
+    """JSON-friendly copy of a value kept in the shape (ObjectIds etc. become strings)."""
+    return json.loads(json.dumps(value, default=str))
+
+
+def normalize(value):
+    """
+    Replace every value with "?" keeping field names and operators.
+
+    Lists whose elements normalize identically ($in lists, batched
+    statements) collapse to one element.
+
+    Examples:
+    >>> normalize({'status': 'Unpaid', 'due_date': {'$lt': datetime.now()}})
+    {'status': '?', 'due_date': {'$lt': '?'}}
+    >>> normalize({'_id': {'$in': [1, 2, 3]}})
+    {'_id': {'$in': ['?']}}
+    """
+    if isinstance(value, dict):
+        return {key: _verbatim(item) if key in VERBATIM_FIELDS else normalize(item)
+                for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [normalize(item) for item in value]
+        if items and all(item == items[0] for item in items):
+            return items[:1]
+        return items
+    return '?'
+
+
+def query_shape(command_name, command):
+    """
+    Normalized shape of a command.
+
+    Output:
+    - tuple: (collection, shape dict)
+    """
+    collection = command.get(command_name)
+    shape = {key: normalize(value) if key not in VERBATIM_FIELDS else _verbatim(value)
+             for key, value in command.items() if key != command_name and key not in META_FIELDS}
+    return collection, shape
+
+
+def shape_hash(command_name, collection, shape):
+    text = json.dumps([command_name, collection, shape], sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+
+def _find_query_planner(explain):
+    """Locate queryPlanner in find/aggregate explain output (it may be nested in $cursor)."""
+    if isinstance(explain, dict):
+        if 'queryPlanner' in explain:
+            return explain['queryPlanner']
+        for value in explain.values():
+            found = _find_query_planner(value)
+            if found is not None:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = _find_query_planner(value)
+            if found is not None:
+                return found
+    return None
+
+
+def summarize_plan(explain):
+    """
+    One-line summary of the winning plan, outermost stage first.
+
+    Examples:
+    >>> summarize_plan(explain)
+    'LIMIT > FETCH > IXSCAN status_1_due_date_1'
+    """
+    planner = _find_query_planner(explain)
+    if not planner:
+        return 'unknown'
+    stage = planner.get('winningPlan', {})
+    stage = stage.get('queryPlan', stage)     # slot-based engine nests the plan
+    parts = []
+    while stage:
+        label = stage.get('stage', '?')
+        if stage.get('indexName'):
+            label += f" {stage['indexName']}"
+        parts.append(label)
+        children = stage.get('inputStages') or ([stage['inputStage']] if stage.get('inputStage') else [])
+        if len(children) > 1:
+            parts.append('(' + ' | '.join(summarize_plan({'queryPlanner': {'winningPlan': child}})
+                                           for child in children) + ')')
+            break
+        stage = children[0] if children else None
+    return ' > '.join(parts)
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """pymongo command listener recording operations slower than threshold_ms."""
+
+    def __init__(self, threshold_ms=None):
+        self.threshold_micros = (threshold_ms if threshold_ms is not None else get_threshold_ms()) * 1000
+        self.db = None
+        self.dropped = 0
+        self._pending = {}
+        self._queue = queue.Queue(maxsize=SLOW_QUERY_QUEUE_SIZE)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._collections_ready = False
+
+    def attach(self, db):
+        """Set the database the log is written to (the client's default database)."""
+        self.db = db
+
+    # ------------------------------------------------------------------
+    # Listener callbacks (run on the thread that issued the command)
+    # ------------------------------------------------------------------
+
+    def started(self, event):
+        if event.command_name in MONITORED_COMMANDS:
+            collection = event.command.get(event.command_name)
+            if collection not in OWN_COLLECTIONS:
+                self._pending[(event.connection_id, event.request_id)] = event.command
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        command = self._pending.pop((event.connection_id, event.request_id), None)
+        if command is None or event.duration_micros < self.threshold_micros:
+            return
+        record = (event.command_name, command, event.duration_micros / 1000.0, event.database_name,
+                  datetime.now(), isinstance(event, monitoring.CommandFailedEvent))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_writer()
+
+    # ------------------------------------------------------------------
+    # Background writer
+    # ------------------------------------------------------------------
+
+    def _ensure_writer(self):
+        if self._writer is not None and self._writer.is_alive():
+            return
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            try:
+                self.record(*record)
+            except PyMongoError as e:
+                logger.warning("Could not record slow query: %s", e)
+            except Exception:
+                logger.exception("Slow query log failed")
+            finally:
+                self._queue.task_done()
+
+    def stats(self):
+        return {'threshold_ms': self.threshold_micros / 1000, 'queued': self._queue.qsize(), 'dropped': self.dropped}
+
+    def flush(self):
+        """Block until every queued slow operation has been written."""
+        self._queue.join()
+
+    def ensure_collections(self):
+        """Create the capped log and the shapes index."""
+        try:
+            self.db.create_collection(SLOW_QUERY_LOG_COLLECTION, capped=True, size=SLOW_QUERY_LOG_BYTES)
+        except CollectionInvalid:
+            pass  # Already exists
+        self.db[SLOW_QUERY_SHAPES_COLLECTION].create_index([("total_ms", DESCENDING)], name="total_ms_-1")
+        self._collections_ready = True
+
+    def record(self, command_name, command, duration_ms, database_name, at, failed=False):
+        """
+        Write one slow operation and, for repeat offenders, its plan.
+
+        Logic:
+        1. Normalize the command into a shape and hash it
+        2. Append an entry to the capped slow_queries log
+        3. $inc the shape's count/total and keep its maximum duration
+        4. If the shape reached SLOW_QUERY_EXPLAIN_AFTER occurrences and was
+           not explained recently, run explain (queryPlanner) on this command
+
+        Input:
+        - command_name (str): e.g. 'find'
+        - command (dict): The command as sent
+        - duration_ms (float)
+        - database_name (str)
+        - at (datetime): When the operation finished
+        - failed (bool): The command returned an error
+        """
+        if self.db is None:
+            return
+        if not self._collections_ready:
+            self.ensure_collections()
+
+        collection, shape = query_shape(command_name, command)
+        key = shape_hash(command_name, collection, shape)
+        shape_text = json.dumps(shape, sort_keys=True)
+
+        self.db[SLOW_QUERY_LOG_COLLECTION].insert_one({
+            'at': at,
+            'shape_hash': key,
+            'command': command_name,
+            'collection': collection,
+            'duration_ms': round(duration_ms, 2),
+            'failed': failed,
+            'pid': os.getpid()
+        })
+        summary = self.db[SLOW_QUERY_SHAPES_COLLECTION].find_one_and_update(
+            {'_id': key},
+            {
+                '$inc': {'count': 1, 'total_ms': duration_ms},
+                '$max': {'max_ms': duration_ms, 'last_seen': at},
+                '$min': {'first_seen': at},
+                '$set': {'command': command_name, 'collection': collection, 'shape': shape_text,
+                         'database': database_name}
+            },
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+
+        explained_at = summary.get('explained_at')
+        if summary['count'] >= SLOW_QUERY_EXPLAIN_AFTER and (
+                explained_at is None
+                or at - explained_at > timedelta(seconds=SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS)):
+            self.explain(key, command, at)
+
+    def explain(self, key, command, at):
+        """Store the queryPlanner explain output of command on shape key."""
+        explainable = {name: value for name, value in command.items()
+                       if name not in META_FIELDS or name == 'cursor'}
+        try:
+            explain = self.db.command({'explain': explainable, 'verbosity': 'queryPlanner'})
+        except PyMongoError as e:
+            self.db[SLOW_QUERY_SHAPES_COLLECTION].update_one(
+                {'_id': key}, {'$set': {'explained_at': at, 'plan_summary': f"explain failed: {e}"}}
+            )
+            return
+        planner = _find_query_planner(explain) or {}
+        self.db[SLOW_QUERY_SHAPES_COLLECTION].update_one({'_id': key}, {'$set': {
+            'explained_at': at,
+            'plan_summary': summarize_plan(explain),
+            'winning_plan': json.dumps(planner.get('winningPlan', {}), default=str, indent=1)
+        }})
+
+
+def top_slow_shapes(db, limit=50):
+    """
+    Slow query shapes by total time spent, for the admin page.
+
+    Output:
+    - list: Shape documents with an added 'avg_ms'
+    """
+    shapes = list(db[SLOW_QUERY_SHAPES_COLLECTION].find().sort('total_ms', DESCENDING).limit(limit))
+    for shape in shapes:
+        shape['avg_ms'] = shape['total_ms'] / shape['count'] if shape.get('count') else 0.0
+    return shapes
@@ -0,0 +1,298 @@
+"""
+Rollup Service Module
+---------------------
+Maintains monthly consumption rollups per household and per connection type.
+
+Module: rollup_service.py
+Purpose: Chart a household's consumption trend and the monthly load of each
+         connection type without scanning raw bills
+Input: Bill creation and deletion events; the bill and archive collections
+       for a full rebuild
+Output: consumption_rollups documents and chart series built from them
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- One document per (scope, key, month): scope is 'household' (key =
+  household_id) or 'connection_type' (key = type name), month is 'YYYY-MM'
+  of the bill date; it holds units, amount and bills (count)
+- amount is the energy charge of the month (rate_breakdown.base_amount),
+  without arrears or fines, so later payments and fines leave it unchanged
+- Creating a bill adds it to its two documents with upserted $inc updates,
+  deleting it subtracts it; archiving moves bills without touching rollups
+- backfill() rebuilds everything from the bills and the archive with one
+  $group + $merge aggregation per scope (nothing is pulled into Python),
+  then removes documents it did not rebuild; run it once after deployment
+  and whenever increments may have been lost (`flask backfill-rollups`).
+  Increments applied while it runs may be overwritten, as with refresh-kpis
+- Reads (household_trend, connection_type_load) only touch the rollups,
+  through the unique (scope, key, month) index
+"""
+
+import logging
+import time
+from datetime import datetime
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import PyMongoError
+from modules.constants import (ROLLUP_COLLECTION, ROLLUP_MAX_MONTHS, ARCHIVE_COLLECTION,
+                               DEFAULT_CONNECTION_TYPE)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_SCOPES = ('household', 'connection_type')
+ROLLUP_FIELDS = ('units', 'amount', 'bills')
+
+# Aggregation expressions matching rollup_key() and billed_amount()
+SCOPE_KEY_EXPRESSIONS = {
+    'household': '$household_id',
+    'connection_type': {"$ifNull": ["$connection_type", DEFAULT_CONNECTION_TYPE]}
+}
+AMOUNT_EXPRESSION = {"$ifNull": ["$rate_breakdown.base_amount", {"$subtract": [
+    {"$ifNull": ["$total_amount", 0]},
+    {"$add": [{"$ifNull": ["$rate_breakdown.previous_dues", 0]},
+              {"$ifNull": ["$rate_breakdown.fine_amount", 0]}]}
+]}]}
+
+
+def billed_amount(bill):
+    """Energy charge of one bill (legacy bills without base_amount: total minus dues and fine)."""
+    breakdown = bill.get('rate_breakdown') or {}
+    if breakdown.get('base_amount') is not None:
+        return breakdown['base_amount']
+    return bill.get('total_amount', 0) - breakdown.get('previous_dues', 0) - breakdown.get('fine_amount', 0)
+
+
+def rollup_key(bill, scope):
+    if scope == 'household':
+        return bill.get('household_id')
+    return bill.get('connection_type') or DEFAULT_CONNECTION_TYPE
+
+
+def parse_month(value):
+    """'YYYY-MM' string, validated."""
+    try:
+        return datetime.strptime(value, '%Y-%m').strftime('%Y-%m')
+    except (TypeError, ValueError):
+        raise ValueError("months must be given as YYYY-MM")
+
+
+def month_range(start_month, end_month):
+    """
+    Every month from start_month to end_month, inclusive.
+
+    Raises:
+    - ValueError: If the range is reversed or longer than ROLLUP_MAX_MONTHS
+    """
+    year, month = map(int, start_month.split('-'))
+    end_year, end = map(int, end_month.split('-'))
+    count = (end_year - year) * 12 + end - month + 1
+    if count < 1:
+        raise ValueError("from must not be after to")
+    if count > ROLLUP_MAX_MONTHS:
+        raise ValueError(f"A chart may span at most {ROLLUP_MAX_MONTHS} months")
+    months = []
+    for _ in range(count):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def default_months(now=None, months=12):
+    """(start, end) month labels of the last `months` months, ending with the current one."""
+    now = now or datetime.now()
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}", now.strftime('%Y-%m')
+
+
+class RollupService:
+    def __init__(self, db):
+        self.bills_collection = db['electricity_billing']
+        self.archive_collection = db[ARCHIVE_COLLECTION]
+        self.rollups_collection = db[ROLLUP_COLLECTION]
+        self._indexes_ready = False
+
+    def ensure_indexes(self):
+        """Unique (scope, key, month): upsert target, $merge key and chart range scans."""
+        self.rollups_collection.create_index([("scope", ASCENDING), ("key", ASCENDING), ("month", ASCENDING)],
+                                             unique=True, name="scope_1_key_1_month_1")
+        self._indexes_ready = True
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def _apply(self, bill, sign):
+        """
+        Add (sign=1) or subtract (sign=-1) one bill in its two rollups.
+
+        Failures are logged, never raised: the bill change has already been
+        stored, and backfill() repairs the rollups.
+        """
+        if not bill.get('date'):
+            return
+        month = bill['date'].strftime('%Y-%m')
+        increments = {
+            "units": sign * float(bill.get('units') or 0),
+            "amount": sign * round(float(billed_amount(bill)), 2),
+            "bills": sign
+        }
+        try:
+            if not self._indexes_ready:
+                self.ensure_indexes()
+            self.rollups_collection.bulk_write([
+                UpdateOne({"scope": scope, "key": rollup_key(bill, scope), "month": month},
+                          {"$inc": increments, "$set": {"updated_at": datetime.now()}}, upsert=True)
+                for scope in ROLLUP_SCOPES
+            ], ordered=False)
+        except PyMongoError as e:
+            logger.warning("Consumption rollup update failed: %s", e)
+
+    def record_bill(self, bill):
+        """Account for a newly created bill (full document with household_id, date, units)."""
+        self._apply(bill, 1)
+
+    def record_deletion(self, bill):
+        """Account for a deleted bill."""
+        self._apply(bill, -1)
+
+    # ------------------------------------------------------------------
+    # Backfill
+    # ------------------------------------------------------------------
+
+    def build_backfill_pipeline(self, scope, rebuilt_at):
+        """
+        Aggregation rebuilding one scope's rollups from bills and the archive.
+
+        Output:
+        - list: Pipeline stages, ending in $merge into the rollup collection
+        """
+        return [
+            {"$unionWith": {"coll": ARCHIVE_COLLECTION}},
+            {"$match": {"date": {"$type": "date"}}},
+            {"$group": {
+                "_id": {
+                    "key": SCOPE_KEY_EXPRESSIONS[scope],
+                    "month": {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+                },
+                "units": {"$sum": {"$ifNull": ["$units", 0]}},
+                "amount": {"$sum": AMOUNT_EXPRESSION},
+                "bills": {"$sum": 1}
+            }},
+            {"$project": {
+                "_id": 0,
+                "scope": {"$literal": scope},
+                "key": "$_id.key",
+                "month": "$_id.month",
+                "units": 1,
+                "amount": {"$round": ["$amount", 2]},
+                "bills": 1,
+                "rebuilt_at": {"$literal": rebuilt_at}
+            }},
+            {"$merge": {
+                "into": ROLLUP_COLLECTION,
+                "on": ["scope", "key", "month"],
+                "whenMatched": "replace",
+                "whenNotMatched": "insert"
+            }}
+        ]
+
+    def backfill(self):
+        """
+        Rebuild every rollup from the bills and the archive.
+
+        Logic:
+        1. For each scope, group all bills by (key, month) and $merge the
+           sums into the rollups, stamped with this run's rebuilt_at
+        2. Delete rollups this run did not produce (older rebuilt_at) and
+           empty ones left by deletions
+
+        Output:
+        - dict: {'household': int, 'connection_type': int (documents written),
+                 'removed': int, 'seconds': float}
+        """
+        started = time.perf_counter()
+        # Millisecond precision, as stored by MongoDB
+        now = datetime.now()
+        rebuilt_at = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        if not self._indexes_ready:
+            self.ensure_indexes()
+
+        summary = {}
+        for scope in ROLLUP_SCOPES:
+            self.bills_collection.aggregate(self.build_backfill_pipeline(scope, rebuilt_at))
+            summary[scope] = self.rollups_collection.count_documents({"scope": scope, "rebuilt_at": rebuilt_at})
+        removed = self.rollups_collection.delete_many({"$or": [
+            {"rebuilt_at": {"$lt": rebuilt_at}},
+            {"bills": {"$lte": 0}}
+        ]})
+        summary['removed'] = removed.deleted_count
+        summary['seconds'] = round(time.perf_counter() - started, 3)
+        return summary
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def get_rollups(self, scope, start_month, end_month, keys=None):
+        """
+        Stored rollups of one scope in a month range (months without bills are absent).
+
+        Input:
+        - scope (str): 'household' or 'connection_type'
+        - start_month, end_month (str): 'YYYY-MM', inclusive
+        - keys (list, optional): Household ids or connection types (default: all)
+
+        Output:
+        - list: [{'key', 'month', 'units', 'amount', 'bills'}] sorted by key, month
+        """
+        if scope not in ROLLUP_SCOPES:
+            raise ValueError(f"scope must be one of {', '.join(ROLLUP_SCOPES)}")
+        query = {"scope": scope, "month": {"$gte": start_month, "$lte": end_month}}
+        if keys is not None:
+            query["key"] = {"$in": list(keys)}
+        projection = dict.fromkeys(('key', 'month') + ROLLUP_FIELDS, 1)
+        projection['_id'] = 0
+        return list(self.rollups_collection.find(query, projection).sort([("key", ASCENDING), ("month", ASCENDING)]))
+
+    def chart(self, scope, start_month, end_month, keys=None):
+        """
+        Chart series of one scope: every month in range, zero where there were no bills.
+
+        Output:
+        - dict: {'scope', 'months': [...], 'series': [{'key', 'units': [...],
+                 'amount': [...], 'bills': [...]}]} (one series per key)
+        """
+        months = month_range(start_month, end_month)
+        positions = {month: index for index, month in enumerate(months)}
+        series = {}
+        for key in keys or ():
+            series[key] = {field: [0] * len(months) for field in ROLLUP_FIELDS}
+        for rollup in self.get_rollups(scope, start_month, end_month, keys):
+            values = series.setdefault(rollup['key'], {field: [0] * len(months) for field in ROLLUP_FIELDS})
+            for field in ROLLUP_FIELDS:
+                value = rollup.get(field, 0)
+                values[field][positions[rollup['month']]] = round(value, 2) if field != 'bills' else value
+        return {
+            'scope': scope,
+            'months': months,
+            'series': [dict(values, key=str(key)) for key, values in series.items()]
+        }
+
+    def household_trend(self, household_id, start_month=None, end_month=None):
+        """
+        Monthly units, amount and bill count of one household (default: last 12 months).
+
+        Examples:
+        >>> rollup_service.household_trend(household_id, '2025-01', '2025-12')['series'][0]['units']
+        """
+        default_start, default_end = default_months()
+        return self.chart('household', start_month or default_start, end_month or default_end,
+                          [ObjectId(household_id)])
+
+    def connection_type_load(self, start_month=None, end_month=None, connection_types=None):
+        """Monthly load per connection type (default: all types, last 12 months)."""
+        default_start, default_end = default_months()
+        return self.chart('connection_type', start_month or default_start, end_month or default_end,
+                          connection_types)
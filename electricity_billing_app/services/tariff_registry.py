@@ -0,0 +1,325 @@
+"""
+Tariff Registry Module
+----------------------
+Versioned tariff plans per connection type and effective date.
+
+Module: tariff_registry.py
+Purpose: Keep every published tariff plan in memory, indexed by connection
+         type and effective date, so bills are priced without a DB round trip
+Input: Built-in plans (constants.TARIFF_VERSIONS) and the tariff_plans collection
+Output: Compiled TariffPlan objects
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- A plan covers [effective_from, effective_to) for one connection type; an
+  open-ended plan runs until the next plan of the same type starts
+- Lookup by (connection_type, bill_date) is a binary search over the
+  sorted start dates of that type: O(log n)
+- Plans are compiled once per version (slab bounds and labels precomputed)
+- Publishing bumps a revision counter; every process re-reads the plans
+  when it sees a new revision (checked at most every TARIFF_RELOAD_SECONDS)
+- Connection types without plans fall back to DEFAULT_CONNECTION_TYPE
+"""
+
+import bisect
+import logging
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List
+from pymongo import ReturnDocument
+from modules.constants import (TARIFF_VERSIONS, DEFAULT_CONNECTION_TYPE, CONNECTION_TYPES,
+                               TARIFF_RELOAD_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+PLANS_COLLECTION = 'tariff_plans'
+COUNTERS_COLLECTION = 'counters'
+REVISION_ID = 'tariff_plans'
+
+
+class TariffPlan:
+    """One compiled tariff plan (immutable once published)."""
+
+    __slots__ = ('version', 'connection_type', 'effective_from', 'effective_to',
+                 'slabs', 'minimum_charge', '_bands')
+
+    def __init__(self, version, connection_type, effective_from, slabs, minimum_charge,
+                 effective_to=None):
+        self.version = version
+        self.connection_type = connection_type
+        self.effective_from = effective_from
+        self.effective_to = effective_to
+        self.slabs = [(float('inf') if limit is None else limit, rate) for limit, rate in slabs]
+        self.minimum_charge = minimum_charge
+
+        # Precompute (Decimal limit, Decimal rate, label) for every slab
+        bands = []
+        slab_start = 0
+        for slab_limit, rate in self.slabs:
+            if slab_limit == float('inf'):
+                label = f"{slab_start+1}+"
+            else:
+                label = f"{slab_start+1}-{slab_start + int(slab_limit)}"
+                slab_start += int(slab_limit)
+            bands.append((Decimal(str(slab_limit)), Decimal(str(rate)), label))
+        self._bands = tuple(bands)
+
+    def covers(self, bill_date) -> bool:
+        return self.effective_to is None or bill_date < self.effective_to
+
+    def calculate(self, units: float) -> Dict:
+        """
+        Price units with this plan (see TariffService.calculate_bill).
+
+        Output:
+        - dict: {'base_amount', 'minimum_charge_applied', 'breakdown', 'tariff_version'}
+        """
+        units = Decimal(str(units))
+
+        if units == 0:
+            return {
+                'base_amount': float(self.minimum_charge),
+                'minimum_charge_applied': True,
+                'breakdown': [],
+                'tariff_version': self.version
+            }
+
+        total = Decimal('0.00')
+        remaining_units = units
+        breakdown = []
+
+        for slab_limit, slab_rate, label in self._bands:
+            if remaining_units <= 0:
+                break
+            slab_units = min(remaining_units, slab_limit)
+            slab_amount = slab_units * slab_rate
+            total += slab_amount
+            breakdown.append({
+                'slab': label,
+                'units': float(slab_units),
+                'rate': float(slab_rate),
+                'amount': float(slab_amount)
+            })
+            remaining_units -= slab_units
+
+        return {
+            'base_amount': float(total.quantize(Decimal('0.01'))),
+            'minimum_charge_applied': False,
+            'breakdown': breakdown,
+            'tariff_version': self.version
+        }
+
+    def to_document(self) -> Dict:
+        return {
+            'version': self.version,
+            'connection_type': self.connection_type,
+            'effective_from': self.effective_from,
+            'effective_to': self.effective_to,
+            'slabs': [[None if limit == float('inf') else limit, rate] for limit, rate in self.slabs],
+            'minimum_charge': self.minimum_charge
+        }
+
+    @classmethod
+    def from_document(cls, document):
+        return cls(document['version'], document['connection_type'], document['effective_from'],
+                   document['slabs'], document['minimum_charge'], document.get('effective_to'))
+
+
+def builtin_plans() -> List[TariffPlan]:
+    return [TariffPlan(version, plan['connection_type'], plan['effective_from'],
+                       plan['slabs'], plan['minimum_charge'])
+            for version, plan in TARIFF_VERSIONS.items()]
+
+
+class TariffRegistry:
+    def __init__(self, plans=None):
+        self._lock = threading.Lock()
+        self._revision = None
+        self._checked_at = 0.0
+        self._install(plans if plans is not None else builtin_plans())
+
+    def _install(self, plans):
+        """
+        Build the interval index and swap it in atomically.
+
+        Logic:
+        1. Sort each connection type's plans by (effective_from, version)
+        2. Keep the highest version when two plans start on the same date
+        3. Store the start dates as a sorted list for bisect
+        """
+        by_type = {}
+        for plan in sorted(plans, key=lambda plan: (plan.effective_from, plan.version)):
+            starts, type_plans = by_type.setdefault(plan.connection_type, ([], []))
+            if starts and starts[-1] == plan.effective_from:
+                type_plans[-1] = plan
+            else:
+                starts.append(plan.effective_from)
+                type_plans.append(plan)
+
+        # One tuple assignment, so readers never see a half-built index
+        self._index = (by_type, {plan.version: plan for plan in plans})
+
+    @property
+    def plans(self) -> List[TariffPlan]:
+        return sorted(self._index[1].values(), key=lambda plan: plan.version)
+
+    def plan_for(self, connection_type=None, bill_date=None) -> TariffPlan:
+        """
+        Find the plan in force for a connection type on a date.
+
+        Logic:
+        1. Binary search the type's start dates for the last start <= bill_date
+        2. Check that the plan has not expired (effective_to)
+        3. If the type has no plan in force, repeat with DEFAULT_CONNECTION_TYPE
+
+        Input:
+        - connection_type (str, optional): Defaults to DEFAULT_CONNECTION_TYPE
+        - bill_date (datetime, optional): Defaults to now
+
+        Output:
+        - TariffPlan
+
+        Raises:
+        - ValueError: If no plan is in force for the date
+
+        Examples:
+        >>> tariff_registry.plan_for('Commercial', datetime(2026, 2, 1)).version
+        1
+        """
+        by_type = self._index[0]
+        bill_date = bill_date or datetime.now()
+        for candidate in (connection_type or DEFAULT_CONNECTION_TYPE, DEFAULT_CONNECTION_TYPE):
+            entry = by_type.get(candidate)
+            if entry is None:
+                continue
+            starts, type_plans = entry
+            position = bisect.bisect_right(starts, bill_date) - 1
+            if position >= 0 and type_plans[position].covers(bill_date):
+                return type_plans[position]
+        raise ValueError(f"No tariff plan in force for {connection_type} on {bill_date:%Y-%m-%d}")
+
+    def plan_by_version(self, version) -> TariffPlan:
+        plan = self._index[1].get(version)
+        if plan is None:
+            raise ValueError(f"Unknown tariff version: {version}")
+        return plan
+
+    def has_versions(self, versions) -> bool:
+        known = self._index[1]
+        return all(version in known for version in versions)
+
+    # ------------------------------------------------------------------
+    # Loading and publishing
+    # ------------------------------------------------------------------
+
+    def load(self, db):
+        """Re-read all published plans and rebuild the index."""
+        with self._lock:
+            counter = db[COUNTERS_COLLECTION].find_one({'_id': REVISION_ID}) or {}
+            plans = {plan.version: plan for plan in builtin_plans()}
+            for document in db[PLANS_COLLECTION].find({}, {'_id': 0}):
+                plans[document['version']] = TariffPlan.from_document(document)
+            self._install(list(plans.values()))
+            self._revision = counter.get('revision', 0)
+            self._checked_at = time.monotonic()
+        logger.info("Loaded %d tariff plans (revision %s)", len(plans), self._revision)
+
+    def refresh_if_stale(self, db, max_age=TARIFF_RELOAD_SECONDS):
+        """
+        Reload the plans if another process published since the last check.
+
+        At most one small counter read per max_age seconds; pricing itself
+        never touches the database.
+
+        Input:
+        - db: Database handle
+        - max_age (float): Seconds between revision checks
+        """
+        if self._revision is not None and time.monotonic() - self._checked_at < max_age:
+            return
+        try:
+            counter = db[COUNTERS_COLLECTION].find_one({'_id': REVISION_ID}) or {}
+        except Exception as e:
+            logger.warning("Tariff revision check failed, keeping cached plans: %s", e)
+            self._checked_at = time.monotonic()
+            return
+        if counter.get('revision', 0) != self._revision:
+            self.load(db)
+        else:
+            self._checked_at = time.monotonic()
+
+    def require_versions(self, db, versions):
+        """Reload once if any of the given versions is not known yet."""
+        if not self.has_versions(versions):
+            self.load(db)
+
+    def publish(self, db, connection_type, slabs, minimum_charge, effective_from, effective_to=None):
+        """
+        Publish a new tariff plan.
+
+        Preconditions:
+        - slabs is a list of (units_in_slab, rate); the last, and only the last, is
+          open ended (None or inf), so every unit falls in a slab
+
+        Logic:
+        1. Validate the plan
+        2. Increment the revision counter; version = revision + highest built-in version
+        3. Insert the plan document
+        4. Reload this process immediately (others follow on their next check)
+
+        Input:
+        - db: Database handle
+        - connection_type (str): One of CONNECTION_TYPES
+        - slabs (list): [(units_in_slab, rate), ...]
+        - minimum_charge (float): Charge when units = 0
+        - effective_from (datetime): First instant the plan applies
+        - effective_to (datetime, optional): First instant it no longer applies
+
+        Output:
+        - TariffPlan: The published plan
+
+        Raises:
+        - ValueError: If the plan is invalid
+
+        Examples:
+        >>> tariff_registry.publish(db, 'Commercial', [(100, 3.0), (None, 6.0)], 50.0,
+        ...                         datetime(2026, 4, 1))
+        """
+        if connection_type not in CONNECTION_TYPES:
+            raise ValueError(f"Unknown connection type: {connection_type}")
+        if not slabs:
+            raise ValueError("A tariff plan needs at least one slab")
+        for position, (limit, rate) in enumerate(slabs):
+            open_ended = limit is None or limit == float('inf')
+            if open_ended != (position == len(slabs) - 1):
+                raise ValueError("The last slab, and only the last, must be open ended")
+            if (not open_ended and limit <= 0) or rate < 0:
+                raise ValueError("Slab sizes must be positive and rates non-negative")
+        if minimum_charge < 0:
+            raise ValueError("Minimum charge cannot be negative")
+        if effective_to is not None and effective_to <= effective_from:
+            raise ValueError("effective_to must be after effective_from")
+
+        ensure_indexes(db)
+        counter = db[COUNTERS_COLLECTION].find_one_and_update(
+            {'_id': REVISION_ID}, {'$inc': {'revision': 1}},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        plan = TariffPlan(counter['revision'] + max(TARIFF_VERSIONS), connection_type, effective_from,
+                          slabs, minimum_charge, effective_to)
+        db[PLANS_COLLECTION].insert_one(dict(plan.to_document(), published_at=datetime.now()))
+
+        self.load(db)
+        return plan
+
+
+def ensure_indexes(db):
+    db[PLANS_COLLECTION].create_index('version', unique=True, name='version_1')
+
+
+# Process-wide registry, seeded with the built-in plans
+tariff_registry = TariffRegistry()
@@ -19,23 +19,30 @@ Rate per unit:
 4. Above 150 units: ₹4.5
 
 Minimum charge: ₹25 when units = 0
+
+These are built-in plan version 1. Plans per connection type and effective
+date are published through services/tariff_registry.py.
 """
 
-from decimal import Decimal
-from typing import Dict, List
-from modules.constants import TARIFF_SLABS, MINIMUM_CHARGE
+from datetime import datetime
+from typing import Dict
+from services.tariff_registry import tariff_registry
 
 
 class TariffService:
     @staticmethod
-    def calculate_bill(units: float) -> Dict:
+    def calculate_bill(units: float, tariff_version: int = None, connection_type: str = None,
+                       bill_date: datetime = None) -> Dict:
         """
         Calculate electricity bill based on lab-specified tiered slab rates.
         
         Preconditions:
         - units is a non-negative number
+        - tariff_version, when given, is a version known to the tariff registry
         
         Logic:
+        0. Pick the plan: by tariff_version if given, otherwise the plan in
+           force for connection_type on bill_date (in-memory registry lookup)
         1. Check if units == 0, apply minimum charge
         2. For each slab, calculate units consumed in that slab
         3. Multiply slab units by slab rate
@@ -64,17 +71,24 @@ class TariffService:
         
         Input:
         - units (float): Number of units consumed
+        - tariff_version (int, optional): Exact plan version (re-pricing stored bills)
+        - connection_type (str, optional): Defaults to 'Household'
+        - bill_date (datetime, optional): Defaults to now
         
         Output:
         - dict: {
             'base_amount': float - Total calculated amount
             'minimum_charge_applied': bool - Whether minimum charge was applied
             'breakdown': list - Slab-wise breakdown
+            'tariff_version': int - Plan version used
           }
         
+        Raises:
+        - ValueError: If the version is unknown or no plan is in force
+        
         Examples:
         >>> TariffService.calculate_bill(0)
-        {'base_amount': 25.0, 'minimum_charge_applied': True, 'breakdown': []}
+        {'base_amount': 25.0, 'minimum_charge_applied': True, 'breakdown': [], 'tariff_version': 1}
         
         >>> TariffService.calculate_bill(50)
         {'base_amount': 75.0, 'minimum_charge_applied': False, 
@@ -84,56 +98,8 @@ class TariffService:
         {'base_amount': 375.0, 'minimum_charge_applied': False,
          'breakdown': [...]}  # 50*1.5 + 50*2.5 + 50*3.5 = 375
         """
-        units = Decimal(str(units))
-        
-        # Special case: Zero units consumed
-        if units == 0:
-            return {
-                'base_amount': float(MINIMUM_CHARGE),
-                'minimum_charge_applied': True,
-                'breakdown': []
-            }
-        
-        total = Decimal('0.00')
-        remaining_units = units
-        breakdown = []
-        slab_start = 0
-        
-        # Calculate for each slab
-        for slab_limit, rate in TARIFF_SLABS:
-            if remaining_units <= 0:
-                break
-            
-            # Calculate units in this slab
-            slab_units = min(remaining_units, Decimal(str(slab_limit)))
-            slab_rate = Decimal(str(rate))
-            slab_amount = slab_units * slab_rate
-            
-            # Add to total
-            total += slab_amount
-            
-            # Create slab label
-            if slab_limit == float('inf'):
-                slab_label = f"{slab_start+1}+"
-            else:
-                slab_end = slab_start + int(slab_limit)
-                slab_label = f"{slab_start+1}-{slab_end}"
-            
-            # Add to breakdown
-            breakdown.append({
-                'slab': slab_label,
-                'units': float(slab_units),
-                'rate': float(slab_rate),
-                'amount': float(slab_amount)
-            })
-            
-            # Update remaining and slab start
-            remaining_units -= slab_units
-            if slab_limit != float('inf'):
-                slab_start += int(slab_limit)
-        
-        return {
-            'base_amount': float(total.quantize(Decimal('0.01'))),
-            'minimum_charge_applied': False,
-            'breakdown': breakdown
-        }
+        if tariff_version is not None:
+            plan = tariff_registry.plan_by_version(tariff_version)
+        else:
+            plan = tariff_registry.plan_for(connection_type, bill_date)
+        return plan.calculate(units)
@@ -0,0 +1,470 @@
+"""
+Tariff Simulator Module
+-----------------------
+Re-prices historical consumption under candidate slab definitions.
+
+Module: tariff_simulator.py
+Purpose: Estimate the revenue impact of proposed tariffs across all bills
+Input: units / connection_type / month of every bill, streamed from the
+       electricity_billing collection and its archive, or read from a
+       columnar snapshot
+Output: Revenue deltas per slab, per connection type and per month
+Author: Software Engineering Lab
+Date: 2026-01-27
+
+Module Specifications:
+----------------------
+- Archived (paid, old) bills are read with the hot ones through
+  $unionWith, so re-pricing covers the whole history
+- Bills are processed as numpy column chunks; a plan prices a whole chunk
+  with one clip/multiply per slab (no per-bill Python code)
+- Chunks are priced in a process pool; each worker returns small partial
+  sums (per slab, per connection type x month) that the parent adds up
+- The baseline is the plan in force today for each connection type
+  (tariff registry), so deltas compare like with like
+- A snapshot is a directory of .npy columns; workers memory-map their
+  slice instead of receiving it through a pipe
+- Amounts are float64 rounded to paise per bill: an estimate, not a
+  replacement for TariffService's Decimal pricing
+"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from modules.constants import DEFAULT_CONNECTION_TYPE, ARCHIVE_COLLECTION
+from services.tariff_registry import tariff_registry
+from services.database import reporting_collection
+
+SIMULATION_CHUNK_SIZE = 1_000_000
+MONTH_BASE = 1970 * 12          # month index 0 = January 1970
+MONTH_SLOTS = (2200 - 1970) * 12
+SNAPSHOT_COLUMNS = {
+    'units': np.float64,
+    'base_amount': np.float64,
+    'connection_type': np.int8,
+    'month': np.int16
+}
+
+
+class VectorPlan:
+    """A slab definition compiled to numpy arrays."""
+
+    def __init__(self, name, slabs, minimum_charge):
+        self.name = name
+        self.minimum_charge = float(minimum_charge)
+        lows, widths, rates, labels = [], [], [], []
+        start = 0.0
+        for limit, rate in slabs:
+            width = np.inf if limit is None or limit == float('inf') else float(limit)
+            lows.append(start)
+            widths.append(width)
+            rates.append(float(rate))
+            labels.append(f"{int(start)+1}+" if width == np.inf else f"{int(start)+1}-{int(start + width)}")
+            start += width
+        self.lows = np.array(lows)[:, None]
+        self.widths = np.array(widths)[:, None]
+        self.rates = np.array(rates)[:, None]
+        self.labels = labels
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(spec['name'], spec['slabs'], spec['minimum_charge'])
+
+    def price(self, units):
+        """
+        Price a column of units.
+
+        Logic:
+        1. Units in slab i = clip(units - low_i, 0, width_i)   (slabs x bills)
+        2. Slab amounts = slab units x rate_i
+        3. Bill total = sum over slabs, rounded to 0.01; minimum charge where units == 0
+
+        Input:
+        - units (ndarray): Units per bill
+
+        Output:
+        - Tuple (totals, slab_units, slab_amounts): (bills,), (slabs, bills), (slabs, bills)
+        """
+        slab_units = np.clip(units[None, :] - self.lows, 0.0, self.widths)
+        slab_amounts = slab_units * self.rates
+        totals = np.round(slab_amounts.sum(axis=0), 2)
+        totals[units == 0] = self.minimum_charge
+        return totals, slab_units, slab_amounts
+
+
+# ==================================================================================
+# SOURCES
+# ==================================================================================
+
+def iter_collection_chunks(collection, connection_types: List[str],
+                           chunk_size=SIMULATION_CHUNK_SIZE) -> Iterator[Dict]:
+    """
+    Stream bills (hot and archived) from MongoDB as column chunks.
+
+    The server projects each bill down to four short fields (and computes
+    the month), so the client decodes as little BSON as possible.
+
+    Input:
+    - collection: electricity_billing collection (the archive is read through it)
+    - connection_types (list): Code table; unseen types are appended
+    - chunk_size (int): Bills per chunk
+
+    Output:
+    - Iterator of dicts with the SNAPSHOT_COLUMNS arrays
+    """
+    codes = {name: code for code, name in enumerate(connection_types)}
+    cursor = collection.aggregate([
+        {"$unionWith": {"coll": ARCHIVE_COLLECTION}},
+        {"$project": {
+            "_id": 0,
+            "u": {"$ifNull": ["$units", 0]},
+            "b": {"$ifNull": ["$rate_breakdown.base_amount", 0]},
+            "t": {"$ifNull": ["$connection_type", DEFAULT_CONNECTION_TYPE]},
+            "m": {"$add": [{"$multiply": [{"$year": "$date"}, 12]}, {"$month": "$date"}, -1 - MONTH_BASE]}
+        }}
+    ], batchSize=10000, allowDiskUse=True)
+
+    columns = ([], [], [], [])
+    for row in cursor:
+        code = codes.get(row['t'])
+        if code is None:
+            code = codes[row['t']] = len(connection_types)
+            connection_types.append(row['t'])
+        columns[0].append(row['u'])
+        columns[1].append(row['b'])
+        columns[2].append(code)
+        columns[3].append(row['m'])
+        if len(columns[0]) >= chunk_size:
+            yield _to_arrays(columns)
+            columns = ([], [], [], [])
+    if columns[0]:
+        yield _to_arrays(columns)
+
+
+def _to_arrays(columns):
+    return {name: np.array(values, dtype=dtype)
+            for (name, dtype), values in zip(SNAPSHOT_COLUMNS.items(), columns)}
+
+
+def export_snapshot(collection, path, chunk_size=SIMULATION_CHUNK_SIZE) -> Dict:
+    """
+    Write a columnar snapshot of all bills, archived ones included, to a directory of .npy files.
+
+    Input:
+    - collection: electricity_billing collection (the archive is read through it)
+    - path (str): Target directory (created if missing)
+
+    Output:
+    - dict: Snapshot metadata {'bills', 'connection_types', 'created_at'}
+    """
+    os.makedirs(path, exist_ok=True)
+    connection_types = [DEFAULT_CONNECTION_TYPE]
+    parts = {name: [] for name in SNAPSHOT_COLUMNS}
+    for chunk in iter_collection_chunks(collection, connection_types, chunk_size):
+        for name, values in chunk.items():
+            parts[name].append(values)
+
+    bills = 0
+    for name, dtype in SNAPSHOT_COLUMNS.items():
+        column = np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+        np.save(os.path.join(path, f"{name}.npy"), column)
+        bills = len(column)
+
+    meta = {'bills': bills, 'connection_types': connection_types,
+            'created_at': datetime.now().isoformat(timespec='seconds')}
+    with open(os.path.join(path, 'meta.json'), 'w') as meta_file:
+        json.dump(meta, meta_file, indent=2)
+    return meta
+
+
+def load_snapshot_meta(path) -> Dict:
+    with open(os.path.join(path, 'meta.json')) as meta_file:
+        return json.load(meta_file)
+
+
+def _read_snapshot_slice(path, start, stop):
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')[start:stop]
+            for name in SNAPSHOT_COLUMNS}
+
+
+# ==================================================================================
+# PRICING
+# ==================================================================================
+
+def _simulate_chunk(chunk, baseline_specs, candidate_specs):
+    """
+    Price one chunk under the baseline and every candidate (runs in a worker).
+
+    Input:
+    - chunk: dict of column arrays, or (snapshot path, start, stop)
+    - baseline_specs (dict): connection type code -> plan spec
+    - candidate_specs (list): Candidate plan specs, each with optional
+      'connection_types' (codes) it applies to
+
+    Output:
+    - dict of partial sums (all small numpy arrays)
+    """
+    if isinstance(chunk, tuple):
+        chunk = _read_snapshot_slice(*chunk)
+    units = np.asarray(chunk['units'], dtype=np.float64)
+    types = np.asarray(chunk['connection_type'], dtype=np.int64)
+    months = np.clip(np.asarray(chunk['month'], dtype=np.int64), 0, MONTH_SLOTS - 1)
+    type_slots = max(baseline_specs) + 1
+    group = types * MONTH_SLOTS + months
+    group_slots = type_slots * MONTH_SLOTS
+
+    baseline = np.zeros(len(units))
+    baseline_slabs = {}
+    for code, spec in baseline_specs.items():
+        mask = types == code
+        if not mask.any():
+            continue
+        totals, slab_units, slab_amounts = VectorPlan.from_spec(spec).price(units[mask])
+        baseline[mask] = totals
+        baseline_slabs[code] = (slab_units.sum(axis=1), slab_amounts.sum(axis=1),
+                                int((units[mask] == 0).sum()))
+
+    result = {
+        'bills': len(units),
+        'billed': float(np.asarray(chunk['base_amount'], dtype=np.float64).sum()),
+        'baseline_groups': np.bincount(group, weights=baseline, minlength=group_slots),
+        'bill_groups': np.bincount(group, minlength=group_slots),
+        'baseline_slabs': baseline_slabs,
+        'candidates': []
+    }
+
+    for spec in candidate_specs:
+        plan = VectorPlan.from_spec(spec)
+        if spec['connection_types'] is None:
+            applies = np.ones(len(units), dtype=bool)
+        else:
+            applies = np.isin(types, spec['connection_types'])
+        totals, slab_units, slab_amounts = plan.price(units[applies])
+        candidate = baseline.copy()
+        candidate[applies] = totals
+        result['candidates'].append({
+            'groups': np.bincount(group, weights=candidate, minlength=group_slots),
+            'slab_units': slab_units.sum(axis=1),
+            'slab_amounts': slab_amounts.sum(axis=1),
+            'minimum_bills': int((units[applies] == 0).sum())
+        })
+    return result
+
+
+def _merge(total, part):
+    if total is None:
+        return part
+    total['bills'] += part['bills']
+    total['billed'] += part['billed']
+    total['baseline_groups'] += part['baseline_groups']
+    total['bill_groups'] += part['bill_groups']
+    for code, (units, amounts, minimum) in part['baseline_slabs'].items():
+        if code in total['baseline_slabs']:
+            old_units, old_amounts, old_minimum = total['baseline_slabs'][code]
+            total['baseline_slabs'][code] = (old_units + units, old_amounts + amounts, old_minimum + minimum)
+        else:
+            total['baseline_slabs'][code] = (units, amounts, minimum)
+    for merged, candidate in zip(total['candidates'], part['candidates']):
+        for key in ('groups', 'slab_units', 'slab_amounts', 'minimum_bills'):
+            merged[key] = merged[key] + candidate[key]
+    return total
+
+
+class TariffSimulator:
+    def __init__(self, db):
+        # db may be None when only snapshots are simulated (e.g. benchmarks)
+        self.db = db
+        # A full scan of every bill: read from a secondary when MONGO_READ_PREFERENCE allows
+        self.bills_collection = reporting_collection(db['electricity_billing']) if db is not None else None
+
+    @staticmethod
+    def load_candidates(path) -> List[Dict]:
+        """
+        Read candidate tariffs from a JSON file.
+
+        Format:
+        [{"name": "proposal-a", "slabs": [[50, 2.0], [50, 3.0], [null, 5.0]],
+          "minimum_charge": 30, "connection_types": ["Household"]}]
+
+        connection_types is optional (default: all connection types).
+
+        Raises:
+        - ValueError: If a candidate is malformed
+        """
+        with open(path) as candidates_file:
+            candidates = json.load(candidates_file)
+        if isinstance(candidates, dict):
+            candidates = [candidates]
+        for index, candidate in enumerate(candidates):
+            candidate.setdefault('name', f"candidate-{index + 1}")
+            slabs = candidate.get('slabs')
+            if not slabs or any(len(slab) != 2 for slab in slabs):
+                raise ValueError(f"{candidate['name']}: slabs must be [units, rate] pairs")
+            if any(limit is None for limit, _ in slabs[:-1]):
+                raise ValueError(f"{candidate['name']}: only the last slab may be open ended")
+            if 'minimum_charge' not in candidate:
+                raise ValueError(f"{candidate['name']}: minimum_charge is required")
+        return candidates
+
+    def simulate(self, candidates, snapshot_path=None, workers=None, chunk_size=SIMULATION_CHUNK_SIZE,
+                 as_of=None):
+        """
+        Re-price every bill under the current plans and each candidate.
+
+        Preconditions:
+        - candidates come from load_candidates() (or have the same shape)
+
+        Logic:
+        1. Build the baseline: the plan in force at as_of for each connection type
+        2. Split the bills into chunks (snapshot slices or streamed from MongoDB)
+        3. Price chunks in a process pool, at most 2 x workers in flight
+        4. Add up the partial sums and build the report
+
+        Input:
+        - candidates (list): Candidate specs
+        - snapshot_path (str, optional): Columnar snapshot; stream from MongoDB if None
+        - workers (int, optional): Processes (default: CPU count; 1 = in-process)
+        - chunk_size (int): Bills per chunk
+        - as_of (datetime, optional): Date for the baseline plans (default: now)
+
+        Output:
+        - dict: See build_report()
+
+        Examples:
+        >>> simulator = TariffSimulator(db)
+        >>> report = simulator.simulate(TariffSimulator.load_candidates('proposal.json'),
+        ...                             snapshot_path='snapshots/2026-01')
+        """
+        started = time.perf_counter()
+        workers = workers or os.cpu_count() or 1
+        as_of = as_of or datetime.now()
+        if self.db is not None:
+            tariff_registry.refresh_if_stale(self.db)
+
+        if snapshot_path:
+            meta = load_snapshot_meta(snapshot_path)
+            connection_types = list(meta['connection_types'])
+            chunks = ((snapshot_path, start, min(start + chunk_size, meta['bills']))
+                      for start in range(0, meta['bills'], chunk_size))
+        else:
+            # Codes are assigned while streaming; the baseline needs them all, so
+            # pre-register every type the bills and the archive hold
+            stored_types = set(self.bills_collection.distinct('connection_type'))
+            stored_types.update(reporting_collection(self.db[ARCHIVE_COLLECTION]).distinct('connection_type'))
+            connection_types = [DEFAULT_CONNECTION_TYPE] + sorted(
+                name for name in stored_types if name and name != DEFAULT_CONNECTION_TYPE
+            )
+            chunks = iter_collection_chunks(self.bills_collection, connection_types, chunk_size)
+
+        baseline_specs = {}
+        for code, name in enumerate(connection_types):
+            plan = tariff_registry.plan_for(name, as_of)
+            baseline_specs[code] = {'name': f"v{plan.version}", 'slabs': plan.slabs,
+                                    'minimum_charge': plan.minimum_charge}
+        candidate_specs = []
+        for candidate in candidates:
+            names = candidate.get('connection_types')
+            codes = None if names is None else [code for code, name in enumerate(connection_types) if name in names]
+            candidate_specs.append(dict(candidate, connection_types=codes))
+
+        totals = None
+        if workers <= 1:
+            for chunk in chunks:
+                totals = _merge(totals, _simulate_chunk(chunk, baseline_specs, candidate_specs))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                window = []
+                for chunk in chunks:
+                    window.append(executor.submit(_simulate_chunk, chunk, baseline_specs, candidate_specs))
+                    if len(window) >= workers * 2:
+                        totals = _merge(totals, window.pop(0).result())
+                for future in window:
+                    totals = _merge(totals, future.result())
+
+        seconds = time.perf_counter() - started
+        return build_report(totals, connection_types, baseline_specs, candidates, seconds)
+
+
+def build_report(totals, connection_types, baseline_specs, candidates, seconds) -> Dict:
+    """
+    Turn merged partial sums into the simulation report.
+
+    Output:
+    - dict: {
+        'bills': int, 'billed': float (stored base amounts), 'baseline': float,
+        'baseline_plans': {connection_type: 'vN'},
+        'baseline_slabs': [{'plan', 'connection_type', 'slab', 'units', 'revenue'}],
+        'candidates': [{
+            'name', 'revenue', 'delta', 'delta_pct',
+            'slabs': [{'slab', 'units', 'revenue'}],
+            'by_connection_type': [{'connection_type', 'bills', 'baseline', 'candidate', 'delta'}],
+            'by_month': [{'month': 'YYYY-MM', 'bills', 'baseline', 'candidate', 'delta'}]
+        }],
+        'seconds': float, 'bills_per_second': float
+      }
+    """
+    type_slots = max(baseline_specs) + 1
+    report = {
+        'bills': 0, 'billed': 0.0, 'baseline': 0.0,
+        'baseline_plans': {name: baseline_specs[code]['name'] for code, name in enumerate(connection_types)},
+        'baseline_slabs': [], 'candidates': [],
+        'seconds': seconds, 'bills_per_second': 0.0
+    }
+    if totals is None:
+        return report
+
+    baseline_groups = totals['baseline_groups'].reshape(type_slots, MONTH_SLOTS)
+    bill_groups = totals['bill_groups'].reshape(type_slots, MONTH_SLOTS)
+    active_types = [code for code in range(type_slots) if bill_groups[code].any()]
+    active_months = np.flatnonzero(bill_groups.sum(axis=0))
+
+    report['bills'] = int(totals['bills'])
+    report['billed'] = round(totals['billed'], 2)
+    report['baseline'] = round(float(baseline_groups.sum()), 2)
+    report['bills_per_second'] = totals['bills'] / seconds if seconds else 0.0
+
+    for code, (units, amounts, minimum_bills) in sorted(totals['baseline_slabs'].items()):
+        spec = baseline_specs[code]
+        report['baseline_slabs'] += _slab_rows(VectorPlan.from_spec(spec), units, amounts, minimum_bills,
+                                               plan=spec['name'], connection_type=connection_types[code])
+
+    for candidate, merged in zip(candidates, totals['candidates']):
+        groups = merged['groups'].reshape(type_slots, MONTH_SLOTS)
+        revenue = float(groups.sum())
+        report['candidates'].append({
+            'name': candidate['name'],
+            'revenue': round(revenue, 2),
+            'delta': round(revenue - report['baseline'], 2),
+            'delta_pct': round((revenue / report['baseline'] - 1) * 100, 2) if report['baseline'] else 0.0,
+            'slabs': _slab_rows(VectorPlan.from_spec(candidate), merged['slab_units'],
+                                merged['slab_amounts'], merged['minimum_bills']),
+            'by_connection_type': [{
+                'connection_type': connection_types[code],
+                'bills': int(bill_groups[code].sum()),
+                'baseline': round(float(baseline_groups[code].sum()), 2),
+                'candidate': round(float(groups[code].sum()), 2),
+                'delta': round(float(groups[code].sum() - baseline_groups[code].sum()), 2)
+            } for code in active_types],
+            'by_month': [{
+                'month': f"{(MONTH_BASE + month) // 12}-{(MONTH_BASE + month) % 12 + 1:02d}",
+                'bills': int(bill_groups[:, month].sum()),
+                'baseline': round(float(baseline_groups[:, month].sum()), 2),
+                'candidate': round(float(groups[:, month].sum()), 2),
+                'delta': round(float(groups[:, month].sum() - baseline_groups[:, month].sum()), 2)
+            } for month in active_months]
+        })
+    return report
+
+
+def _slab_rows(vector_plan, units, amounts, minimum_bills, **extra):
+    rows = [dict(extra, slab=label, units=round(float(slab_units), 2), revenue=round(float(amount), 2))
+            for label, slab_units, amount in zip(vector_plan.labels, units, amounts)]
+    rows.append(dict(extra, slab='minimum charge', units=0.0,
+                     revenue=round(minimum_bills * vector_plan.minimum_charge, 2)))
+    return rows